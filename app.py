@@ -1,15 +1,25 @@
 import dash 
-from dash import dcc, html, Input, Output, State
-import plotly.graph_objects as go
+from dash import dcc, html, Input, Output, State, Patch, no_update
+from dash.exceptions import PreventUpdate
+from plotly.io.json import to_json_plotly
 import pandas as pd
 from datetime import datetime, timedelta
-import os
 
 from src.file_operate import *
 from src.floyd_warshall.floyd_warshall import *
 from src.next_train import *
 from src.floyd_utils import *
 from src.next_train import *
+from src.floyd_warshall.query_engine import *
+from src.floyd_warshall.build_cache import ensure_artifacts
+from src.map_figure import load_base_map, route_update, full_figure, ROUTE_TRACE
+from src.station_search import station_index
+from src import instrumentation
+
+# "floyd_warshall" reads the precomputed matrices; "dijkstra" and "astar" answer each query over the CSR graph
+ROUTING_ENGINE = "floyd_warshall"
+# "patch" sends only the route trace of the cached base map; "figure" sends the whole figure on every route
+MAP_UPDATES = "patch"
 
 def somar_horas_decimais(horas_decimais: float, hora_saida: datetime.time) -> str:
     """
@@ -30,34 +40,33 @@ def somar_horas_decimais(horas_decimais: float, hora_saida: datetime.time) -> st
     nova_hora = dt_hora_saida + timedelta(minutes=minutos)
     return nova_hora.strftime("%H:%M")
 
-def calculate_route_crime_rate_score(crime_rate: float) -> str:
-    if crime_rate < 0.000045:
-        return "A"
-    elif crime_rate <= 0.000072:
-        return "B"
-    elif crime_rate <= 0.000148:
-        return "C"
-    elif crime_rate <= 0.000300:
-        return "D"
-    else:
-        return "F"
 if __name__ == "__main__":
     """
-    Application entry point. If required Floyd-Warshall data files do not exist, they are generated.
-    Then, the Dash server is started in debug mode.
+    Application entry point. The Floyd-Warshall artifacts are rebuilt if the station data or the build
+    parameters changed since they were generated. Then, the Dash server is started in debug mode.
     """
-    if not (os.path.exists("src/files/predecessors.txt") and os.path.exists("src/files/floyd_washal_lenght.txt")):
-        generate_floyd_warshall()
-    # Load subway graph data from files
-    vertices = load_vertices("src/files/vertices.txt")
-    predecessors = load_predecessors("src/files/predecessors.txt", vertices)
-    length_matrix = load_length_matrix_from_file("src/files/floyd_washal_lenght.txt")
+    if ROUTING_ENGINE == "floyd_warshall":
+        ensure_artifacts(ARTIFACTS_DIRECTORY)
+        # Memory-map the subway matrices from the binary artifacts
+        length_matrix, predecessors, vertices = load_binary_network(ARTIFACTS_DIRECTORY)
+    else:
+        # Build the graph in memory, no matrix files are needed
+        vertices, network = build_network()
+        csr = build_csr_graph(network, vertices)
+    registry = vertex_registry(vertices)
+    # Every line and station, built once and cached as JSON
+    base_map = load_base_map(vertices)
 
     # Initialize Dash application
     app = dash.Dash(__name__)
 
-    # Dropdown options for stations
-    station_options = [{'label': f"{v.station_name} ({v.line})", 'value': v.id} for v in vertices]
+    # Stage timers and counters, collected when ROUTE_METRICS=1
+    @app.server.route("/metrics")
+    def metrics():
+        return instrumentation.prometheus_text(), 200, {"Content-Type": "text/plain; version=0.0.4"}
+
+    # Station search of the dropdowns, which only receive the matches of what is typed
+    station_search = station_index(vertices)
 
     # Application layout
     app.layout = html.Div([
@@ -73,7 +82,7 @@ if __name__ == "__main__":
                 html.Label("Origem"),
                 dcc.Dropdown(
                     id="origin",
-                    options=station_options,
+                    options=[],
                     placeholder="Selecione a estação de origem",
                     style={"marginBottom": "10px", "width": "100%"}
                 ),
@@ -81,7 +90,7 @@ if __name__ == "__main__":
                 html.Label("Destino"),
                 dcc.Dropdown(
                     id="destination",
-                    options=station_options,
+                    options=[],
                     placeholder="Selecione a estação de destino",
                     style={"width": "100%"}
                 ),
@@ -98,12 +107,56 @@ if __name__ == "__main__":
 
             # Right panel with route map
             html.Div([
-                dcc.Graph(id="mapa-rota")
+                dcc.Graph(id="mapa-rota", figure=base_map)
             ], id="right-section")
         ]),
         html.Footer("Pontifícia Universidade Católica de Minas Gerais - 2025")
     ])
 
+    def station_options(search_value, value):
+        """
+        Dropdown options of a station search: the best matches of the typed text, plus the selected station.
+        Args:
+            search_value (str): Text typed in the dropdown.
+            value (int): Selected station id, if any.
+        Returns:
+            list[dict]: Dropdown options.
+        """
+        if not search_value:
+            raise PreventUpdate
+        # The dropdown also filters the options by the typed text: keep the typo matches visible
+        options = [{**option, "search": search_value} for option in station_search.search(search_value)]
+        selected = station_search.option(value)
+        if selected is not None and all(option["value"] != selected["value"] for option in options):
+            options.append(selected)
+        return options
+
+    for dropdown in ("origin", "destination"):
+        app.callback(
+            Output(dropdown, "options"),
+            [Input(dropdown, "search_value")],
+            [State(dropdown, "value")]
+        )(station_options)
+
+    def map_update(path):
+        """
+        Map output of a route (empty to clear it): a Patch of the route trace and the map view,
+        or the whole figure when MAP_UPDATES is "figure". The payload size is counted with the metrics.
+        """
+        if MAP_UPDATES == "figure":
+            output = full_figure(base_map, path)
+        else:
+            update = route_update(path)
+            output = Patch()
+            for key in ("lat", "lon", "text"):
+                output["data"][ROUTE_TRACE][key] = update[key]
+            if update["center"] is not None:
+                output["layout"]["mapbox"]["center"] = update["center"]
+                output["layout"]["mapbox"]["zoom"] = update["zoom"]
+        if instrumentation.enabled():
+            instrumentation.count("update_mapa_payload_bytes", len(to_json_plotly(output)))
+        return output
+
     @app.callback(
         [Output("mapa-rota", "figure"),
         Output("info-rota", "children"),
@@ -114,6 +167,7 @@ if __name__ == "__main__":
         [State("origin", "value"),
         State("destination", "value")]
     )
+    @instrumentation.timed("update_mapa")
     def update_mapa(n_clicks, orig_id, dest_id):
         """
         Updates the map and route information based on the selected origin and destination.
@@ -125,28 +179,38 @@ if __name__ == "__main__":
 
         Returns:
             tuple: 
-                - Figure with the plotted route on the map
+                - Route map update (see map_update)
                 - Route information text
                 - Next train arrival time at destination
         """
         AVERAGE_SPEED = 30.0  # Average speed in km/h
 
-        if not n_clicks or orig_id is None or dest_id is None or orig_id == dest_id:
-            return go.Figure(), "", "", "", ""
+        if not n_clicks:
+            return no_update, "", "", "", ""
+        if orig_id is None or dest_id is None or orig_id == dest_id:
+            return map_update([]), "", "", "", ""
 
-        orig = next(v for v in vertices if v.id == orig_id)
-        dest = next(v for v in vertices if v.id == dest_id)
-        path = get_short_path(vertices, predecessors, orig, dest)
+        orig = registry.by_id(orig_id)
+        dest = registry.by_id(dest_id)
+        if ROUTING_ENGINE == "floyd_warshall":
+            path = get_short_path_indexed(registry, predecessors, orig, dest)
+        elif ROUTING_ENGINE == "astar":
+            path = astar_short_path(csr, orig, dest)
+        else:
+            path = dijkstra_short_path(csr, orig, dest)
 
         if not path:
-            return go.Figure(), "Nenhuma rota encontrada.", "", "", ""
+            return map_update([]), "Nenhuma rota encontrada.", "", "", ""
 
         # Calculate total travel distance
-        total_distance = 0.0
-        for i in range(len(path) - 1):
-            o = path[i].id - 1
-            d = path[i + 1].id - 1
-            total_distance += length_matrix[o][d]
+        if ROUTING_ENGINE == "floyd_warshall":
+            total_distance = 0.0
+            for i in range(len(path) - 1):
+                o = path[i].id - 1
+                d = path[i + 1].id - 1
+                total_distance += length_matrix[o][d]
+        else:
+            total_distance = path_distance(csr, path)
 
         total_crime_percentage = sum(float(v.crime_rate) for v in path)
         average_crime_percentagem_in_travel = round(total_crime_percentage/len(path), 6)
@@ -164,34 +228,13 @@ if __name__ == "__main__":
         segundos = int((total_minutes - minutos) * 60)
         minuto_formatado = f"{minutos:02d}"
         
-        # Map data
-        lats = [v.lat for v in path]
-        lons = [v.lon for v in path]
-        names = [f"{v.station_name} ({v.line})" for v in path]
-
-        fig = go.Figure(go.Scattermapbox(
-            mode="markers+lines",
-            lat=lats,
-            lon=lons,
-            marker={'size': 10, 'color': "#00AD54"},
-            text=names,
-            line=dict(width=3, color='blue')
-        ))
-
-        fig.update_layout(
-            mapbox_style="open-street-map",
-            mapbox_zoom=12,
-            mapbox_center={"lat": float(path[0].lat), "lon": float(path[0].lon)},
-            margin={"r": 0, "t": 0, "l": 0, "b": 0}
-        )
-
         # Informational text
         info_text = f"Rota de {orig.station_name} até {dest.station_name} com {len(path)-1} conexões. Distância total de {round(total_distance,2)} km."
         proximo_trem_text = f"Próximo trem saí ás {hora_saida.strftime("%H:%M")}."
         chegada = f"Chegada prevista à {dest.station_name} às {hora_formatada} (duração: {(minuto_formatado)} minutos)."
         crimes_score = f"Ranking de segurança da rota: {travel_crimes_score}"
 
-        return fig, info_text, proximo_trem_text, chegada, crimes_score
+        return map_update(path), info_text, proximo_trem_text, chegada, crimes_score
 
 
 
@@ -0,0 +1,423 @@
+from src.file_operate import load_data_csv
+from src.floyd_warshall.floyd_warshall import define_vertice, define_routes, get_graph, floyd_warshall_by_distance_numpy, get_short_path_indexed, get_short_paths_batch
+from src.floyd_warshall.manage_files import save_binary_artifacts, load_binary_network, BINARY_LENGTHS, BINARY_PREDECESSORS
+from src.floyd_warshall.query_engine import build_csr_graph
+from src.floyd_warshall.contraction_hierarchy import contraction_hierarchy
+from src.floyd_warshall.topology_reduction import reduced_network
+from src.floyd_warshall.dynamic_apsp import dynamic_apsp
+from src.models.vertex_registry_definition import vertex_registry
+from src.spatial_index import nearest_grid
+from src.distance import distance_memo, haversine_km
+from src.next_train import GTFS_TABLES, load_gtfs_table, timetable_index
+from src.connection_scan import connection_scan
+from src.synthetic_network import NETWORK_KINDS, write_rows, synthetic_gtfs
+from datetime import datetime
+from os import path
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+"""
+benchmark.py
+---------------------
+Benchmark of every pipeline stage on synthetic networks of several sizes (see synthetic_network.py):
+reading the stations file, define_vertice, define_routes, get_graph, the Floyd-Warshall matrices, saving
+and loading the binary artifacts, path queries, the contraction hierarchy (preprocessing, file, queries),
+closures and their rollback against a full recomputation, the topology reduction (core matrices, queries), snapping random coordinates to their nearest stations,
+and loading and querying a synthetic GTFS timetable, with next-arrival lookups and Connection Scan earliest-arrival journeys.
+Each size is run twice: once for the times, and once under tracemalloc for the peak memory of each stage,
+so the tracing overhead does not distort the times. The results are written as JSON, and a previous
+result file can be given to print the ratio of every stage.
+Run it with:
+    python -m src.benchmark --kinds grid radial --sizes 100 1000 10000 --compare old.json
+"""
+
+BENCHMARK_DIRECTORY = path.join("src", "files", "benchmarks")
+DEFAULT_SIZES = (100, 1000, 10000)
+MAX_APSP_SIZE = 3000       # Above this, the O(n^3) stage and the stages needing its matrices are skipped
+MAX_HIERARCHY_SIZE = 20000 # Above this, the contraction hierarchy stages are skipped
+MAX_REDUCTION_SIZE = 6000  # Above this, the topology reduction stages are skipped (a grid core keeps about half the vertices)
+QUERIES = 1000
+CLOSURES = 3                   # Stations closed (the last one only loses a segment) by the closure check
+SNAP_POINTS = 1_000_000        # Random coordinates snapped to their nearest stations
+SNAP_K = 3
+STOP_TIMES_BUDGET = 200_000    # Approximate stop_times rows of the synthetic GTFS, whatever the size
+
+def prepare_inputs(kind: str, n: int, directory: str, seed: int = 0) -> dict:
+    """
+    Write the synthetic stations file and GTFS feed of one network.
+    Args:
+        kind (str): Network layout ("grid" or "radial").
+        n (int): Target number of vertices.
+        directory (str): Scratch directory of the run.
+        seed (int): Seed of the network.
+    Returns:
+        dict: Counts of the generated inputs.
+    """
+    rows = NETWORK_KINDS[kind](n, seed)
+    write_rows(rows, path.join(directory, "stations.csv"))
+    trips = max(2, STOP_TIMES_BUDGET // (len(rows) * 2 * 3))
+    headway = max(60, 20 * 3600 // trips)
+    synthetic_gtfs(rows, path.join(directory, "gtfs"), headway=headway)
+    return {"rows": len(rows) - 1, "lines": len({row[4] for row in rows[1:]}), "gtfs_headway": headway}
+
+def build_stages(directory: str, seed: int = 0, run_apsp: bool = True, run_hierarchy: bool = True, run_reduction: bool = True) -> list[tuple[str, callable]]:
+    """
+    Stages of one benchmark pass over the inputs of prepare_inputs, in order.
+    Each one reads and writes a shared state dictionary.
+    Args:
+        directory (str): Scratch directory holding the inputs.
+        seed (int): Seed of the queries.
+        run_apsp (bool): Run the O(n^3) stage and the stages needing its matrices.
+        run_hierarchy (bool): Run the contraction hierarchy stages.
+        run_reduction (bool): Run the topology reduction stages, which solve the core of networks too large for run_apsp.
+    Returns:
+        list[tuple[str, callable]]: Stage name and function receiving the state.
+    """
+    stations_path = path.join(directory, "stations.csv")
+    gtfs_directory = path.join(directory, "gtfs")
+    cache_directory = path.join(directory, "gtfs_cache")
+    artifacts_directory = path.join(directory, "artifacts")
+    hierarchy_path = path.join(artifacts_directory, "hierarchy.npz")
+    # A fresh cache per pass, so the cold GTFS load is cold again
+    shutil.rmtree(cache_directory, ignore_errors=True)
+    shutil.rmtree(artifacts_directory, ignore_errors=True)
+
+    def load_csv(state):
+        state["data"] = load_data_csv(stations_path)
+        state["counts"] = {}
+
+    def vertices(state):
+        state["vertices"] = define_vertice(state["data"], 1)
+        state["counts"]["vertices"] = len(state["vertices"])
+
+    def routes(state):
+        state["routes"] = define_routes(state["vertices"])
+        state["counts"]["routes"] = len(state["routes"])
+
+    def graph(state):
+        state["memo"] = distance_memo()
+        state["graph"] = get_graph(state["routes"], state["vertices"], state["memo"])
+        state["counts"]["adjacencies"] = sum(len(neighbors) for neighbors in state["graph"].adjacency_list.values())
+
+    def floyd_warshall(state):
+        state["lengths"], state["predecessors"] = floyd_warshall_by_distance_numpy(state["graph"], state["vertices"], state["memo"])
+
+    def save_artifacts(state):
+        save_binary_artifacts(artifacts_directory, state["lengths"], state["predecessors"], state["vertices"])
+
+    def load_artifacts(state):
+        lengths, predecessors, table = load_binary_network(artifacts_directory)
+        # Touch the memory maps so the stage includes the page-in
+        state["loaded_checksum"] = float(np.nansum(lengths[np.isfinite(lengths)])) + int(predecessors.sum())
+        state["registry"] = vertex_registry(table)
+        state["loaded_lengths"] = lengths
+        state["loaded_predecessors"] = predecessors
+        state["counts"]["apsp_bytes"] = sum(path.getsize(path.join(artifacts_directory, name)) for name in (BINARY_LENGTHS, BINARY_PREDECESSORS))
+
+    def pairs(state):
+        generator = np.random.default_rng(seed)
+        count = len(state["vertices"])
+        return generator.integers(0, count, QUERIES), generator.integers(0, count, QUERIES)
+
+    def short_path(state):
+        registry, predecessors = state["registry"], state["loaded_predecessors"]
+        origins, destinies = pairs(state)
+        state["path_vertices"] = sum(len(get_short_path_indexed(registry, predecessors, registry[int(i)], registry[int(j)])) for i, j in zip(origins, destinies))
+
+    def short_paths_batch(state):
+        origins, destinies = pairs(state)
+        state["batch_vertices"] = sum(len(p) for p in get_short_paths_batch(state["registry"], state["loaded_predecessors"], origins, destinies, as_indices=True))
+
+    def closure_agreement(state):
+        # Closures applied incrementally give the distances of a full recomputation, and rolling them
+        # back gives the original matrices
+        dynamic = dynamic_apsp.from_graph(state["graph"], state["vertices"], state["memo"], state["lengths"], state["predecessors"])
+        closed = np.random.default_rng(seed).choice(len(state["vertices"]), min(CLOSURES, len(state["vertices"])), replace=False).tolist()
+        for index in closed[:-1]:
+            dynamic.close_station(index)
+        neighbor = next(iter(dynamic.neighbors[closed[-1]]), None)
+        if neighbor is not None:
+            dynamic.remove_edge(closed[-1], neighbor)
+        expected, _ = dynamic.recompute()
+        distances, _ = dynamic.snapshot()
+        state["counts"]["closure_same_rows"] = int(np.all(np.isclose(distances, expected, rtol=0, atol=1e-9), axis=1).sum())
+        dynamic.rollback(len(dynamic.history))
+        distances, predecessors = dynamic.snapshot()
+        state["counts"]["rollback_same_matrices"] = int(np.array_equal(distances, state["lengths"]) and np.array_equal(predecessors, state["predecessors"]))
+
+    def reduction(state):
+        state["reduced"] = reduced_network(build_csr_graph(state["graph"], state["vertices"], memo=state["memo"]))
+        state["counts"]["reduced_core"] = len(state["reduced"].core)
+
+    def reduced_path_query(state):
+        reduced = state["reduced"]
+        origins, destinies = pairs(state)
+        state["reduced_vertices"] = sum(len(reduced.short_path(reduced.vertices[int(i)], reduced.vertices[int(j)])) for i, j in zip(origins, destinies))
+
+    def hierarchy(state):
+        state["csr"] = build_csr_graph(state["graph"], state["vertices"], memo=state["memo"])
+        state["hierarchy"] = contraction_hierarchy.from_csr(state["csr"])
+        state["counts"]["shortcuts"] = state["hierarchy"].shortcut_count()
+
+    def save_hierarchy(state):
+        state["hierarchy"].save(hierarchy_path)
+        state["counts"]["hierarchy_bytes"] = path.getsize(hierarchy_path)
+
+    def load_hierarchy(state):
+        state["loaded_hierarchy"] = contraction_hierarchy.load(hierarchy_path)
+
+    def hierarchy_path_query(state):
+        hierarchy = state["loaded_hierarchy"]
+        origins, destinies = pairs(state)
+        state["hierarchy_paths"] = [hierarchy.short_path(hierarchy.vertices[int(i)], hierarchy.vertices[int(j)]) for i, j in zip(origins, destinies)]
+
+    def hierarchy_agreement(state):
+        # Same length as the Floyd-Warshall matrix for every pair; the same vertices unless several paths tie
+        csr, lengths, predecessors = state["csr"], state["loaded_lengths"], state["loaded_predecessors"]
+        origins, destinies = pairs(state)
+        expected = get_short_paths_batch(state["registry"], predecessors, origins, destinies, as_indices=True)
+        same_length = same_path = 0
+        for i, j, reference, found in zip(origins, destinies, expected, state["hierarchy_paths"]):
+            indices = [csr.index_of[v] for v in found]
+            weight = sum(csr.edge_weight(a, b) for a, b in zip(indices, indices[1:])) if indices else float("inf")
+            same_length += bool(weight == lengths[i, j] or abs(weight - lengths[i, j]) <= 1e-9)
+            same_path += indices == reference
+        state["counts"]["hierarchy_same_length"] = same_length
+        state["counts"]["hierarchy_same_path"] = same_path
+
+    def nearest_index(state):
+        # The grid and its candidate table for SNAP_K (built on the first query)
+        vertices = state["vertices"]
+        state["nearest"] = nearest_grid.from_vertices(vertices)
+        state["nearest"].nearest(float(vertices[0].lat), float(vertices[0].lon), SNAP_K)
+
+    def snap_points(state):
+        grid = state["nearest"]
+        generator = np.random.default_rng(seed)
+        # The stations area and a margin of a tenth of its size around it
+        lat_margin, lon_margin = np.ptp(grid.lats) / 10, np.ptp(grid.lons) / 10
+        state["snap_lats"] = generator.uniform(grid.lats.min() - lat_margin, grid.lats.max() + lat_margin, SNAP_POINTS)
+        state["snap_lons"] = generator.uniform(grid.lons.min() - lon_margin, grid.lons.max() + lon_margin, SNAP_POINTS)
+        state["snapped"] = grid.nearest(state["snap_lats"], state["snap_lons"], SNAP_K)
+
+    def snap_agreement(state):
+        # Same distances as comparing the first points with every station
+        grid, (_, meters) = state["nearest"], state["snapped"]
+        lats, lons = state["snap_lats"][:QUERIES, None], state["snap_lons"][:QUERIES, None]
+        expected = np.sort(haversine_km(lats, lons, grid.lats[None, :], grid.lons[None, :]) * 1000, axis=1)[:, :SNAP_K]
+        state["counts"]["snap_same_distances"] = int(np.all(np.abs(meters[:QUERIES] - expected) <= 1e-6, axis=1).sum())
+
+    def gtfs_cold(state):
+        state["gtfs"] = [load_gtfs_table(name, gtfs_directory, cache_directory) for name in GTFS_TABLES]
+
+    def gtfs_warm(state):
+        state["gtfs"] = [load_gtfs_table(name, gtfs_directory, cache_directory) for name in GTFS_TABLES]
+
+    def timetable(state):
+        state["timetable"] = timetable_index.from_gtfs(*state["gtfs"])
+        state["counts"]["stop_times"] = len(state["gtfs"][GTFS_TABLES.index("stop_times")])
+
+    def next_arrival(state):
+        table = state["timetable"]
+        generator = np.random.default_rng(seed)
+        chosen = generator.integers(0, len(state["vertices"]), QUERIES)
+        weekdays = generator.integers(0, 7, QUERIES)
+        seconds = generator.integers(5 * 3600, 24 * 3600, QUERIES)
+        found = 0
+        for index, weekday, moment in zip(chosen, weekdays, seconds):
+            v = state["vertices"][int(index)]
+            found += table.next_arrival(table.route_ids[v.line[0]], v.station_name, int(weekday), float(moment)) is not None
+        state["next_arrival_found"] = found
+
+    def scan_build(state):
+        # The connection arrays, the transitive footpaths of the graph and the sorted connections of every day
+        stops, _, trips, stop_times, calendar = state["gtfs"]
+        scan = connection_scan.from_gtfs(stops, trips, stop_times, calendar)
+        scan.add_footpaths_from_graph(state["graph"], state["vertices"])
+        scan.prepare_days()
+        state["scan"] = scan
+        state["counts"]["connections"] = len(scan.connections["dep_time"])
+        state["counts"]["footpaths"] = sum(len(walks) for walks in scan.footpaths)
+
+    def earliest_arrival(state):
+        scan = state["scan"]
+        generator = np.random.default_rng(seed)
+        count = len(scan.station_ids)
+        origins, destinies = generator.integers(0, count, QUERIES), generator.integers(0, count, QUERIES)
+        weekdays = generator.integers(0, 7, QUERIES)
+        seconds = generator.integers(5 * 3600, 24 * 3600, QUERIES)
+        state["counts"]["earliest_arrival_found"] = sum(scan.earliest_arrival(int(i), int(j), int(moment), int(weekday))[0] is not None
+                                                        for i, j, weekday, moment in zip(origins, destinies, weekdays, seconds))
+
+    stages = [("load_data_csv", load_csv), ("define_vertice", vertices), ("define_routes", routes), ("get_graph", graph)]
+    if run_apsp:
+        stages += [("floyd_warshall_numpy", floyd_warshall), ("save_binary_artifacts", save_artifacts), ("load_binary_network", load_artifacts),
+                   (f"get_short_path_indexed_x{QUERIES}", short_path), (f"get_short_paths_batch_x{QUERIES}", short_paths_batch),
+                   ("closure_agreement", closure_agreement)]
+    if run_reduction:
+        stages += [("reduce_network", reduction), (f"reduced_short_path_x{QUERIES}", reduced_path_query)]
+    if run_hierarchy:
+        stages += [("contraction_hierarchy", hierarchy), ("save_hierarchy", save_hierarchy), ("load_hierarchy", load_hierarchy),
+                   (f"hierarchy_short_path_x{QUERIES}", hierarchy_path_query)]
+        if run_apsp:
+            stages.append(("hierarchy_agreement", hierarchy_agreement))
+    stages += [("nearest_grid", nearest_index), (f"nearest_x{SNAP_POINTS}", snap_points), ("snap_agreement", snap_agreement)]
+    stages += [("gtfs_load_cold", gtfs_cold), ("gtfs_load_warm", gtfs_warm), ("timetable_build", timetable), (f"next_arrival_x{QUERIES}", next_arrival),
+               ("connection_scan_build", scan_build), (f"earliest_arrival_x{QUERIES}", earliest_arrival)]
+    return stages
+
+def run_stages(stages: list[tuple[str, callable]], trace_memory: bool) -> tuple[dict, dict]:
+    """
+    Run the stages in order, silencing their progress messages.
+    Args:
+        stages (list[tuple[str, callable]]): Stages from build_stages.
+        trace_memory (bool): Measure the peak memory allocated by each stage with tracemalloc.
+    Returns:
+        tuple[dict, dict]: Seconds (or peak bytes when tracing) per stage, and the counts of the run.
+    """
+    state = {}
+    measures = {}
+    for name, stage in stages:
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            stage(state)
+        elapsed = time.perf_counter() - start
+        if trace_memory:
+            measures[name] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        else:
+            measures[name] = elapsed
+    return measures, state.get("counts", {})
+
+def benchmark_network(kind: str, n: int, seed: int = 0, max_apsp_size: int = MAX_APSP_SIZE, memory: bool = True, repeat: int = 1, max_hierarchy_size: int = MAX_HIERARCHY_SIZE, max_reduction_size: int = MAX_REDUCTION_SIZE) -> dict:
+    """
+    Benchmark every stage on one synthetic network, in a scratch directory removed afterwards.
+    Args:
+        kind (str): Network layout ("grid" or "radial").
+        n (int): Target number of vertices.
+        seed (int): Seed of the network and the queries.
+        max_apsp_size (int): Largest network solved by Floyd-Warshall.
+        memory (bool): Also run the tracemalloc pass.
+        repeat (int): Timed passes; the best time of each stage is kept.
+        max_hierarchy_size (int): Largest network contracted into a hierarchy.
+        max_reduction_size (int): Largest network reduced to its core.
+    Returns:
+        dict: Layout, size, counts and, per stage, seconds and peak bytes.
+    """
+    result = {"kind": kind, "n": n, "repeat": repeat, "stages": {}}
+    run_apsp = n <= max_apsp_size
+    run_hierarchy = n <= max_hierarchy_size
+    run_reduction = n <= max_reduction_size
+    directory = tempfile.mkdtemp(prefix=f"benchmark-{kind}-{n}-")
+    try:
+        inputs = prepare_inputs(kind, n, directory, seed)
+        for _ in range(repeat):
+            times, counts = run_stages(build_stages(directory, seed, run_apsp, run_hierarchy, run_reduction), trace_memory=False)
+            for name, seconds in times.items():
+                stage = result["stages"].setdefault(name, {})
+                stage["seconds"] = round(min(seconds, stage.get("seconds", float("inf"))), 6)
+        if memory:
+            peaks, _ = run_stages(build_stages(directory, seed, run_apsp, run_hierarchy, run_reduction), trace_memory=True)
+            for name, peak in peaks.items():
+                result["stages"][name]["peak_bytes"] = int(peak)
+        # The names of every stage, so the skipped ones match the stage keys of larger runs
+        planned = [name for name, _ in build_stages(directory, seed)]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    result["counts"] = {**inputs, **counts}
+    skipped = [name for name in planned if name not in result["stages"]]
+    if skipped:
+        result["skipped"] = skipped
+    return result
+
+def environment() -> dict:
+    """
+    Machine and code version of a run, to tell comparable results apart.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"timestamp": datetime.now().isoformat(timespec="seconds"), "commit": commit, "python": platform.python_version(),
+            "numpy": np.__version__, "platform": platform.platform(), "processor": platform.processor(), "cpus": os.cpu_count()}
+
+def run_benchmark(kinds=("grid", "radial"), sizes=DEFAULT_SIZES, seed: int = 0, max_apsp_size: int = MAX_APSP_SIZE, memory: bool = True, repeat: int = 1, max_hierarchy_size: int = MAX_HIERARCHY_SIZE, max_reduction_size: int = MAX_REDUCTION_SIZE) -> dict:
+    """
+    Benchmark every layout and size.
+    Returns:
+        dict: {"environment": ..., "results": [one benchmark_network result per layout and size]}
+    """
+    results = []
+    for kind in kinds:
+        for n in sizes:
+            print(f"Benchmarking {kind} network, n={n}...")
+            results.append(benchmark_network(kind, n, seed, max_apsp_size, memory, repeat, max_hierarchy_size, max_reduction_size))
+    return {"environment": environment(), "results": results}
+
+def compare(current: dict, previous: dict) -> list[tuple[str, int, str, float, float, float]]:
+    """
+    Stage times of two runs side by side. Networks whose vertex count changed (e.g. after a change
+    of the generator) are not compared.
+    Returns:
+        list[tuple]: (kind, n, stage, previous seconds, current seconds, current / previous) for the stages of both runs.
+    """
+    earlier = {(r["kind"], r["n"], r["counts"].get("vertices"), name): stage.get("seconds") for r in previous["results"] for name, stage in r["stages"].items()}
+    rows = []
+    for r in current["results"]:
+        for name, stage in r["stages"].items():
+            before = earlier.get((r["kind"], r["n"], r["counts"].get("vertices"), name))
+            if before and stage.get("seconds") is not None:
+                rows.append((r["kind"], r["n"], name, before, stage["seconds"], stage["seconds"] / before))
+    return rows
+
+def print_report(report: dict):
+    for r in report["results"]:
+        print(f"\n{r['kind']} n={r['n']} {r['counts']}")
+        for name, stage in r["stages"].items():
+            peak = stage.get("peak_bytes")
+            memory = f"{peak / 2**20:10.2f} MiB" if peak is not None else ""
+            print(f"  {name:<32} {stage['seconds']:10.4f} s {memory}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages on synthetic networks.")
+    parser.add_argument("--kinds", nargs="+", default=["grid", "radial"], choices=sorted(NETWORK_KINDS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(DEFAULT_SIZES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-apsp-size", type=int, default=MAX_APSP_SIZE)
+    parser.add_argument("--max-hierarchy-size", type=int, default=MAX_HIERARCHY_SIZE)
+    parser.add_argument("--max-reduction-size", type=int, default=MAX_REDUCTION_SIZE)
+    parser.add_argument("--repeat", type=int, default=1, help="Timed passes per network, keeping the best time of each stage")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--output", help="Result file (default: src/files/benchmarks/benchmark-<timestamp>.json)")
+    parser.add_argument("--compare", help="Previous result file to compare the times with")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.kinds, args.sizes, args.seed, args.max_apsp_size, not args.no_memory, args.repeat, args.max_hierarchy_size, args.max_reduction_size)
+    print_report(report)
+    output = args.output or path.join(BENCHMARK_DIRECTORY, f"benchmark-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            previous = json.load(file)
+        print("\nStage times against the previous run (current / previous):")
+        for kind, n, name, before, now, ratio in compare(report, previous):
+            print(f"  {kind:<7}{n:>7} {name:<32} {before:10.4f} s -> {now:10.4f} s  x{ratio:.2f}")
+
+if __name__ == "__main__":
+    main()
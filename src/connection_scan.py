@@ -0,0 +1,272 @@
+from src.models.vertice_definition import vertice
+from src.models.graph_definition import graph
+from src.next_train import time_to_seconds, day_week, SECONDS_PER_DAY
+from src.spatial_index import spatial_grid
+from src.distance import haversine_km
+import heapq
+import threading
+import pandas as pd
+import numpy as np
+
+"""
+connection_scan.py
+---------------------
+Time-dependent earliest-arrival routing on the GTFS feed with the Connection Scan Algorithm.
+Every pair of consecutive stops of a trip is a connection; connections of a day are kept in flat
+arrays sorted by departure time and scanned once from the departure moment.
+Stations are the GTFS parent stations; walking footpaths between them come from the complexes
+and transfer edges of the graph built by get_graph.
+"""
+
+WALKING_SPEED = 1.4  # Meters per second
+STATION_MATCH_RADIUS = 300  # Maximum distance (meters) between a vertice and its GTFS station
+
+class connection_scan:
+    """
+    Connection Scan router over the GTFS timetable.
+    Attributes:
+        station_ids (list[str]): GTFS id of each station (parent station).
+        station_names (list[str]): Name of each station.
+        station_lats (np.ndarray): Latitude of each station.
+        station_lons (np.ndarray): Longitude of each station.
+        trip_routes (list): route_id of each trip index.
+        connections (dict[str:np.ndarray]): Departure/arrival station, departure/arrival time,
+            trip index and service index of every connection.
+        services_by_day (list[list[int]]): Service indices active on each day of the week.
+        footpaths (list[list[tuple[int, int]]]): (station, seconds) walks leaving each station.
+    """
+    def __init__(self, station_ids, station_names, station_lats, station_lons, trip_routes, connections, services_by_day):
+        self.station_ids = station_ids
+        self.station_names = station_names
+        self.station_lats = np.asarray(station_lats, dtype=np.float64)
+        self.station_lons = np.asarray(station_lons, dtype=np.float64)
+        self.station_index = {station_id: index for index, station_id in enumerate(station_ids)}
+        self.trip_routes = trip_routes
+        self.connections = connections
+        self.services_by_day = services_by_day
+        self.footpaths = [[] for _ in station_ids]
+        self._days = {}
+        self._days_lock = threading.Lock()
+        self._grid = None
+
+    @classmethod
+    def from_gtfs(cls, stops: pd.DataFrame, trips: pd.DataFrame, stop_times: pd.DataFrame, calendar: pd.DataFrame) -> "connection_scan":
+        """
+        Build the connection arrays from the GTFS tables.
+        Args:
+            stops, trips, stop_times, calendar (pd.DataFrame): GTFS tables.
+        Returns:
+            connection_scan: The router, without footpaths.
+        """
+        parent = stops['parent_station']
+        if pd.api.types.is_numeric_dtype(parent):
+            # Numeric parent ids are read as floats because of the empty cells: 101.0 is station "101"
+            parent = parent.astype('Int64').astype(str).where(parent.notna())
+        parent = parent.where(parent.notna() & (parent.astype(str) != ''), stops['stop_id'])
+        station_of_stop = dict(zip(stops['stop_id'].astype(str), parent.astype(str)))
+        stations = stops[stops['stop_id'].astype(str).isin(set(station_of_stop.values()))].drop_duplicates('stop_id')
+        station_ids = stations['stop_id'].astype(str).tolist()
+        station_index = {station_id: index for index, station_id in enumerate(station_ids)}
+
+        service_ids = calendar['service_id'].tolist()
+        service_index = {service_id: index for index, service_id in enumerate(service_ids)}
+        services_by_day = [[service_index[s] for s in calendar[calendar[day] == 1]['service_id']] for day in day_week]
+
+        table = stop_times[['trip_id', 'arrival_time', 'departure_time', 'stop_id', 'stop_sequence']].merge(
+            trips[['trip_id', 'route_id', 'service_id']], on='trip_id')
+        table = table[table['service_id'].isin(service_index)].sort_values(['trip_id', 'stop_sequence'], kind='stable')
+        trip_codes, trip_ids = pd.factorize(table['trip_id'])
+        trip_routes = table.groupby(trip_codes, sort=True)['route_id'].first().tolist()
+
+        station = table['stop_id'].astype(str).map(station_of_stop).map(station_index).to_numpy()
+        arrival = time_to_seconds(table['arrival_time']).to_numpy()
+        departure = time_to_seconds(table['departure_time']).to_numpy()
+        service = table['service_id'].map(service_index).to_numpy()
+
+        # A connection joins each stop of a trip to the next one
+        same_trip = trip_codes[1:] == trip_codes[:-1]
+        valid = same_trip & ~np.isnan(departure[:-1]) & ~np.isnan(arrival[1:]) & ~np.isnan(station[:-1].astype(float)) & ~np.isnan(station[1:].astype(float))
+        connections = {
+            'dep_station': station[:-1][valid].astype(np.int32),
+            'arr_station': station[1:][valid].astype(np.int32),
+            'dep_time': departure[:-1][valid].astype(np.int32),
+            'arr_time': arrival[1:][valid].astype(np.int32),
+            'trip': trip_codes[:-1][valid].astype(np.int32),
+            'service': service[:-1][valid].astype(np.int32),
+        }
+        return cls(station_ids, stations['stop_name'].tolist(), stations['stop_lat'].to_numpy(), stations['stop_lon'].to_numpy(), trip_routes, connections, services_by_day)
+
+    def station_of_vertice(self, v: vertice) -> int | None:
+        """
+        Index of the GTFS station closest to a vertice, within STATION_MATCH_RADIUS meters.
+        Args:
+            v (vertice): Vertice of the subway graph.
+        Returns:
+            int | None: Station index, or None if no station is close enough.
+        """
+        if self._grid is None:
+            self._grid = spatial_grid(self.station_lats, self.station_lons, STATION_MATCH_RADIUS)
+        found = self._grid.query_radius(float(v.lat), float(v.lon))
+        if not found:
+            return None
+        distances = haversine_km(float(v.lat), float(v.lon), self.station_lats[found], self.station_lons[found])
+        return found[int(np.argmin(distances))]
+
+    def add_footpaths_from_graph(self, graph: graph, vertices: list[vertice]):
+        """
+        Add walking footpaths between the stations matched to the vertices of a complex
+        and to the two ends of every transfer edge of the graph.
+        The scan takes a single footpath after each arrival, so the walks are closed transitively:
+        each station gets the shortest walk to every station reachable through a chain of transfers.
+        Args:
+            graph (graph): Graph built by get_graph.
+            vertices (list[vertice]): Its vertices.
+        """
+        station_of = {v: self.station_of_vertice(v) for v in vertices}
+        walks = {}
+        for origin, elements in graph.adjacency_list.items():
+            for element in elements:
+                destiny = element[0]
+                is_transfer = element[2] is not None or origin.complex_id == destiny.complex_id
+                a, b = station_of.get(origin), station_of.get(destiny)
+                if not is_transfer or a is None or b is None or a == b:
+                    continue
+                meters = float(haversine_km(self.station_lats[a], self.station_lons[a], self.station_lats[b], self.station_lons[b])) * 1000
+                seconds = int(np.ceil(meters / WALKING_SPEED))
+                walks[(a, b)] = min(seconds, walks.get((a, b), seconds))
+        neighbors = [[] for _ in self.station_ids]
+        for (a, b), seconds in walks.items():
+            neighbors[a].append((b, seconds))
+        self.footpaths = [[] for _ in self.station_ids]
+        for source in {a for a, _ in walks}:
+            # Dijkstra over the walks; the walking components are a few stations each
+            best = {source: 0}
+            heap = [(0, source)]
+            while heap:
+                seconds, station = heapq.heappop(heap)
+                if seconds > best[station]:
+                    continue
+                for following, walk in neighbors[station]:
+                    if seconds + walk < best.get(following, float("inf")):
+                        best[following] = seconds + walk
+                        heapq.heappush(heap, (seconds + walk, following))
+            self.footpaths[source] = [(station, seconds) for station, seconds in best.items() if station != source]
+
+    def _day(self, weekday: int) -> dict:
+        """
+        Connections usable on a day, sorted by departure: the day's services and the times after 24:00
+        of the previous day's services (shifted one day back, with their own trip indices).
+        """
+        # Built once per day, even when several threads ask for it together
+        with self._days_lock:
+            if weekday not in self._days:
+                c = self.connections
+                today = np.isin(c['service'], self.services_by_day[weekday])
+                yesterday = np.isin(c['service'], self.services_by_day[(weekday - 1) % 7]) & (c['arr_time'] >= SECONDS_PER_DAY)
+                n_trips = len(self.trip_routes)
+                day = {key: np.concatenate([c[key][today], c[key][yesterday]]) for key in ('dep_station', 'arr_station', 'dep_time', 'arr_time', 'trip')}
+                day['dep_time'][today.sum():] -= SECONDS_PER_DAY
+                day['arr_time'][today.sum():] -= SECONDS_PER_DAY
+                day['trip'][today.sum():] += n_trips
+                order = np.argsort(day['dep_time'], kind='stable')
+                sorted_day = {key: values[order] for key, values in day.items()}
+                # Python lists are faster than NumPy scalars inside the scan loop
+                sorted_day['lists'] = tuple(sorted_day[key].tolist() for key in ('dep_station', 'arr_station', 'dep_time', 'arr_time', 'trip'))
+                self._days[weekday] = sorted_day
+            return self._days[weekday]
+
+    def prepare_days(self, weekdays=range(7)):
+        """
+        Sort the connections of some days ahead of the first query of each one.
+        Args:
+            weekdays (iterable[int]): Days of the week (0 = monday).
+        """
+        for weekday in weekdays:
+            self._day(weekday)
+
+    def earliest_arrival(self, origin: int, destiny: int, departure: int, weekday: int) -> tuple[int | None, list[tuple]]:
+        """
+        Earliest arrival at destiny leaving origin at or after departure.
+        Args:
+            origin (int): Index of the origin station.
+            destiny (int): Index of the destiny station.
+            departure (int): Departure time, in seconds since midnight.
+            weekday (int): Day of the week (0 = monday).
+        Returns:
+            tuple[int | None, list[tuple]]: Arrival time in seconds since midnight (None if unreachable) and the
+                journey legs (kind, from station, to station, departure, arrival, route_id), kind being "train" or "walk".
+        """
+        day = self._day(weekday)
+        dep_station, arr_station, dep_time, arr_time, trip = day['lists']
+        n = len(self.station_ids)
+        inf = float('inf')
+        arrival = [inf] * n
+        in_connection = [-1] * n
+        walked_from = [-1] * n
+        boarded = [-1] * (2 * len(self.trip_routes))
+
+        arrival[origin] = departure
+        for to, seconds in self.footpaths[origin]:
+            if departure + seconds < arrival[to]:
+                arrival[to] = departure + seconds
+                walked_from[to] = origin
+
+        start = int(np.searchsorted(day['dep_time'], departure, side='left'))
+        for c in range(start, len(dep_time)):
+            if dep_time[c] >= arrival[destiny]:
+                break
+            t = trip[c]
+            if boarded[t] < 0:
+                if arrival[dep_station[c]] > dep_time[c]:
+                    continue
+                boarded[t] = c
+            station = arr_station[c]
+            time = arr_time[c]
+            if time < arrival[station]:
+                arrival[station] = time
+                in_connection[station] = c
+                walked_from[station] = -1
+                for to, seconds in self.footpaths[station]:
+                    if time + seconds < arrival[to]:
+                        arrival[to] = time + seconds
+                        in_connection[to] = -1
+                        walked_from[to] = station
+
+        if arrival[destiny] == inf:
+            return None, []
+        return arrival[destiny], self._journey(origin, destiny, arrival, in_connection, walked_from, boarded, day['lists'])
+
+    def _journey(self, origin, destiny, arrival, in_connection, walked_from, boarded, lists) -> list[tuple]:
+        dep_station, _, dep_time, arr_time, trip = lists
+        n_trips = len(self.trip_routes)
+        legs = []
+        current = destiny
+        while current != origin and len(legs) <= len(self.station_ids):
+            if walked_from[current] >= 0:
+                previous = walked_from[current]
+                legs.append(("walk", previous, current, arrival[previous], arrival[current], None))
+            else:
+                c = in_connection[current]
+                board = boarded[trip[c]]
+                previous = dep_station[board]
+                legs.append(("train", previous, current, dep_time[board], arr_time[c], self.trip_routes[trip[c] % n_trips]))
+            current = previous
+        legs.reverse()
+        return legs
+
+    def route(self, origin: vertice, destiny: vertice, when) -> tuple[int | None, list[tuple]]:
+        """
+        Earliest arrival between two vertices of the subway graph.
+        Args:
+            origin (vertice): Origin vertice.
+            destiny (vertice): Destiny vertice.
+            when (datetime.datetime): Departure moment.
+        Returns:
+            tuple[int | None, list[tuple]]: As earliest_arrival, with station names instead of indices.
+        """
+        a, b = self.station_of_vertice(origin), self.station_of_vertice(destiny)
+        if a is None or b is None:
+            return None, []
+        seconds = when.hour * 3600 + when.minute * 60 + when.second
+        arrival, legs = self.earliest_arrival(a, b, seconds, when.weekday())
+        return arrival, [(kind, self.station_names[x], self.station_names[y], dep, arr, route) for kind, x, y, dep, arr, route in legs]
@@ -0,0 +1,153 @@
+import numpy as np
+
+"""
+distance.py
+---------------------
+Batched distance kernels over coordinate arrays, shared by the graph build and the weight initialisation.
+Two modes are available: "haversine" (sphere) and "ellipsoidal" (Vincenty inverse on WGS-84,
+within a millimeter of geopy's geodesic for non antipodal points).
+distance_memo keeps the distances of one build, so each pair is computed only once.
+"""
+
+EARTH_RADIUS_KM = 6371.0088
+WGS84_A = 6378.137  # Semi-major axis, in kilometers
+WGS84_F = 1 / 298.257223563
+WGS84_B = (1 - WGS84_F) * WGS84_A
+DISTANCE_MODES = ("haversine", "ellipsoidal")
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in kilometers between coordinates (scalars or NumPy arrays).
+    Args:
+        lat1, lon1: Coordinates of the first points, in degrees.
+        lat2, lon2: Coordinates of the second points, in degrees.
+    Returns:
+        np.ndarray | float: Distances in kilometers.
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def vincenty_km(lat1, lon1, lat2, lon2, iterations:int=200, tolerance:float=1e-12):
+    """
+    Ellipsoidal (WGS-84) distance in kilometers with Vincenty's inverse formula, for arrays of pairs.
+    Pairs that do not converge (nearly antipodal points) fall back to the haversine distance.
+    Args:
+        lat1, lon1: Coordinates of the first points, in degrees.
+        lat2, lon2: Coordinates of the second points, in degrees.
+        iterations (int): Maximum number of iterations on lambda.
+        tolerance (float): Convergence threshold on lambda, in radians.
+    Returns:
+        np.ndarray: Distances in kilometers.
+    """
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in (lat1, lon1, lat2, lon2)))
+    f = WGS84_F
+    L = np.radians(lon2 - lon1)
+    U1 = np.arctan((1 - f) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - f) * np.tan(np.radians(lat2)))
+    sin_u1, cos_u1 = np.sin(U1), np.cos(U1)
+    sin_u2, cos_u2 = np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    converged = np.zeros(L.shape, dtype=bool)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(iterations):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.sqrt((cos_u2 * sin_lam) ** 2 + (cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam) ** 2)
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha)
+            C = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+            previous = lam
+            lam = L + (1 - C) * f * sin_alpha * (sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+            converged = np.abs(lam - previous) <= tolerance
+            if converged.all():
+                break
+
+        u2 = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+        A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+        B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+        delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+                      - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+        result = WGS84_B * A * (sigma - delta_sigma)
+
+    failed = ~converged | ~np.isfinite(result)
+    if failed.any():
+        result = np.where(failed, haversine_km(lat1, lon1, lat2, lon2), result)
+    return result
+
+def distances_km(lat1, lon1, lat2, lon2, mode:str="ellipsoidal"):
+    """
+    Distances in kilometers for arrays of coordinate pairs.
+    Args:
+        lat1, lon1: Coordinates of the first points, in degrees.
+        lat2, lon2: Coordinates of the second points, in degrees.
+        mode (str): "haversine" or "ellipsoidal".
+    Returns:
+        np.ndarray: Distances in kilometers.
+    """
+    if mode == "haversine":
+        return haversine_km(lat1, lon1, lat2, lon2)
+    if mode == "ellipsoidal":
+        return vincenty_km(lat1, lon1, lat2, lon2)
+    raise ValueError(f"Unknown distance mode: {mode}")
+
+class distance_memo:
+    """
+    Distances of one build, keyed by the (unordered) pair of coordinates.
+    Pairs are computed in batches by prefetch; kilometers() reads them back.
+    Attributes:
+        mode (str): Distance mode ("haversine" or "ellipsoidal").
+        cache (dict[tuple:float]): Distance in kilometers of each computed pair.
+        computed (int): Number of distances computed.
+        hits (int): Number of lookups answered from the cache.
+    """
+    def __init__(self, mode:str="ellipsoidal"):
+        if mode not in DISTANCE_MODES:
+            raise ValueError(f"Unknown distance mode: {mode}")
+        self.mode = mode
+        self.cache = {}
+        self.computed = 0
+        self.hits = 0
+
+    @staticmethod
+    def _key(origin, destiny) -> tuple:
+        a = (float(origin.lat), float(origin.lon))
+        b = (float(destiny.lat), float(destiny.lon))
+        return (a, b) if a <= b else (b, a)
+
+    def prefetch(self, pairs):
+        """
+        Compute, in one vectorized call, the distance of every pair not in the cache yet.
+        Args:
+            pairs (iterable[tuple[vertice, vertice]]): Pairs of objects with lat and lon.
+        """
+        missing = {}
+        for origin, destiny in pairs:
+            key = self._key(origin, destiny)
+            if key not in self.cache:
+                missing[key] = None
+        if not missing:
+            return
+        keys = np.array([[a[0], a[1], b[0], b[1]] for a, b in missing], dtype=np.float64)
+        values = distances_km(keys[:, 0], keys[:, 1], keys[:, 2], keys[:, 3], self.mode)
+        self.cache.update(zip(missing, values.tolist()))
+        self.computed += len(missing)
+
+    def kilometers(self, origin, destiny) -> float:
+        """
+        Distance in kilometers between two objects with lat and lon, computed on a cache miss.
+        Args:
+            origin (vertice): First point.
+            destiny (vertice): Second point.
+        Returns:
+            float: Distance in kilometers.
+        """
+        key = self._key(origin, destiny)
+        if key in self.cache:
+            self.hits += 1
+        else:
+            self.prefetch([(origin, destiny)])
+        return self.cache[key]
@@ -1,8 +1,10 @@
 import chardet
 import json
+from src.instrumentation import timed, count, progress
 
 NUM_OF_LINES = 999999
 
+@timed("load_data_csv")
 def load_data_csv(file_path):
     """
     Load data from a CSV file, automatically detecting encoding.
@@ -15,7 +17,7 @@ def load_data_csv(file_path):
     """
     raw = []
     data = []
-    print("Loading data...")
+    progress("Loading data...")
     try:
         with open(file_path, 'rb') as file:
             result = chardet.detect(file.read())
@@ -37,8 +39,10 @@ def load_data_csv(file_path):
         # Append the list of values to the data list
         data.append(values)
     
+    count("csv_rows", len(data))
     return data
 
+@timed("load_data_json")
 def load_data_json(file_path):
     """
     Load data from a JSON file, automatically detecting encoding.
@@ -51,7 +55,7 @@ def load_data_json(file_path):
     """
     json_file = []
     
-    print("Loading data...")
+    progress("Loading data...")
     try:
         with open(file_path, 'rb') as file:
             result = chardet.detect(file.read())
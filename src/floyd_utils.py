@@ -30,3 +30,15 @@ def load_predecessors(filepath, vertices):
 
 # Reexporta função
 get_short_path = get_short_path
+
+def calculate_route_crime_rate_score(crime_rate: float) -> str:
+    if crime_rate < 0.000045:
+        return "A"
+    elif crime_rate <= 0.000072:
+        return "B"
+    elif crime_rate <= 0.000148:
+        return "C"
+    elif crime_rate <= 0.000300:
+        return "D"
+    else:
+        return "F"
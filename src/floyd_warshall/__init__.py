@@ -1,15 +1,68 @@
-from .floyd_warshall import generate_floyd_warshall , get_short_path
+from .floyd_warshall import generate_floyd_warshall , get_short_path, get_short_path_indexed, get_short_paths_batch, build_network, ARTIFACTS_DIRECTORY, GRAPH_FILE
 from .manage_files import (
     load_graph_from_file,
     load_predecessors_from_file,
     load_vertices_from_file,
-    load_length_matrix_from_file
+    load_length_matrix_from_file,
+    save_binary_artifacts,
+    load_binary_artifacts,
+    load_binary_network,
+    load_predecessor_indices_from_file,
+    binary_artifacts_exist,
+    table_to_vertices,
+    convert_text_to_binary,
+    convert_binary_to_text
 )
+from .query_engine import build_csr_graph, dijkstra_short_path, astar_short_path, path_distance
+from .dynamic_apsp import dynamic_apsp
+from .parallel_apsp import parallel_apsp
+from .cost_profiles import COST_PROFILES, PROFILE_CONSTANTS, edge_attributes, floyd_warshall_profiles, generate_profiles
+from .od_analytics import export_od_analytics, export_od_matrix, station_accessibility, line_summary
+from .build_cache import ensure_artifacts, build_keys, read_build_manifest, load_artifact_edges, load_artifact_network
+from .contraction_hierarchy import contraction_hierarchy, generate_hierarchy
+from .topology_reduction import reduced_network, reduce_network
 __all__ = [
     "generate_floyd_warshall",
     "get_short_path",
+    "get_short_path_indexed",
+    "get_short_paths_batch",
+    "build_network",
+    "ARTIFACTS_DIRECTORY",
+    "GRAPH_FILE",
     "load_graph_from_file",
     "load_predecessors_from_file",
     "load_vertices_from_file",
-    "load_length_matrix_from_file"    
-]
\ No newline at end of file
+    "load_length_matrix_from_file",
+    "save_binary_artifacts",
+    "load_binary_artifacts",
+    "load_binary_network",
+    "load_predecessor_indices_from_file",
+    "binary_artifacts_exist",
+    "table_to_vertices",
+    "convert_text_to_binary",
+    "convert_binary_to_text",
+    "build_csr_graph",
+    "dijkstra_short_path",
+    "astar_short_path",
+    "path_distance",
+    "dynamic_apsp",
+    "parallel_apsp",
+    "COST_PROFILES",
+    "PROFILE_CONSTANTS",
+    "edge_attributes",
+    "floyd_warshall_profiles",
+    "generate_profiles",
+    "export_od_analytics",
+    "export_od_matrix",
+    "station_accessibility",
+    "line_summary",
+    "ensure_artifacts",
+    "build_keys",
+    "read_build_manifest",
+    "load_artifact_edges",
+    "load_artifact_network",
+    "contraction_hierarchy",
+    "generate_hierarchy",
+    "reduced_network",
+    "reduce_network"
+]
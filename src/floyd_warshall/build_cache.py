@@ -0,0 +1,218 @@
+from src.models.vertice_definition import vertice
+from src.models.graph_definition import graph
+from src.distance import distance_memo
+from src.next_train import file_hash
+from src.instrumentation import timed, progress
+from .floyd_warshall import build_network, ARTIFACTS_DIRECTORY, GRAPH_FILE
+from .manage_files import BUILD_MANIFEST, save_binary_artifacts, binary_artifacts_exist, vertices_to_table, table_to_vertices, save_graph_to_file
+from .cost_profiles import COST_PROFILES, PROFILE_CONSTANTS, edge_attributes, floyd_warshall_profiles
+from . import floyd_warshall as network_module, cost_profiles as profiles_module
+from datetime import datetime
+from os import path
+import hashlib
+import json
+import os
+import numpy as np
+
+"""
+build_cache.py
+---------------------
+Content-addressed build of the binary artifacts. A build manifest next to the artifacts records the
+SHA-256 of the input files and the build parameters, split in two keys:
+    network_key   stations file, TRANSFER_RADIUS and distance mode: the vertices and the graph
+    artifact_key  network_key, weight profile (and the constants it reads) and length dtype: the matrices
+ensure_artifacts() compares them with the current ones and only rebuilds what changed: nothing when both
+match, only the weighting and the all-pairs step (from the cached network) when the network matches,
+everything otherwise. generate_floyd_warshall records its own builds (process pool, tiled engine) with
+record_artifacts, so ensure_artifacts keeps them instead of solving the matrices again in memory. AVERAGE_SPEED only converts the stored kilometers to minutes at query time, so a
+change is recorded in the manifest without recomputing the matrices.
+"""
+
+BUILD_VERSION = 1  # Bump when the build logic changes the artifacts for the same inputs
+NETWORK_CACHE = "network_cache.npz"
+STATIONS_FILE = path.join("src", "subway_files", "all_stations_results.csv")
+DEFAULT_PROFILE = "fastest"  # Distance only, the weight of the default matrices
+
+def _digest(values: dict) -> str:
+    return hashlib.sha256(json.dumps(values, sort_keys=True).encode()).hexdigest()
+
+def build_keys(stations_file: str = STATIONS_FILE, weight_profile: str = DEFAULT_PROFILE, dtype=np.float64, distance_mode: str = "ellipsoidal") -> dict:
+    """
+    Hashes of the inputs and parameters of a build. The constants are read from their modules at each call.
+    Args:
+        stations_file (str): Stations CSV file read by build_network.
+        weight_profile (str): Name of the cost profile of the matrices (see COST_PROFILES).
+        dtype: Storage type of the length matrix.
+        distance_mode (str): Distance mode of the edge lengths.
+    Returns:
+        dict: inputs, parameters, query_parameters, network_key and artifact_key.
+    """
+    if weight_profile not in COST_PROFILES:
+        raise ValueError(f"Unknown weight profile: {weight_profile}")
+    inputs = {"stations": {"path": stations_file, "sha256": file_hash(stations_file)}}
+    network = {"build_version": BUILD_VERSION, "stations_sha256": inputs["stations"]["sha256"], "TRANSFER_RADIUS": network_module.TRANSFER_RADIUS, "distance_mode": distance_mode}
+    # Only the constants the profile reads: changing another one leaves these matrices as they are
+    constants = {name: getattr(profiles_module, name) for name in PROFILE_CONSTANTS.get(weight_profile, ())}
+    weighting = {"weight_profile": weight_profile, **constants, "length_dtype": np.dtype(dtype).name}
+    network_key = _digest(network)
+    return {
+        "inputs": inputs,
+        "parameters": {**network, **weighting},
+        "query_parameters": {"AVERAGE_SPEED": network_module.AVERAGE_SPEED},
+        "network_key": network_key,
+        "artifact_key": _digest({"network_key": network_key, **weighting}),
+    }
+
+def read_build_manifest(directory: str) -> dict | None:
+    try:
+        with open(path.join(directory, BUILD_MANIFEST), "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+def _write_build_manifest(directory: str, manifest: dict):
+    temporary = path.join(directory, BUILD_MANIFEST + ".tmp")
+    with open(temporary, "w") as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(temporary, path.join(directory, BUILD_MANIFEST))
+
+def save_network_cache(file_path: str, network_key: str, vertices: list[vertice], graph: graph, attributes: dict[str:np.ndarray]):
+    """
+    Save the vertices, the adjacency list (in order) and the edge attributes of a built network.
+    """
+    index_of = {v: index for index, v in enumerate(vertices)}
+    origins, destinies, values, transfers = [], [], [], []
+    for origin, elements in graph.adjacency_list.items():
+        for element in elements:
+            origins.append(index_of[origin])
+            destinies.append(index_of[element[0]])
+            values.append(element[1])
+            transfers.append(element[2] is not None)
+    np.savez(file_path, network_key=np.array(network_key), vertices=vertices_to_table(vertices),
+             adjacency_origin=np.array(origins, dtype=np.int32), adjacency_destiny=np.array(destinies, dtype=np.int32),
+             adjacency_value=np.array(values, dtype=np.float64), adjacency_transfer=np.array(transfers, dtype=bool),
+             **{f"attribute_{name}": array for name, array in attributes.items()})
+
+def load_network_cache(file_path: str, network_key: str) -> tuple[list[vertice], graph, dict[str:np.ndarray]] | None:
+    """
+    Load a network saved by save_network_cache.
+    Returns:
+        tuple | None: vertices, graph and edge attributes, or None if the file is missing or holds another network.
+    """
+    try:
+        with np.load(file_path, allow_pickle=False) as data:
+            if str(data["network_key"]) != network_key:
+                return None
+            vertices = table_to_vertices(data["vertices"])
+            adjacency_list = {v: [] for v in vertices}
+            for i, j, value, transfer in zip(data["adjacency_origin"].tolist(), data["adjacency_destiny"].tolist(), data["adjacency_value"].tolist(), data["adjacency_transfer"].tolist()):
+                origin, destiny = vertices[i], vertices[j]
+                adjacency_list[origin].append((destiny, value, f"{origin.id}|{destiny.id}" if transfer else None))
+            attributes = {name[len("attribute_"):]: data[name] for name in data.files if name.startswith("attribute_")}
+    except (OSError, ValueError, KeyError):
+        return None
+    return vertices, graph(adjacency_list=adjacency_list), attributes
+
+def load_artifact_network(directory: str = ARTIFACTS_DIRECTORY) -> tuple[list[vertice], graph, dict[str:np.ndarray]] | None:
+    """
+    Network the artifacts of directory were built from.
+    Returns:
+        tuple | None: vertices, graph and edge attributes, or None without a manifest or a matching network cache.
+    """
+    manifest = read_build_manifest(directory)
+    if manifest is None:
+        return None
+    return load_network_cache(path.join(directory, NETWORK_CACHE), manifest.get("network_key"))
+
+def load_artifact_edges(directory: str = ARTIFACTS_DIRECTORY) -> tuple[dict[str:np.ndarray], np.ndarray] | None:
+    """
+    Edges of the network the artifacts of directory were built from, with the weights of their profile.
+    Returns:
+        tuple | None: Edge attribute arrays and edge weights, or None without a manifest or a matching network cache.
+    """
+    manifest = read_build_manifest(directory)
+    if manifest is None:
+        return None
+    cached = load_network_cache(path.join(directory, NETWORK_CACHE), manifest.get("network_key"))
+    profile = COST_PROFILES.get(manifest.get("parameters", {}).get("weight_profile"))
+    if cached is None or profile is None:
+        return None
+    attributes = cached[2]
+    return attributes, profile(attributes)
+
+def _build_network_cache(cache_path: str, network_key: str, stations_file: str) -> tuple[list[vertice], graph, dict[str:np.ndarray]]:
+    """
+    Build the network of the stations file and save it as the network cache.
+    """
+    memo = distance_memo()
+    vertices, network = build_network(stations_file, memo)
+    attributes = edge_attributes(network, vertices, memo)
+    save_network_cache(cache_path, network_key, vertices, network, attributes)
+    return vertices, network, attributes
+
+def record_artifacts(directory: str, vertices: list[vertice], network: graph, memo: distance_memo = None, dtype=np.float64, stations_file: str = STATIONS_FILE, build: dict = None):
+    """
+    Write the network cache and the build manifest of artifacts built outside ensure_artifacts.
+    The matrices must hold the DEFAULT_PROFILE weights (the edge distances) of the network of stations_file.
+    Args:
+        directory (str): Artifact directory.
+        vertices (list[vertice]): Vertices of the network, in matrix order.
+        network (graph): Graph the matrices were solved from.
+        memo (distance_memo): Distances of the build.
+        dtype: Storage type of the length matrix.
+        stations_file (str): Stations CSV file the network was built from.
+        build (dict): How the matrices were solved (engine, workers, tile size), kept in the manifest.
+    """
+    keys = build_keys(stations_file, DEFAULT_PROFILE, dtype)
+    save_network_cache(path.join(directory, NETWORK_CACHE), keys["network_key"], vertices, network, edge_attributes(network, vertices, memo))
+    _write_build_manifest(directory, {**keys, "built_at": datetime.now().isoformat(timespec="seconds"), "status": "generated", "build": build or {}})
+
+@timed("ensure_artifacts")
+def ensure_artifacts(directory: str = ARTIFACTS_DIRECTORY, stations_file: str = STATIONS_FILE, weight_profile: str = DEFAULT_PROFILE, dtype=np.float64, graph_file: str = GRAPH_FILE) -> str:
+    """
+    Make the binary artifacts of directory match the current inputs and parameters, rebuilding only what changed.
+    Args:
+        directory (str): Artifact directory.
+        stations_file (str): Stations CSV file.
+        weight_profile (str): Cost profile of the matrices (see COST_PROFILES).
+        dtype: Storage type of the length matrix.
+        graph_file (str): Text graph file written with a new network (used by main_cli); None to skip it.
+    Returns:
+        str: "current" (nothing rebuilt), "reweighted" (cached network, new matrices) or "rebuilt".
+    """
+    keys = build_keys(stations_file, weight_profile, dtype)
+    manifest = read_build_manifest(directory)
+    cache_path = path.join(directory, NETWORK_CACHE)
+    if manifest is not None and manifest.get("artifact_key") == keys["artifact_key"] and binary_artifacts_exist(directory):
+        if manifest.get("query_parameters") != keys["query_parameters"]:
+            manifest["query_parameters"] = keys["query_parameters"]
+            _write_build_manifest(directory, manifest)
+        if graph_file is not None and not path.exists(graph_file):
+            cached = load_network_cache(cache_path, keys["network_key"])
+            if cached is None:
+                # The matrices are current, but the network they were solved from is gone: rebuild it
+                progress("Graph file and network cache missing, rebuilding the network...")
+                cached = _build_network_cache(cache_path, keys["network_key"], stations_file)
+            save_graph_to_file(cached[1], graph_file)
+        return "current"
+
+    os.makedirs(directory, exist_ok=True)
+    # The artifacts are not described by the manifest while they are rewritten
+    if os.path.exists(path.join(directory, BUILD_MANIFEST)):
+        os.remove(path.join(directory, BUILD_MANIFEST))
+
+    cached = load_network_cache(cache_path, keys["network_key"])
+    if cached is not None:
+        status = "reweighted"
+        progress(f"Network unchanged, solving the {weight_profile} weights...")
+        vertices, network, attributes = cached
+    else:
+        status = "rebuilt"
+        vertices, network, attributes = _build_network_cache(cache_path, keys["network_key"], stations_file)
+    if graph_file is not None and (status == "rebuilt" or not path.exists(graph_file)):
+        save_graph_to_file(network, graph_file)
+
+    lengths, predecessors = floyd_warshall_profiles(attributes, len(vertices), {weight_profile: COST_PROFILES[weight_profile]})[weight_profile]
+    save_binary_artifacts(directory, lengths, predecessors, vertices, dtype)
+    _write_build_manifest(directory, {**keys, "built_at": datetime.now().isoformat(timespec="seconds"), "status": status})
+    return status
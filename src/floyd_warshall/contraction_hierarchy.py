@@ -0,0 +1,320 @@
+from src.models.vertice_definition import vertice
+from src.models.graph_definition import graph
+from src.models.csr_graph_definition import csr_graph
+from src.distance import distance_memo
+from src.instrumentation import timed, count, progress
+from .floyd_warshall import build_network, as_registry, ARTIFACTS_DIRECTORY
+from .manage_files import vertices_to_table, table_to_vertices
+from .query_engine import build_csr_graph
+from os import path
+import heapq
+import os
+import numpy as np
+
+"""
+contraction_hierarchy.py
+---------------------
+Contraction Hierarchies over the subway graph: point-to-point queries close to a matrix lookup,
+stored in O(n + shortcuts) instead of the O(n^2) length and predecessor matrices.
+Preprocessing contracts the vertices one at a time, in the order of a lazily updated priority
+(edge difference, contracted neighbors and level). Contracting v adds a shortcut u-w for each pair of its
+neighbors unless a witness search finds a path from u to w avoiding v that is no longer than u-v-w.
+Each vertice keeps its edges to higher ranked vertices (the upward graph), and each shortcut the
+vertice it skips. A query runs Dijkstra upwards from both ends, and the shortcuts of the best meeting
+path are unpacked into the vertices of the original graph. The result is a shortest path in the format
+of get_short_path; where several paths have the same length (parallel lines sharing the stations of a
+complex) it may pick another one than the Floyd-Warshall predecessors.
+"""
+
+HIERARCHY_FORMAT_VERSION = 1
+HIERARCHY_FILE = path.join(ARTIFACTS_DIRECTORY, "hierarchy.npz")
+WITNESS_SETTLE_LIMIT = 500  # Vertices settled by a witness search before it gives up (and adds the shortcut)
+INF = float('inf')
+
+def _witness_distances(adjacency: list[dict[int:float]], source: int, excluded: int, targets: set[int], limit: float) -> dict[int:float]:
+    """
+    Dijkstra from source in the remaining graph, avoiding excluded, until the targets are settled
+    or the distance limit is passed.
+    """
+    distance = {source: 0.0}
+    heap = [(0.0, source)]
+    remaining = set(targets)
+    settled = 0
+    while heap and remaining and settled < WITNESS_SETTLE_LIMIT:
+        current_distance, current = heapq.heappop(heap)
+        if current_distance > distance[current]:
+            continue
+        if current_distance > limit:
+            break
+        settled += 1
+        remaining.discard(current)
+        for neighbor, weight in adjacency[current].items():
+            if neighbor == excluded:
+                continue
+            candidate = current_distance + weight
+            if candidate < distance.get(neighbor, INF):
+                distance[neighbor] = candidate
+                heapq.heappush(heap, (candidate, neighbor))
+    return distance
+
+def _shortcuts(adjacency: list[dict[int:float]], v: int) -> list[tuple[int, int, float]]:
+    """
+    Shortcuts needed to contract v: one per neighbor pair without a witness path.
+    """
+    neighbors = list(adjacency[v].items())
+    shortcuts = []
+    for position, (u, weight_u) in enumerate(neighbors[:-1]):
+        targets = neighbors[position + 1:]
+        limit = weight_u + max(weight for _, weight in targets)
+        witness = _witness_distances(adjacency, u, v, {w for w, _ in targets}, limit)
+        for w, weight_w in targets:
+            via = weight_u + weight_w
+            if witness.get(w, INF) > via:
+                shortcuts.append((u, w, via))
+    return shortcuts
+
+class contraction_hierarchy:
+    """
+    Contraction hierarchy of an undirected graph.
+    Attributes:
+        rank (np.ndarray): int32 contraction order of each vertice index.
+        offsets (np.ndarray): int64 array of size n+1, start of the upward edges of each vertice.
+        neighbors (np.ndarray): int32 higher ranked endpoint of each upward edge.
+        weights (np.ndarray): float64 weight of each upward edge.
+        middle (np.ndarray): int32 vertice skipped by each shortcut (-1 for an edge of the graph).
+        vertices (list[vertice]): Vertices in index order.
+    """
+    def __init__(self, rank: np.ndarray, offsets: np.ndarray, neighbors: np.ndarray, weights: np.ndarray, middle: np.ndarray, vertices: list[vertice]):
+        self.rank = rank
+        self.offsets = offsets
+        self.neighbors = neighbors
+        self.weights = weights
+        self.middle = middle
+        self.vertices = vertices
+        self.registry = as_registry(vertices)
+        # Python lists are faster than NumPy scalars in the query loops
+        offsets_list, neighbors_list, weights_list = offsets.tolist(), neighbors.tolist(), weights.tolist()
+        self.upward = [list(zip(neighbors_list[offsets_list[i]:offsets_list[i + 1]], weights_list[offsets_list[i]:offsets_list[i + 1]])) for i in range(len(offsets_list) - 1)]
+        origins = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets)).tolist()
+        self.middle_of = {(low, high): m for low, high, m in zip(origins, neighbors_list, middle.tolist()) if m >= 0}
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @classmethod
+    @timed("contraction_hierarchy")
+    def from_csr(cls, csr: csr_graph) -> "contraction_hierarchy":
+        """
+        Contract the vertices of a CSR graph. The graph is taken as undirected; when the two directions
+        of an edge differ, the lighter one is kept.
+        Args:
+            csr (csr_graph): The packed graph (see build_csr_graph).
+        Returns:
+            contraction_hierarchy: The hierarchy.
+        """
+        n = len(csr)
+        adjacency = [dict() for _ in range(n)]
+        for i in range(n):
+            for j, weight in zip(*csr.edges_from(i)):
+                if i != j and weight < adjacency[i].get(j, INF):
+                    adjacency[i][j] = weight
+                    adjacency[j][i] = weight
+        middle = {}
+        deleted_neighbors = [0] * n
+        level = [0] * n
+        # Edge difference (weighted twice), contracted neighbors and level spread the contraction evenly,
+        # which keeps the upward searches small
+        priority = lambda v, shortcuts: 2 * (len(shortcuts) - len(adjacency[v])) + deleted_neighbors[v] + level[v]
+
+        progress("Ordering the vertices...")
+        heap = [(priority(v, _shortcuts(adjacency, v)), v) for v in range(n)]
+        heapq.heapify(heap)
+        rank = np.zeros(n, dtype=np.int32)
+        upward = [None] * n
+        shortcut_count = 0
+        order = 0
+        progress("Contracting the vertices...")
+        while heap:
+            _, v = heapq.heappop(heap)
+            shortcuts = _shortcuts(adjacency, v)
+            current = priority(v, shortcuts)
+            # Lazy update: contract v only if it is still the best candidate
+            if heap and current > heap[0][0]:
+                heapq.heappush(heap, (current, v))
+                continue
+            rank[v] = order
+            order += 1
+            upward[v] = [(u, weight, middle.get((min(u, v), max(u, v)), -1)) for u, weight in adjacency[v].items()]
+            for u, w, via in shortcuts:
+                if via < adjacency[u].get(w, INF):
+                    adjacency[u][w] = via
+                    adjacency[w][u] = via
+                    middle[(min(u, w), max(u, w))] = v
+                    shortcut_count += 1
+            for u in adjacency[v]:
+                del adjacency[u][v]
+                deleted_neighbors[u] += 1
+                level[u] = max(level[u], level[v] + 1)
+            adjacency[v] = {}
+
+        count("shortcuts", shortcut_count)
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(edges) for edges in upward])
+        edges = [edge for edges in upward for edge in edges]
+        return cls(
+            rank=rank,
+            offsets=offsets,
+            neighbors=np.array([edge[0] for edge in edges], dtype=np.int32),
+            weights=np.array([edge[1] for edge in edges], dtype=np.float64),
+            middle=np.array([edge[2] for edge in edges], dtype=np.int32),
+            vertices=csr.vertices,
+        )
+
+    @classmethod
+    def from_graph(cls, graph: graph, vertices: list[vertice], memo: distance_memo = None) -> "contraction_hierarchy":
+        """
+        Build the hierarchy from the graph of get_graph, with the same edge weights as the Floyd-Warshall matrices.
+        """
+        return cls.from_csr(build_csr_graph(graph, vertices, memo=memo))
+
+    def shortcut_count(self) -> int:
+        return int(np.count_nonzero(self.middle >= 0))
+
+    def nbytes(self) -> int:
+        """
+        Bytes of the hierarchy arrays (the vertices excluded).
+        """
+        return sum(array.nbytes for array in (self.rank, self.offsets, self.neighbors, self.weights, self.middle))
+
+    def save(self, file_path: str = HIERARCHY_FILE):
+        """
+        Save the hierarchy and its vertices as a single .npz file.
+        """
+        os.makedirs(path.dirname(file_path) or ".", exist_ok=True)
+        np.savez(file_path, format_version=np.array(HIERARCHY_FORMAT_VERSION), rank=self.rank, offsets=self.offsets,
+                 neighbors=self.neighbors, weights=self.weights, middle=self.middle, vertices=vertices_to_table(self.vertices))
+
+    @classmethod
+    def load(cls, file_path: str = HIERARCHY_FILE) -> "contraction_hierarchy":
+        """
+        Load a hierarchy saved by save.
+        """
+        with np.load(file_path, allow_pickle=False) as data:
+            version = int(data["format_version"])
+            if version != HIERARCHY_FORMAT_VERSION:
+                raise ValueError(f"Unsupported hierarchy format version {version} in {file_path}")
+            return cls(data["rank"], data["offsets"], data["neighbors"], data["weights"], data["middle"], table_to_vertices(data["vertices"]))
+
+    def _search(self, origin: int, destiny: int) -> tuple[float, int, dict[int:int], dict[int:int]]:
+        """
+        Bidirectional Dijkstra over the upward graph. The search stops when neither queue can improve
+        the best meeting distance.
+        Returns:
+            tuple: Distance, meeting vertice (-1 if not found) and the parents of the forward and backward searches.
+        """
+        upward = self.upward
+        distances = ({origin: 0.0}, {destiny: 0.0})
+        parents = ({origin: origin}, {destiny: destiny})
+        heaps = ([(0.0, origin)], [(0.0, destiny)])
+        best, meeting = (0.0, origin) if origin == destiny else (INF, -1)
+        while True:
+            forward_key = heaps[0][0][0] if heaps[0] else INF
+            backward_key = heaps[1][0][0] if heaps[1] else INF
+            if min(forward_key, backward_key) >= best:
+                break
+            side = 0 if forward_key <= backward_key else 1
+            distance, parent, other = distances[side], parents[side], distances[1 - side]
+            current_distance, current = heapq.heappop(heaps[side])
+            if current_distance > distance[current]:
+                continue
+            edges = upward[current]
+            # Stall on demand: a higher ranked neighbor already reached gives a shorter path to current,
+            # so current is not on a shortest upward path (the graph is undirected, so its upward edges
+            # are also the downward edges reaching it)
+            if any(distance.get(neighbor, INF) + weight < current_distance for neighbor, weight in edges):
+                continue
+            for neighbor, weight in edges:
+                candidate = current_distance + weight
+                if candidate < distance.get(neighbor, INF):
+                    distance[neighbor] = candidate
+                    parent[neighbor] = current
+                    heapq.heappush(heaps[side], (candidate, neighbor))
+                    total = candidate + other.get(neighbor, INF)
+                    if total < best:
+                        best, meeting = total, neighbor
+        return best, meeting, parents[0], parents[1]
+
+    def _unpack(self, a: int, b: int, out: list[int]):
+        """
+        Append the original vertices of the edge a-b (without a) to out.
+        """
+        stack = [(a, b)]
+        while stack:
+            a, b = stack.pop()
+            m = self.middle_of.get((a, b) if self.rank[a] < self.rank[b] else (b, a), -1)
+            if m < 0:
+                out.append(b)
+            else:
+                stack.append((m, b))
+                stack.append((a, m))
+
+    def distance(self, origin: int, destiny: int) -> float:
+        """
+        Shortest distance between two vertice indices (inf if not connected).
+        """
+        return self._search(origin, destiny)[0]
+
+    def path_indices(self, origin: int, destiny: int) -> list[int]:
+        """
+        Shortest path between two vertice indices, as indices of the original graph (empty if not connected).
+        """
+        best, meeting, forward, backward = self._search(origin, destiny)
+        if meeting < 0:
+            return []
+        up = [meeting]
+        while up[-1] != origin:
+            up.append(forward[up[-1]])
+        up.reverse()
+        down = [meeting]
+        while down[-1] != destiny:
+            down.append(backward[down[-1]])
+        hops = up + down[1:]
+        path = [origin]
+        for a, b in zip(hops, hops[1:]):
+            self._unpack(a, b, path)
+        return path
+
+    def short_path(self, origin: vertice, destiny: vertice) -> list[vertice]:
+        """
+        Retrieve the shortest path between two vertices, like get_short_path.
+        Args:
+            origin (vertice): Starting vertice.
+            destiny (vertice): Destination vertice.
+        Returns:
+            list[vertice]: List of vertices representing the shortest path, or empty if not found.
+        """
+        i = self.registry.index_of(origin)
+        j = self.registry.index_of(destiny)
+        if i is None or j is None:
+            print("Erro: origin and destiny outside from the list.")
+            return []
+        indices = self.path_indices(i, j)
+        if not indices:
+            print("Any path founded.")
+            return []
+        return [self.registry[index] for index in indices]
+
+def generate_hierarchy(file_path: str = HIERARCHY_FILE, stations_file: str = None) -> contraction_hierarchy:
+    """
+    Build the network, contract it and save the hierarchy.
+    Args:
+        file_path (str): Output .npz file.
+        stations_file (str): Stations CSV file; defaults to the one of build_network.
+    Returns:
+        contraction_hierarchy: The saved hierarchy.
+    """
+    memo = distance_memo()
+    vertices, network = build_network(stations_file, memo) if stations_file else build_network(memo=memo)
+    hierarchy = contraction_hierarchy.from_graph(network, vertices, memo)
+    hierarchy.save(file_path)
+    return hierarchy
@@ -0,0 +1,140 @@
+from src.models.vertice_definition import vertice
+from src.models.graph_definition import graph
+from src.distance import distance_memo
+from src.instrumentation import timed, progress
+from .floyd_warshall import build_network, edge_distance, adjacent_pairs, relax_numpy, ARTIFACTS_DIRECTORY
+from .manage_files import save_binary_artifacts
+from os import path
+import numpy as np
+
+"""
+cost_profiles.py
+---------------------
+Weighting profiles for the all-pairs matrices. A profile turns the edge attribute arrays
+(distance, crime rate, transfer flag) into a vector of edge weights, so a new trade-off between
+distance and safety only needs a new function. Several profiles share the graph construction and the
+initial matrices and are solved in one batched run; each result is saved as its own artifact.
+"""
+
+PROFILES_DIRECTORY = path.join(ARTIFACTS_DIRECTORY, "profiles")
+TRANSFER_PENALTY = 0.5  # Kilometers added to each transfer by the balanced profile
+
+def edge_attributes(graph: graph, vertices: list[vertice], memo: distance_memo = None) -> dict[str:np.ndarray]:
+    """
+    Attribute arrays of the undirected edges of the graph, one entry per edge.
+    Args:
+        graph (graph): Graph with the adjacency list.
+        vertices (list[vertice]): List of vertice objects, defining the indices.
+        memo (distance_memo): Distances of the current build.
+    Returns:
+        dict[str:np.ndarray]: origin and destiny (indices), distance (km, 0 inside a complex, as in the
+            distance matrices), crime_rate (mean of both stations) and transfer (complex or walking transfer).
+    """
+    memo = memo if memo is not None else distance_memo()
+    memo.prefetch(adjacent_pairs(graph.adjacency_list))
+    index_of = {v: index for index, v in enumerate(vertices)}
+    edges = {}
+    for origin, elements in graph.adjacency_list.items():
+        index_i = index_of.get(origin)
+        for element in elements:
+            index_j = index_of.get(element[0])
+            if index_i is None or index_j is None or index_i == index_j:
+                continue
+            key = (min(index_i, index_j), max(index_i, index_j))
+            transfer = element[2] is not None or origin.complex_id == element[0].complex_id
+            edges[key] = edges.get(key, False) or transfer
+
+    pairs = np.array(list(edges), dtype=np.int32).reshape(-1, 2)
+    crime_rate = np.array([float(v.crime_rate) for v in vertices])
+    return {
+        "origin": pairs[:, 0],
+        "destiny": pairs[:, 1],
+        "distance": np.array([edge_distance(vertices[i], vertices[j], memo) for i, j in edges]),
+        "crime_rate": (crime_rate[pairs[:, 0]] + crime_rate[pairs[:, 1]]) / 2,
+        "transfer": np.array(list(edges.values()), dtype=bool),
+    }
+
+def fastest_weights(attributes: dict[str:np.ndarray]) -> np.ndarray:
+    """
+    Distance only, the weight of the default matrices.
+    """
+    return attributes["distance"]
+
+def safest_weights(attributes: dict[str:np.ndarray]) -> np.ndarray:
+    """
+    Crime exposure: distance scaled by the crime rate relative to the network mean.
+    """
+    mean = attributes["crime_rate"].mean() if len(attributes["crime_rate"]) else 0.0
+    relative = attributes["crime_rate"] / mean if mean > 0 else np.ones_like(attributes["crime_rate"])
+    return attributes["distance"] * relative
+
+def balanced_weights(attributes: dict[str:np.ndarray]) -> np.ndarray:
+    """
+    Average of the fastest and safest weights, plus TRANSFER_PENALTY for each transfer.
+    """
+    return (fastest_weights(attributes) + safest_weights(attributes)) / 2 + TRANSFER_PENALTY * attributes["transfer"]
+
+COST_PROFILES = {
+    "fastest": fastest_weights,
+    "safest": safest_weights,
+    "balanced": balanced_weights,
+}
+
+# Module constants read by each profile: only these change its weights (see build_cache.build_keys)
+PROFILE_CONSTANTS = {
+    "fastest": (),
+    "safest": (),
+    "balanced": ("TRANSFER_PENALTY",),
+}
+
+@timed("floyd_warshall_profiles")
+def floyd_warshall_profiles(attributes: dict[str:np.ndarray], n: int, profiles: dict = None) -> dict[str:tuple[np.ndarray, np.ndarray]]:
+    """
+    Solve several cost profiles in one batched run over the same edge list.
+    Args:
+        attributes (dict[str:np.ndarray]): Edge attribute arrays from edge_attributes.
+        n (int): Number of vertices.
+        profiles (dict[str:callable]): Weight function of each profile; defaults to COST_PROFILES.
+    Returns:
+        dict[str:tuple[np.ndarray, np.ndarray]]: Length matrix and predecessor index matrix of each profile.
+    """
+    profiles = profiles if profiles is not None else COST_PROFILES
+    names = list(profiles)
+    origin, destiny = attributes["origin"], attributes["destiny"]
+    weights = np.stack([np.asarray(profiles[name](attributes), dtype=np.float64) for name in names])
+
+    progress(f"Getting Floyd Washal for {len(names)} profiles...")
+    distances = np.full((len(names), n, n), np.inf)
+    distances[:, origin, destiny] = weights
+    distances[:, destiny, origin] = weights
+    distances[:, np.arange(n), np.arange(n)] = 0
+    predecessors = np.full((n, n), -1, dtype=np.int32)
+    predecessors[origin, destiny] = origin
+    predecessors[destiny, origin] = destiny
+    np.fill_diagonal(predecessors, np.arange(n, dtype=np.int32))
+    predecessors = np.repeat(predecessors[None], len(names), axis=0)
+
+    # The profiles share the initial matrices but are relaxed one after the other: a stacked (P, n, n)
+    # relaxation is memory bound and measured slower than P cache-friendly passes over (n, n) matrices
+    for index in range(len(names)):
+        relax_numpy(distances[index], predecessors[index])
+    return {name: (distances[index], predecessors[index]) for index, name in enumerate(names)}
+
+def generate_profiles(profiles: dict = None, profiles_directory: str = PROFILES_DIRECTORY) -> dict[str:str]:
+    """
+    Build the network once, solve every profile and save each one as a binary artifact
+    in its own subdirectory (e.g. src/files/artifacts/profiles/safest).
+    Args:
+        profiles (dict[str:callable]): Weight function of each profile; defaults to COST_PROFILES.
+        profiles_directory (str): Parent directory of the profile artifacts.
+    Returns:
+        dict[str:str]: Artifact directory of each profile.
+    """
+    memo = distance_memo()
+    vertices, network = build_network(memo=memo)
+    attributes = edge_attributes(network, vertices, memo)
+    directories = {}
+    for name, (distances, predecessors) in floyd_warshall_profiles(attributes, len(vertices), profiles).items():
+        directories[name] = path.join(profiles_directory, name)
+        save_binary_artifacts(directories[name], distances, predecessors, vertices)
+    return directories
@@ -0,0 +1,295 @@
+from src.models.vertice_definition import vertice
+from src.models.graph_definition import graph
+from src.distance import distance_memo
+from .floyd_warshall import initial_matrices_numpy, relax_numpy, edge_distance, adjacent_pairs
+import heapq
+import threading
+import numpy as np
+
+"""
+dynamic_apsp.py
+---------------------
+Keeps the all-pairs distance and predecessor matrices up to date while edges change
+(segment or station closures and reopenings), without rerunning Floyd-Warshall.
+A weight decrease is applied with one O(n^2) relaxation through the changed edge.
+A weight increase or removal only repairs, for each source whose shortest path tree uses the edge,
+the subtree hanging below it. Every change can be rolled back.
+Changes are written into a private copy of the matrices, which is published as a read-only snapshot
+once the change is complete: a reader holding snapshot() never sees a half-repaired row.
+"""
+
+INF = float('inf')
+
+class dynamic_apsp:
+    """
+    All-pairs shortest paths over an undirected graph, maintained under edge updates.
+    Attributes:
+        distances (np.ndarray): float64 distance matrix (the copy being written during a change).
+        predecessors (np.ndarray): int32 predecessor index matrix (-1 means no predecessor).
+        matrices (tuple[np.ndarray, np.ndarray]): Published read-only distances and predecessors.
+        neighbors (list[dict[int:float]]): Current weight of the edges of each vertice index.
+        history (list[dict]): Undo records, one per applied change.
+        lock (threading.Lock): Held while a change is being written.
+    """
+    def __init__(self, distances: np.ndarray, predecessors: np.ndarray, edges: dict[tuple[int, int]:float]):
+        # Work on private, writable copies (the artifacts may be read-only memory maps)
+        self.distances = np.array(distances, dtype=np.float64)
+        self.predecessors = np.array(predecessors, dtype=np.int32)
+        self.neighbors = [dict() for _ in range(self.distances.shape[0])]
+        for (i, j), weight in edges.items():
+            self.neighbors[i][j] = weight
+            self.neighbors[j][i] = weight
+        self.history = []
+        self.lock = threading.Lock()
+        self._publish()
+
+    @classmethod
+    def from_graph(cls, graph: graph, vertices: list[vertice], memo: distance_memo = None, distances: np.ndarray = None, predecessors: np.ndarray = None) -> "dynamic_apsp":
+        """
+        Build the structure from the subway graph, with the same edge weights as the Floyd-Warshall matrices.
+        Args:
+            graph (graph): Graph with the adjacency list.
+            vertices (list[vertice]): List of vertice objects, defining the matrix indices.
+            memo (distance_memo): Distances of the current build.
+            distances (np.ndarray): Precomputed distance matrix (e.g. loaded artifacts); computed if None.
+            predecessors (np.ndarray): Precomputed predecessor index matrix; computed if None.
+        Returns:
+            dynamic_apsp: The structure.
+        """
+        memo = memo if memo is not None else distance_memo()
+        memo.prefetch(adjacent_pairs(graph.adjacency_list))
+        weights, initial_predecessors = initial_matrices_numpy(graph.adjacency_list, vertices, lambda i, j: edge_distance(i, j, memo))
+        rows, cols = np.nonzero(initial_predecessors >= 0)
+        edges = {(int(i), int(j)): float(weights[i, j]) for i, j in zip(rows, cols) if i < j}
+        if distances is None or predecessors is None:
+            distances, predecessors = relax_numpy(weights.copy(), initial_predecessors)
+        return cls(distances, predecessors, edges)
+
+    @classmethod
+    def from_attributes(cls, attributes: dict[str:np.ndarray], weights: np.ndarray, distances: np.ndarray, predecessors: np.ndarray) -> "dynamic_apsp":
+        """
+        Build the structure from the edge attribute arrays of cost_profiles and the matrices solved with their weights.
+        Args:
+            attributes (dict[str:np.ndarray]): Edge attribute arrays (origin and destiny indices).
+            weights (np.ndarray): Weight of each edge, as given by the profile of the matrices.
+            distances (np.ndarray): Distance matrix of those weights.
+            predecessors (np.ndarray): Predecessor index matrix of those weights.
+        Returns:
+            dynamic_apsp: The structure.
+        """
+        edges = {}
+        for i, j, weight in zip(attributes["origin"].tolist(), attributes["destiny"].tolist(), np.asarray(weights, dtype=np.float64).tolist()):
+            edges[(i, j)] = weight
+        return cls(distances, predecessors, edges)
+
+    def snapshot(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Distance and predecessor matrices after the last complete change, safe to read from any thread.
+        """
+        return self.matrices
+
+    def _publish(self):
+        self.distances.flags.writeable = False
+        self.predecessors.flags.writeable = False
+        self.matrices = (self.distances, self.predecessors)
+
+    def _begin(self):
+        # The published matrices stay untouched for the readers still holding them
+        self.distances = self.distances.copy()
+        self.predecessors = self.predecessors.copy()
+
+    def edge_weight(self, u: int, v: int) -> float:
+        """
+        Current weight of the edge between u and v (inf if there is none).
+        """
+        return self.neighbors[u].get(v, INF)
+
+    def update_edge(self, u: int, v: int, weight: float) -> int:
+        """
+        Set the weight of the edge between u and v (inf removes it) and update the matrices.
+        Args:
+            u (int): Index of one endpoint.
+            v (int): Index of the other endpoint.
+            weight (float): New weight.
+        Returns:
+            int: Number of changes in the history, to be used with rollback_to.
+        """
+        with self.lock:
+            self._begin()
+            record = {"edges": [], "cells": []}
+            self._set_edge(u, v, weight, record)
+            self.history.append(record)
+            self._publish()
+            return len(self.history)
+
+    def remove_edge(self, u: int, v: int) -> int:
+        """
+        Close the segment between u and v.
+        """
+        return self.update_edge(u, v, INF)
+
+    def close_station(self, index: int) -> int:
+        """
+        Close a station by removing all of its edges, recorded as a single change.
+        Args:
+            index (int): Index of the vertice.
+        Returns:
+            int: Number of changes in the history.
+        """
+        with self.lock:
+            self._begin()
+            record = {"edges": [], "cells": []}
+            for neighbor in list(self.neighbors[index]):
+                self._set_edge(index, neighbor, INF, record)
+            self.history.append(record)
+            self._publish()
+            return len(self.history)
+
+    def rollback(self, steps: int = 1):
+        """
+        Undo the last changes, restoring the edges and every matrix cell they modified.
+        Args:
+            steps (int): Number of changes to undo.
+        """
+        with self.lock:
+            self._begin()
+            for _ in range(min(steps, len(self.history))):
+                record = self.history.pop()
+                for rows, cols, old_distances, old_predecessors in reversed(record["cells"]):
+                    self.distances[rows, cols] = old_distances
+                    self.predecessors[rows, cols] = old_predecessors
+                for u, v, old_weight in reversed(record["edges"]):
+                    self._store_weight(u, v, old_weight)
+            self._publish()
+
+    def rollback_to(self, depth: int):
+        """
+        Undo changes until only depth of them remain in the history.
+        """
+        self.rollback(len(self.history) - depth)
+
+    def recompute(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Matrices of the current edges solved from scratch with Floyd-Warshall, to check the incremental updates.
+        """
+        n = len(self.neighbors)
+        distances = np.full((n, n), np.inf)
+        predecessors = np.full((n, n), -1, dtype=np.int32)
+        for i, edges in enumerate(self.neighbors):
+            for j, weight in edges.items():
+                distances[i, j] = weight
+                predecessors[i, j] = i
+        np.fill_diagonal(distances, 0)
+        np.fill_diagonal(predecessors, np.arange(n, dtype=np.int32))
+        return relax_numpy(distances, predecessors)
+
+    def _store_weight(self, u: int, v: int, weight: float):
+        if weight == INF:
+            self.neighbors[u].pop(v, None)
+            self.neighbors[v].pop(u, None)
+        else:
+            self.neighbors[u][v] = weight
+            self.neighbors[v][u] = weight
+
+    def _save_cells(self, record: dict, rows: np.ndarray, cols: np.ndarray):
+        record["cells"].append((rows, cols, self.distances[rows, cols].copy(), self.predecessors[rows, cols].copy()))
+
+    def _set_edge(self, u: int, v: int, weight: float, record: dict):
+        old_weight = self.edge_weight(u, v)
+        if weight == old_weight or u == v:
+            return
+        record["edges"].append((u, v, old_weight))
+        self._store_weight(u, v, weight)
+        if weight < old_weight:
+            self._decrease(u, v, weight, record)
+        else:
+            self._increase(u, v, record)
+
+    def _decrease(self, u: int, v: int, weight: float, record: dict):
+        """
+        O(n^2) relaxation of every pair through the edge, in both directions.
+        """
+        d = self.distances
+        p = self.predecessors
+        n = d.shape[0]
+        for a, b in ((u, v), (v, u)):
+            candidate = d[:, a, None] + weight + d[None, b, :]
+            improved = candidate < d
+            if not improved.any():
+                continue
+            rows, cols = np.nonzero(improved)
+            self._save_cells(record, rows, cols)
+            # The predecessor of j is its predecessor from b, or a itself when j is b
+            new_predecessor = np.where(np.arange(n) == b, a, p[b]).astype(np.int32)
+            d[rows, cols] = candidate[rows, cols]
+            p[rows, cols] = new_predecessor[cols]
+
+    def _subtrees(self, sources: np.ndarray, root: int) -> np.ndarray:
+        """
+        For each source, mask of the vertices whose shortest path from it goes through root (root included).
+        Ancestors are found for all sources at once by pointer doubling over the predecessor rows.
+        """
+        rows = self.predecessors[sources]
+        n = rows.shape[1]
+        index = np.arange(n, dtype=np.int32)
+        # Unreachable vertices point to themselves, like the sources, so every chain ends in a fixed point
+        ancestor = np.where(rows < 0, index[None, :], rows)
+        inside = np.broadcast_to(index == root, rows.shape).copy()
+        while True:
+            inside |= np.take_along_axis(inside, ancestor, axis=1)
+            next_ancestor = np.take_along_axis(ancestor, ancestor, axis=1)
+            if np.array_equal(next_ancestor, ancestor):
+                return inside
+            ancestor = next_ancestor
+
+    def _increase(self, u: int, v: int, record: dict):
+        """
+        Repair, for each source whose tree uses the edge, the distances of the subtree below it.
+        The subtrees of both directions are found on the old predecessors, before any row is repaired.
+        """
+        p = self.predecessors
+        repairs = []
+        for a, b in ((u, v), (v, u)):
+            sources = np.nonzero(p[:, b] == a)[0]
+            sources = sources[sources != b]
+            if len(sources):
+                repairs.append((sources, self._subtrees(sources, b)))
+
+        for sources, affected in repairs:
+            rows, cols = np.nonzero(affected)
+            self._save_cells(record, sources[rows], cols)
+            for position, source in enumerate(sources.tolist()):
+                self._repair_row(source, affected[position], np.nonzero(affected[position])[0])
+
+    def _repair_row(self, source: int, affected: np.ndarray, cols: np.ndarray):
+        """
+        Dijkstra restricted to the affected vertices, seeded from the unaffected ones around them.
+        """
+        d = self.distances[source].tolist()
+        p = self.predecessors[source].tolist()
+        affected = affected.tolist()
+        cols = cols.tolist()
+        for j in cols:
+            d[j] = INF
+            p[j] = -1
+        heap = []
+        for j in cols:
+            best, parent = INF, -1
+            for k, weight in self.neighbors[j].items():
+                if not affected[k] and d[k] + weight < best:
+                    best, parent = d[k] + weight, k
+            if parent >= 0:
+                d[j], p[j] = best, parent
+                heap.append((best, j))
+        heapq.heapify(heap)
+        while heap:
+            distance, j = heapq.heappop(heap)
+            if distance > d[j]:
+                continue
+            for k, weight in self.neighbors[j].items():
+                if affected[k] and distance + weight < d[k]:
+                    d[k] = distance + weight
+                    p[k] = j
+                    heapq.heappush(heap, (d[k], k))
+        self.distances[source, cols] = [d[j] for j in cols]
+        self.predecessors[source, cols] = [p[j] for j in cols]
@@ -2,18 +2,29 @@ from os import path
 from src.models.vertice_definition import vertice
 from src.models.edge_definition import edge
 from src.models.graph_definition import graph
-from geopy.distance import geodesic
+from src.models.vertex_registry_definition import vertex_registry
+from src.distance import distance_memo
 import math
 from src.file_operate import *
+from src.spatial_index import spatial_grid
+from src.instrumentation import timed, count, progress
 from .manage_files import *
+from .parallel_apsp import parallel_apsp, estimate_serial_seconds
+from .tiled_floyd_warshall import tiled_floyd_warshall, TILE_SIZE
 from typing import List
+import time
+import numpy as np
 
 AVERAGE_SPEED = 30
 SUBWAY_TICKET = 2.9
+ARTIFACTS_DIRECTORY = path.join("src", "files", "artifacts")
+GRAPH_FILE = path.join("src", "files", "graph.txt")  # Text graph file read by main_cli
+TRANSFER_RADIUS = 100  # Maximum walking transfer distance, in meters
    
+@timed("define_vertice")
 def define_vertice(data: list, id_start: int) -> list[vertice]:
     """
-    Create a list of unique vertice objects from the provided data, avoiding duplicates by coordinates.
+    Create a list of unique vertice objects from the provided data, avoiding duplicates by station name, line and complex.
     Args:
         data (list): List of lists containing station data.
         id_start (int): Initial ID to assign to the first vertice.
@@ -22,9 +33,9 @@ def define_vertice(data: list, id_start: int) -> list[vertice]:
     """
     
     new_vertices: List[vertice] = []
+    seen = set()
     current_id = id_start
     
-    
     for element in data[1:]:
         lat, lon = float(element[0]), float(element[1])
         station_name = str(element[3])
@@ -34,99 +45,129 @@ def define_vertice(data: list, id_start: int) -> list[vertice]:
         crime_rate_str = element[7].strip()
         crime_rate = float(crime_rate_str) if crime_rate_str != "" else 0.000072
 
-        exists = False
-        for v in new_vertices:
-            
-            if v.station_name == station_name and v.line == line and v.complex_id == complex_id:
-                exists = True
-                break
-        if exists:
+        key = (station_name, line, complex_id)
+        if key in seen:
             continue
-        else:
-            new_vertices.append(vertice(id=current_id, lat=lat, lon=lon, station_name=station_name,line=line, complex_id=complex_id, crime_rate=crime_rate))
-            current_id += 1
+        seen.add(key)
+        new_vertices.append(vertice(id=current_id, lat=lat, lon=lon, station_name=station_name,line=line, complex_id=complex_id, crime_rate=crime_rate))
+        current_id += 1
 
+    count("vertices", len(new_vertices))
     return new_vertices
 
+@timed("define_routes")
 def define_routes(vertices:list[vertice]) -> list[edge]:
     """
     Define the routes (edges) between vertices based on subway line and complex_id.
+    Vertices are grouped by line and by complex in a single pass; consecutive vertices of a line
+    are connected, and so is every pair of vertices of a complex. Each directed edge appears once.
     Args:
         vertices (list[vertice]): List of vertice objects.
     Returns:
         list[list[vertice, vertice]]: List of routes as pairs of vertice objects.
     """
     routes = []
-    lines = []
+    registry = set()
+    lines = {}
+    complexes = {}
     for element in vertices:
-        if not element.line in lines:
-            lines.append(element.line)
-    
-    for line in lines:
-        previous_vertice = None
-        for index, vertice in enumerate(vertices):
-            if vertice.line == line:
-                if previous_vertice is not None:
-                    routes.append(edge(origin=previous_vertice, destiny=vertice))
-                    routes.append(edge(origin=vertice, destiny=previous_vertice))
-
-                previous_vertice = vertice
-                            
-
-    for index, vertice in enumerate(vertices[:-1]):
-        for vertice2 in vertices[index+1:]:
-            if vertice.complex_id == vertice2.complex_id:
-                routes.append(edge(origin=vertice, destiny=vertice2))
-                routes.append(edge(origin=vertice2, destiny=vertice))
+        lines.setdefault(element.line, []).append(element)
+        complexes.setdefault(element.complex_id, []).append(element)
 
+    def add_route(origin, destiny):
+        for new_edge in (edge(origin=origin, destiny=destiny), edge(origin=destiny, destiny=origin)):
+            if new_edge not in registry:
+                registry.add(new_edge)
+                routes.append(new_edge)
+
+    for line_vertices in lines.values():
+        for previous_vertice, vertice in zip(line_vertices, line_vertices[1:]):
+            add_route(previous_vertice, vertice)
+
+    position = {}
+    for vertice in vertices:
+        members = complexes[vertice.complex_id]
+        start = position.get(vertice.complex_id, 0) + 1
+        position[vertice.complex_id] = start
+        for vertice2 in members[start:]:
+            add_route(vertice, vertice2)
+
+    count("routes", len(routes))
     return routes
 
-def get_graph(routes:list[edge], vertices:list[vertice]) -> graph:
+@timed("get_graph")
+def get_graph(routes:list[edge], vertices:list[vertice], memo:distance_memo=None) -> graph:
     """
     Build the graph as a dictionary mapping each vertice to its neighbors and the distance to them.
     Args:
         routes (list[list[vertice, vertice]]): List of routes as vertice pairs.
         vertices (list[vertice]): List of vertice objects.
+        memo (distance_memo): Distances of the current build, shared with the Floyd-Warshall weights.
     Returns:
         graph: Graph contains dictionary with adjacency list
     """
-    print("Getting graph...")
+    progress("Getting graph...")
+    memo = memo if memo is not None else distance_memo()
     adjacency_list = {}
     for vertice in vertices:
         adjacency_list[vertice] = []   
+    # Hashed registry of the directed edges already in the adjacency list
+    registry = set()
+    memo.prefetch((route.origin, route.destiny) for route in routes)
     for route in routes:
-        dist_destiny_origin = geodesic((route.origin.lat, route.origin.lon), (route.destiny.lat, route.destiny.lon)).kilometers
-        dist_origin_destiny = geodesic((route.destiny.lat, route.destiny.lon), (route.origin.lat, route.origin.lon)).kilometers
-        if not [route.destiny, dist_destiny_origin] in adjacency_list[route.origin]:
-            adjacency_list[route.origin].append((route.destiny, dist_destiny_origin, None))
-        if not [route.origin, dist_origin_destiny] in adjacency_list[route.destiny]:
-            adjacency_list[route.destiny].append((route.origin, dist_origin_destiny, None))
-    for v in vertices: 
-        for w in vertices:
-            dist_v_w = geodesic((v.lat, v.lon), (w.lat, w.lon)).meters
-            if v != w and v.complex_id != w.complex_id and v.line != w.line and dist_v_w <= 100:
-                if [w, dist_v_w, f"{v.id}|{w.id}"] not in adjacency_list[v]:
-                    adjacency_list[v].append((w, dist_v_w, f"{v.id}|{w.id}"))
-                if [v, dist_v_w, f"{w.id}|{v.id}"] not in adjacency_list[w]:
-                    adjacency_list[w].append((v, dist_v_w, f"{w.id}|{v.id}"))
+        distance = memo.kilometers(route.origin, route.destiny)
+        for origin, destiny in ((route.origin, route.destiny), (route.destiny, route.origin)):
+            new_edge = edge(origin=origin, destiny=destiny)
+            if new_edge not in registry:
+                registry.add(new_edge)
+                adjacency_list[origin].append((destiny, distance, None))
+    # Walking transfers: only pairs found by the spatial index get an exact distance
+    grid = spatial_grid.from_vertices(vertices, TRANSFER_RADIUS)
+    candidates = []
+    for index_v, index_w in grid.candidate_pairs():
+        v, w = vertices[index_v], vertices[index_w]
+        if v != w and v.complex_id != w.complex_id and v.line != w.line:
+            candidates.append((v, w))
+    memo.prefetch(candidates)
+    for v, w in candidates:
+        dist_v_w = memo.kilometers(v, w) * 1000
+        if dist_v_w <= TRANSFER_RADIUS:
+            for origin, destiny in ((v, w), (w, v)):
+                new_edge = edge(origin=origin, destiny=destiny)
+                if new_edge not in registry:
+                    registry.add(new_edge)
+                    adjacency_list[origin].append((destiny, dist_v_w, f"{origin.id}|{destiny.id}"))
     
+    count("edges", len(registry))
     return graph(adjacency_list=adjacency_list)
 
-def floyd_warshall_by_distance(graph:graph, vertices:list[vertice]) -> list[list[float]]:
+def adjacent_pairs(adjacency:dict[vertice:list[tuple[vertice, float]]]):
+    """
+    Yield every (vertice, neighbor) pair of an adjacency list.
+    """
+    for origin, elements in adjacency.items():
+        for element in elements:
+            yield origin, element[0]
+
+@timed("floyd_warshall")
+def floyd_warshall_by_distance(graph:graph, vertices:list[vertice], memo:distance_memo=None) -> list[list[float]]:
     """
     Compute shortest paths and predecessors for all pairs of vertices using the Floyd-Warshall algorithm.
     Args:
         graph (dict[vertice, list[list[vertice, float]]]): The graph dictionary.
         vertices (list[vertice]): List of vertice objects.
+        memo (distance_memo): Distances of the current build.
     Returns:
         list: A pair [distance_matrix, predecessor_matrix].
     """
     subgraphs = []
     predecessor = []
-    print("Getting Floyd Washal...")
+    progress("Getting Floyd Washal...")
 
     n = len(vertices)
     adjacency = graph.adjacency_list
+    memo = memo if memo is not None else distance_memo()
+    memo.prefetch(adjacent_pairs(adjacency))
     subgraphs = [[float('inf')] * n for _ in range(n)]
     predecessor = [[None] * n for _ in range(n)]
     for i in range(n):
@@ -139,7 +180,7 @@ def floyd_warshall_by_distance(graph:graph, vertices:list[vertice]) -> list[list
             ids.append(elements_i[0].id)
         for index_j, j in enumerate(vertices):
             if i in adjacency.keys() and j.id in ids:
-                dis = geodesic((i.lat, i.lon), (j.lat, j.lon)).kilometers
+                dis = memo.kilometers(i, j)
                 if i.complex_id == j.complex_id:
                     dis = 0
                 subgraphs[index_i][index_j] = dis
@@ -148,6 +189,7 @@ def floyd_warshall_by_distance(graph:graph, vertices:list[vertice]) -> list[list
                 predecessor[index_j][index_i] = j
 
     size = len(subgraphs)
+    count("relaxations", size ** 3)
     for index_k in range(size):
         for index_i in range(size):
             for index_j in range(size):     
@@ -178,20 +220,24 @@ def calc_factor(wheight_a:float, distance:float, wheight_b:float, crimes:int, ri
         return 0
     return (wheight_a * distance) + (wheight_b * crimes_per_rider)
     
-def floyd_warshall_by_factor(graph:dict[vertice:list[vertice]], vertices:list[vertice]) -> list[list[float]]:
+@timed("floyd_warshall")
+def floyd_warshall_by_factor(graph:dict[vertice:list[vertice]], vertices:list[vertice], memo:distance_memo=None) -> list[list[float]]:
     """
     Compute shortest paths and predecessors for all pairs of vertices using the Floyd-Warshall algorithm.
     Args:
         graph (dict[vertice, list[list[vertice, float]]]): The graph dictionary.
         vertices (list[vertice]): List of vertice objects.
+        memo (distance_memo): Distances of the current build.
     Returns:
         list: A pair [distance_matrix, predecessor_matrix].
     """
     subgraphs = []
     predecessor = []
-    print("Getting Floyd Washal...")
+    progress("Getting Floyd Washal...")
 
     n = len(vertices)
+    memo = memo if memo is not None else distance_memo()
+    memo.prefetch(adjacent_pairs(graph))
     subgraphs = [[float('inf')] * n for _ in range(n)]
     predecessor = [[None] * n for _ in range(n)]
     for i in range(n):
@@ -202,11 +248,10 @@ def floyd_warshall_by_factor(graph:dict[vertice:list[vertice]], vertices:list[ve
         for index_j, j in enumerate(vertices):
             
             ids = []
-            dis = geodesic((i.lat, i.lon), (j.lat, j.lon)).kilometers
-            
             for elements_i in  graph[i]:
                 ids.append(elements_i[0].id)
             if i in graph.keys() and j.id in ids:
+                dis = memo.kilometers(i, j)
                 if i.complex_id == j.complex_id:
                     dis = 0
                     
@@ -217,6 +262,7 @@ def floyd_warshall_by_factor(graph:dict[vertice:list[vertice]], vertices:list[ve
                 predecessor[index_j][index_i] = j
 
     size = len(subgraphs)
+    count("relaxations", size ** 3)
     for index_k in range(size):
         for index_i in range(size):
             for index_j in range(size):                
@@ -227,6 +273,124 @@ def floyd_warshall_by_factor(graph:dict[vertice:list[vertice]], vertices:list[ve
                     predecessor[index_j][index_i] = predecessor[index_k][index_i]
     return [subgraphs, predecessor]
 
+def edge_distance(origin:vertice, destiny:vertice, memo:distance_memo) -> float:
+    """
+    Distance in kilometers used as the initial weight of an edge in the Floyd-Warshall matrices.
+    Vertices of the same complex are connected at no cost.
+    Args:
+        origin (vertice): Origin vertice of the edge.
+        destiny (vertice): Destiny vertice of the edge.
+        memo (distance_memo): Distances of the current build.
+    Returns:
+        float: Distance in kilometers, or 0 when both vertices share a complex.
+    """
+    if origin.complex_id == destiny.complex_id:
+        return 0
+    return memo.kilometers(origin, destiny)
+
+def initial_matrices_numpy(adjacency:dict[vertice:list[tuple[vertice, float]]], vertices:list[vertice], weight_function) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Build the initial distance and predecessor matrices as NumPy arrays.
+    The weight of each adjacent pair is computed by weight_function(i, j), where i is the vertice whose adjacency list is being read.
+    Args:
+        adjacency (dict[vertice, list[tuple[vertice, float]]]): Adjacency list of the graph.
+        vertices (list[vertice]): List of vertice objects, defining the matrix indices.
+        weight_function (callable): Function receiving two vertices and returning the edge weight.
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Float64 distance matrix and int32 predecessor index matrix (-1 means no predecessor).
+    """
+    n = len(vertices)
+    index_of = {v: index for index, v in enumerate(vertices)}
+    distances = np.full((n, n), np.inf, dtype=np.float64)
+    predecessors = np.full((n, n), -1, dtype=np.int32)
+    np.fill_diagonal(distances, 0)
+    np.fill_diagonal(predecessors, np.arange(n, dtype=np.int32))
+
+    for index_i, i in enumerate(vertices):
+        for element in adjacency.get(i, []):
+            index_j = index_of.get(element[0])
+            if index_j is None:
+                continue
+            dis = weight_function(i, vertices[index_j])
+            distances[index_i, index_j] = dis
+            distances[index_j, index_i] = dis
+            predecessors[index_i, index_j] = index_i
+            predecessors[index_j, index_i] = index_j
+    return distances, predecessors
+
+def relax_numpy(distances:np.ndarray, predecessors:np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Run the Floyd-Warshall relaxation in place, one intermediate vertice k at a time.
+    Row k and column k are broadcast against each other, so each step is a single vectorized operation over the matrix.
+    A path is only replaced when it is strictly shorter, like in the pure Python loop.
+    Args:
+        distances (np.ndarray): Square float distance matrix.
+        predecessors (np.ndarray): Square int32 predecessor index matrix.
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The relaxed distance and predecessor matrices.
+    """
+    n = distances.shape[0]
+    for k in range(n):
+        candidate = distances[:, k, None] + distances[None, k, :]
+        improved = candidate < distances
+        if not improved.any():
+            continue
+        np.copyto(distances, candidate, where=improved)
+        np.copyto(predecessors, predecessors[k].copy(), where=improved)
+    count("relaxations", n ** 3)
+    return distances, predecessors
+
+@timed("floyd_warshall")
+def floyd_warshall_by_distance_numpy(graph:graph, vertices:list[vertice], memo:distance_memo=None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized version of floyd_warshall_by_distance.
+    Args:
+        graph (graph): Graph with the adjacency list.
+        vertices (list[vertice]): List of vertice objects.
+        memo (distance_memo): Distances of the current build.
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Distance matrix (km) and predecessor index matrix.
+    """
+    progress("Getting Floyd Washal...")
+    memo = memo if memo is not None else distance_memo()
+    memo.prefetch(adjacent_pairs(graph.adjacency_list))
+    distances, predecessors = initial_matrices_numpy(graph.adjacency_list, vertices, lambda i, j: edge_distance(i, j, memo))
+    return relax_numpy(distances, predecessors)
+
+@timed("floyd_warshall")
+def floyd_warshall_by_factor_numpy(graph:dict[vertice:list[vertice]], vertices:list[vertice], memo:distance_memo=None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized version of floyd_warshall_by_factor.
+    Args:
+        graph (dict[vertice, list[list[vertice, float]]]): The graph dictionary.
+        vertices (list[vertice]): List of vertice objects.
+        memo (distance_memo): Distances of the current build.
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Factor matrix and predecessor index matrix.
+    """
+    progress("Getting Floyd Washal...")
+    memo = memo if memo is not None else distance_memo()
+    memo.prefetch(adjacent_pairs(graph))
+    factor = lambda i, j: calc_factor(2, edge_distance(i, j, memo), 1, i.total_crimes, i.total_riders)
+    distances, predecessors = initial_matrices_numpy(graph, vertices, factor)
+    return relax_numpy(distances, predecessors)
+
+def predecessors_to_vertices(predecessors:np.ndarray, vertices:list[vertice]) -> list[list[vertice]]:
+    """
+    Convert a predecessor index matrix into the vertice matrix used by get_short_path and the text files.
+    Args:
+        predecessors (np.ndarray): Predecessor index matrix (-1 means no predecessor).
+        vertices (list[vertice]): List of vertice objects.
+    Returns:
+        list[list[vertice]]: Predecessor matrix with vertice objects or None.
+    """
+    return [[vertices[p] if p >= 0 else None for p in row] for row in predecessors.tolist()]
+
+FLOYD_WARSHALL_ENGINES = {
+    "python": floyd_warshall_by_distance,
+    "numpy": floyd_warshall_by_distance_numpy,
+}
+
 def load_graph_from_file(filepath:str) -> dict[vertice:list[list[vertice, float]]]:
     """
     Load a graph from a file in the custom format used by this project.
@@ -252,75 +416,212 @@ def load_graph_from_file(filepath:str) -> dict[vertice:list[list[vertice, float]
                     graph[v].append([v2, weight])
     return graph
 
-def get_short_path(vertices: list[vertice], predecessors: list[list[vertice]], origin:vertice, destiny:vertice) -> list[vertice]:
+def as_registry(vertices) -> vertex_registry:
+    """
+    Return the vertices as a vertex_registry, building one if a plain list is given.
+    """
+    return vertices if isinstance(vertices, vertex_registry) else vertex_registry(vertices)
+
+def get_short_path(vertices: list[vertice] | vertex_registry, predecessors: list[list[vertice]], origin:vertice, destiny:vertice) -> list[vertice]:
     """
     Retrieve the shortest path between two vertices using the predecessor matrix.
     Args:
-        vertices (list[vertice]): List of vertice objects.
+        vertices (list[vertice] | vertex_registry): Vertices in matrix order; pass a registry to reuse it across queries.
         predecessors (list[list[vertice]]): Predecessor matrix from Floyd-Warshall.
         origin (vertice): Starting vertice.
         destiny (vertice): Destination vertice.
     Returns:
         list[vertice]: List of vertices representing the shortest path, or empty if not found.
     """
-    path = []
-    try:
-        i = vertices.index(origin)
-        j = vertices.index(destiny)
-    except StopIteration:
+    registry = as_registry(vertices)
+    i = registry.index_of(origin)
+    j = registry.index_of(destiny)
+    if i is None or j is None:
         print("Erro: origin and destiny outside from the list.")
         return []
 
     if predecessors[i][j] is None:
-        if int(origin.id) == int(destiny.id):
+        if i == j:
             return [origin]
         print("Any path founded.")
         return []
 
-    current = destiny
-    path_length = 0
-    max_path_length = len(vertices)  
-    
-    while int(current.id) != int(origin.id) and path_length <= max_path_length:
-        path.insert(0, current)
-        current_idx = vertices.index(current)
-        pred = predecessors[i][current_idx]
-        
-        if pred is None:
+    row = predecessors[i]
+    indices = [j]
+    while indices[-1] != i and len(indices) <= len(registry):
+        pred = row[indices[-1]]
+        index = registry.index_of(pred) if pred is not None else None
+        if index is None:
             print("Incomplete path.")
             return []
-            
-        current = pred
-        path_length += 1
+        indices.append(index)
 
-    if path_length > max_path_length:
+    if indices[-1] != i:
         print("Possibility of cicle.")
         return []
 
-    path.insert(0, origin)
-    return path
+    indices.reverse()
+    return [registry[index] for index in indices]
 
-def generate_floyd_warshall():
+def build_network(file_path:str=path.join("src","subway_files", "all_stations_results.csv"), memo:distance_memo=None) -> tuple[list[vertice], graph]:
     """
-    Generate the Floyd-Warshall matrices and save them to files for later use.
-    Reads station data, builds the graph, computes shortest paths, and saves results.
+    Read the station data and build the vertices and graph of the subway network.
+    Args:
+        file_path (str): Path to the stations CSV file.
+        memo (distance_memo): Distances of the current build, filled while building the graph.
+    Returns:
+        tuple[list[vertice], graph]: The vertices and the graph built from them.
     """
-    file_path = path.join("src","subway_files", "all_stations_results.csv")
-    
     id_counter = 1
-    vertices = []
-    routes = []
     data = load_data_csv(file_path)
-    # print(data)
     vertices = define_vertice(data, id_counter)
     routes = define_routes(vertices)
-        
-    id_counter = len(vertices)
+    graph = get_graph(routes, vertices, memo)
+    return vertices, graph
+
+def get_short_path_indexed(vertices: list[vertice] | vertex_registry, predecessors: np.ndarray, origin:vertice, destiny:vertice) -> list[vertice]:
+    """
+    Retrieve the shortest path between two vertices using a predecessor index matrix (binary artifacts).
+    Args:
+        vertices (list[vertice] | vertex_registry): Vertices in matrix order; pass a registry to reuse it across queries.
+        predecessors (np.ndarray): Predecessor index matrix (-1 means no predecessor).
+        origin (vertice): Starting vertice.
+        destiny (vertice): Destination vertice.
+    Returns:
+        list[vertice]: List of vertices representing the shortest path, or empty if not found.
+    """
+    registry = as_registry(vertices)
+    i = registry.index_of(origin)
+    j = registry.index_of(destiny)
+    if i is None or j is None:
+        print("Erro: origin and destiny outside from the list.")
+        return []
+    if i == j:
+        return [origin]
 
-    graph = get_graph(routes, vertices)
-    floyd_warshall_result, predecessors = floyd_warshall_by_distance(graph, vertices) 
+    row = predecessors[i]
+    if row[j] < 0:
+        print("Any path founded.")
+        return []
+
+    indices = [j]
+    while indices[-1] != i and len(indices) <= len(registry):
+        pred = int(row[indices[-1]])
+        if pred < 0:
+            print("Incomplete path.")
+            return []
+        indices.append(pred)
+
+    if indices[-1] != i:
+        print("Possibility of cicle.")
+        return []
+
+    indices.reverse()
+    return [registry[index] for index in indices]
+
+def get_short_paths_batch(vertices: list[vertice] | vertex_registry, predecessors: np.ndarray, origins, destinies, as_indices:bool=False) -> list[list]:
+    """
+    Retrieve many shortest paths at once from a predecessor index matrix.
+    All the paths are walked back together, one NumPy step per hop, and each one is reversed once at the end.
+    Args:
+        vertices (list[vertice] | vertex_registry): Vertices in matrix order.
+        predecessors (np.ndarray): Predecessor index matrix (-1 means no predecessor).
+        origins (array-like[int]): Matrix index of the origin of each path.
+        destinies (array-like[int]): Matrix index of the destiny of each path.
+        as_indices (bool): If True, return matrix indices instead of vertice objects.
+    Returns:
+        list[list]: One path per pair, empty when there is no path.
+    """
+    registry = as_registry(vertices)
+    origins = np.asarray(origins, dtype=np.int64)
+    destinies = np.asarray(destinies, dtype=np.int64)
+    found = (origins == destinies) | (predecessors[origins, destinies] >= 0)
+
+    current = destinies.copy()
+    steps = [current]
+    active = found & (current != origins)
+    for _ in range(len(registry)):
+        if not active.any():
+            break
+        pred = predecessors[origins[active], current[active]]
+        # A missing predecessor in the middle of a path means the matrix is incomplete
+        broken = np.flatnonzero(active)[pred < 0]
+        found[broken] = False
+        current = current.copy()
+        current[active] = np.where(pred < 0, current[active], pred)
+        steps.append(current)
+        active &= found & (current != origins)
+    found &= ~active  # Still walking after n steps: a cycle
+
+    walked = np.stack(steps, axis=1)
+    lengths = np.argmax(walked == origins[:, None], axis=1) + 1
+    paths = []
+    for k in range(len(origins)):
+        if not found[k]:
+            paths.append([])
+            continue
+        indices = walked[k, lengths[k] - 1::-1].tolist()
+        paths.append(indices if as_indices else [registry[index] for index in indices])
+    return paths
+
+@timed("generate_floyd_warshall")
+def generate_floyd_warshall(engine:str="numpy", legacy_text:bool=False, artifacts_directory:str=ARTIFACTS_DIRECTORY, workers:int=1, tile_size:int=TILE_SIZE, dtype=np.float64, measure_speedup:bool=False):
+    """
+    Generate the Floyd-Warshall matrices and save them to files for later use.
+    Reads station data, builds the graph, computes shortest paths, and saves results.
+    The matrices are saved in the binary memory-mapped format; the legacy text files are optional.
+    The build manifest and the network cache are written with them (see build_cache.record_artifacts),
+    so ensure_artifacts keeps these matrices while the inputs do not change.
+    Args:
+        engine (str): "numpy" for the vectorized engine, "python" for the pure Python loops, or "tiled" for
+            the out-of-core blocked engine, which computes directly in the artifact files and resumes interrupted runs.
+        legacy_text (bool): Also write the legacy text matrix and predecessor files.
+        artifacts_directory (str): Directory of the binary artifacts.
+        workers (int): With more than one worker, the matrices are computed by a process pool
+            (one Dijkstra per origin, see parallel_apsp) instead of the engine, and the speedup over one core is printed.
+        tile_size (int): Tile side of the "tiled" engine.
+        dtype: np.float64 or np.float32, storage type of the length matrix.
+        measure_speedup (bool): Time a real single-worker run of parallel_apsp for the speedup, instead of
+            estimating the single-core time from a sample of origins (estimate_serial_seconds).
+    """
+    if engine not in FLOYD_WARSHALL_ENGINES and engine != "tiled":
+        raise ValueError(f"Unknown Floyd-Warshall engine: {engine}")
+
+    memo = distance_memo()
+    vertices, graph = build_network(memo=memo)
+    if workers > 1:
+        from .query_engine import build_csr_graph  # query_engine imports this module
+        csr = build_csr_graph(graph, vertices, memo=memo)
+        progress(f"Getting all-pairs paths on {workers} workers...")
+        start = time.perf_counter()
+        floyd_warshall_result, predecessors = parallel_apsp(csr, workers)
+        elapsed = time.perf_counter() - start
+        if measure_speedup:
+            start = time.perf_counter()
+            parallel_apsp(csr, 1)
+            serial = time.perf_counter() - start
+            progress(f"Parallel APSP: {elapsed:.2f} s on {workers} workers, {serial:.2f} s on 1 worker (measured speedup {serial / elapsed:.1f}x)")
+        else:
+            serial = estimate_serial_seconds(csr)
+            progress(f"Parallel APSP: {elapsed:.2f} s on {workers} workers, {serial:.2f} s estimated on one core from a sample of origins (estimated speedup {serial / elapsed:.1f}x)")
+    elif engine == "tiled":
+        memo.prefetch(adjacent_pairs(graph.adjacency_list))
+        floyd_warshall_result, predecessors = tiled_floyd_warshall(graph, vertices, artifacts_directory, lambda i, j: edge_distance(i, j, memo), tile_size, dtype)
+    else:
+        floyd_warshall_result, predecessors = FLOYD_WARSHALL_ENGINES[engine](graph, vertices, memo)
+        if engine == "python":
+            predecessors = predecessors_to_indices(predecessors, vertices)
     
-    save_graph_to_file(graph, "src\\files\\graph.txt")
-    save_fload_warshall_to_file(floyd_warshall_result, "src\\files\\floyd_washal_lenght.txt")
-    save_predecessors_to_file(predecessors, "src\\files\\predecessors.txt")
-    save_vertices_to_file(vertices, "src\\files\\vertices.txt")
+    count("distance_cache_hits", memo.hits)
+    count("distance_computations", len(memo.cache))
+    save_graph_to_file(graph, GRAPH_FILE)
+    # The tiled engine has already written its result as binary artifacts
+    if engine != "tiled" or workers > 1:
+        save_binary_artifacts(artifacts_directory, floyd_warshall_result, predecessors, vertices, dtype)
+    from .build_cache import record_artifacts  # build_cache imports this module
+    build = {"engine": "parallel_apsp" if workers > 1 else engine, "workers": workers, "tile_size": tile_size if engine == "tiled" and workers == 1 else None}
+    record_artifacts(artifacts_directory, vertices, graph, memo, dtype, build=build)
+    if legacy_text:
+        save_fload_warshall_to_file(np.asarray(floyd_warshall_result).tolist(), "src\\files\\floyd_washal_lenght.txt")
+        save_predecessors_to_file(predecessors_to_vertices(predecessors, vertices), "src\\files\\predecessors.txt")
+        save_vertices_to_file(vertices, "src\\files\\vertices.txt")
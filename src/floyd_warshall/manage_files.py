@@ -1,5 +1,26 @@
 from src.models.vertice_definition import vertice
 from src.models.graph_definition import graph
+from src.models.vertex_table_definition import vertex_table
+from src.instrumentation import timed
+import numpy as np
+import json
+import os
+
+BINARY_FORMAT_VERSION = 1
+BINARY_MANIFEST = "manifest.json"
+BINARY_LENGTHS = "lengths.npy"
+BINARY_PREDECESSORS = "predecessors.npy"
+BINARY_VERTICES = "vertices.npy"
+BUILD_MANIFEST = "build_manifest.json"  # Inputs and parameters of the artifacts, written by build_cache
+VERTEX_TABLE_DTYPE = np.dtype([
+    ("id", np.int32),
+    ("lat", np.float64),
+    ("lon", np.float64),
+    ("station_name", "U64"),
+    ("line", "U16"),
+    ("complex_id", np.int32),
+    ("crime_rate", np.float64),
+])
 
 
 def save_graph_to_file(graph: graph, filepath:str):
@@ -11,6 +32,7 @@ def save_graph_to_file(graph: graph, filepath:str):
         filepath (str): Path to the output file.
     """
     adjacency = graph.adjacency_list
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
     with open(filepath, "w") as file:
         for key in adjacency.keys():
             temp = adjacency[key]
@@ -115,6 +137,24 @@ def load_predecessors_from_file(filepath:str) -> list[list[vertice]]:
                         predecessors[index].append(values)
     return predecessors
 
+def load_predecessor_indices_from_file(filepath:str, vertices:list[vertice]) -> np.ndarray:
+    """
+    Load the legacy predecessors file as an int32 index matrix, reading only the id of each cell
+    instead of creating a vertice object per cell like load_predecessors_from_file.
+    Args:
+        filepath (str): Path to the file containing the predecessors data.
+        vertices (list): Vertices (or a vertex_table) defining the indices.
+    Returns:
+        np.ndarray: Predecessor index matrix (-1 means no predecessor).
+    """
+    index_of = {int(v.id): index for index, v in enumerate(vertices)}
+    predecessors = np.full((len(vertices), len(vertices)), -1, dtype=np.int32)
+    with open(filepath, "r") as file:
+        for i, line in enumerate(file):
+            cells = [cell for cell in line.strip().split("@") if cell]
+            predecessors[i] = [-1 if cell == "None" else index_of[int(cell.split(";", 1)[0])] for cell in cells]
+    return predecessors
+
 def load_vertices_from_file(filepath:str) -> list[vertice]:
     """
     Load a list of vertices from a file in the custom format.
@@ -155,3 +195,158 @@ def load_length_matrix_from_file(filepath:str) -> list[list[float]]:
             if row:  
                 lengh_matrix.append(row)
     return lengh_matrix
+
+def vertices_to_table(vertices:list[vertice]) -> np.ndarray:
+    """
+    Pack a list of vertices into a structured array (the binary vertex table).
+    Args:
+        vertices (list): List of vertice objects.
+    Returns:
+        np.ndarray: Structured array with VERTEX_TABLE_DTYPE.
+    """
+    table = np.empty(len(vertices), dtype=VERTEX_TABLE_DTYPE)
+    for index, v in enumerate(vertices):
+        table[index] = (int(v.id), float(v.lat), float(v.lon), str(v.station_name), str(v.line), int(v.complex_id), float(v.crime_rate))
+    return table
+
+def table_to_vertices(table:np.ndarray) -> list[vertice]:
+    """
+    Build vertice objects from a binary vertex table.
+    Args:
+        table (np.ndarray): Structured array with VERTEX_TABLE_DTYPE.
+    Returns:
+        list: List of vertice objects, in table order.
+    """
+    return [vertice(int(row["id"]), float(row["lat"]), float(row["lon"]), str(row["station_name"]), str(row["line"]), int(row["complex_id"]), float(row["crime_rate"])) for row in table]
+
+def predecessors_to_indices(predecessors:list[list[vertice]], vertices:list[vertice]) -> np.ndarray:
+    """
+    Convert a predecessor matrix of vertice objects into an int32 index matrix (-1 means no predecessor).
+    Args:
+        predecessors (list): Predecessor matrix with vertice objects or None.
+        vertices (list): List of vertice objects, defining the indices.
+    Returns:
+        np.ndarray: The predecessor index matrix.
+    """
+    index_of = {int(v.id): index for index, v in enumerate(vertices)}
+    result = np.full((len(predecessors), len(vertices)), -1, dtype=np.int32)
+    for i, row in enumerate(predecessors):
+        result[i] = [-1 if p is None else index_of[int(p.id)] for p in row]
+    return result
+
+@timed("save_binary_artifacts")
+def save_binary_artifacts(directory:str, lengths, predecessors:np.ndarray, vertices:list[vertice], dtype=np.float64):
+    """
+    Save the Floyd-Warshall result in the versioned binary format.
+    The directory holds a .npy length matrix, an int32 .npy predecessor index matrix,
+    a .npy vertex table and a manifest with the format version.
+    Args:
+        directory (str): Output directory, created if missing.
+        lengths (np.ndarray | list): Length (distance) matrix.
+        predecessors (np.ndarray): Predecessor index matrix (-1 means no predecessor).
+        vertices (list): List of vertice objects, defining the indices.
+        dtype: np.float32 or np.float64, storage type of the length matrix.
+    """
+    os.makedirs(directory, exist_ok=True)
+    # New matrices are no longer described by the build manifest of the old ones
+    if os.path.exists(os.path.join(directory, BUILD_MANIFEST)):
+        os.remove(os.path.join(directory, BUILD_MANIFEST))
+    lengths = np.asarray(lengths, dtype=dtype)
+    predecessors = np.asarray(predecessors, dtype=np.int32)
+    np.save(os.path.join(directory, BINARY_LENGTHS), lengths)
+    np.save(os.path.join(directory, BINARY_PREDECESSORS), predecessors)
+    save_binary_vertices(directory, vertices, dtype)
+
+def save_binary_vertices(directory:str, vertices:list[vertice], dtype=np.float64):
+    """
+    Write the vertex table and the manifest of a binary artifact directory, completing it
+    once the length and predecessor .npy matrices are in place (e.g. written through a memmap).
+    Args:
+        directory (str): Artifact directory.
+        vertices (list): List of vertice objects, defining the indices.
+        dtype: Storage type of the length matrix.
+    """
+    np.save(os.path.join(directory, BINARY_VERTICES), vertices_to_table(vertices))
+    manifest = {
+        "format_version": BINARY_FORMAT_VERSION,
+        "vertices": len(vertices),
+        "length_dtype": np.dtype(dtype).name,
+        "predecessor_dtype": "int32",
+    }
+    with open(os.path.join(directory, BINARY_MANIFEST), "w") as file:
+        json.dump(manifest, file, indent=2)
+
+def binary_artifacts_exist(directory:str) -> bool:
+    """
+    Check if a directory holds a complete set of binary artifacts.
+    Args:
+        directory (str): Artifact directory.
+    Returns:
+        bool: True if the manifest and all matrices are present.
+    """
+    names = [BINARY_MANIFEST, BINARY_LENGTHS, BINARY_PREDECESSORS, BINARY_VERTICES]
+    return all(os.path.isfile(os.path.join(directory, name)) for name in names)
+
+def load_binary_artifacts(directory:str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Open the binary artifacts memory-mapped (read only), so loading is near-instant and
+    the pages are shared between processes through the page cache.
+    Args:
+        directory (str): Artifact directory.
+    Returns:
+        tuple: (length matrix, predecessor index matrix, vertex table).
+    """
+    with open(os.path.join(directory, BINARY_MANIFEST), "r") as file:
+        manifest = json.load(file)
+    if manifest.get("format_version") != BINARY_FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format version: {manifest.get('format_version')}")
+
+    lengths = np.load(os.path.join(directory, BINARY_LENGTHS), mmap_mode="r")
+    predecessors = np.load(os.path.join(directory, BINARY_PREDECESSORS), mmap_mode="r")
+    table = np.load(os.path.join(directory, BINARY_VERTICES), mmap_mode="r")
+    if lengths.shape != predecessors.shape or lengths.shape[0] != len(table):
+        raise ValueError(f"Inconsistent artifact shapes in {directory}")
+    return lengths, predecessors, table
+
+@timed("load_binary_network")
+def load_binary_network(directory:str) -> tuple[np.ndarray, np.ndarray, vertex_table]:
+    """
+    Open the binary artifacts with the vertices as a compact vertex_table instead of vertice objects.
+    Args:
+        directory (str): Artifact directory.
+    Returns:
+        tuple: (length matrix, predecessor index matrix, vertex_table).
+    """
+    lengths, predecessors, table = load_binary_artifacts(directory)
+    return lengths, predecessors, vertex_table.from_array(table)
+
+def convert_text_to_binary(lengths_path:str, predecessors_path:str, vertices_path:str, directory:str, dtype=np.float64):
+    """
+    Convert the legacy text files (length matrix, predecessors and vertices) into binary artifacts.
+    Args:
+        lengths_path (str): Path to the legacy length matrix file.
+        predecessors_path (str): Path to the legacy predecessors file.
+        vertices_path (str): Path to the legacy vertices file.
+        directory (str): Output directory of the binary artifacts.
+        dtype: np.float32 or np.float64, storage type of the length matrix.
+    """
+    vertices = load_vertices_from_file(vertices_path)
+    lengths = np.loadtxt(lengths_path, dtype=np.float64, ndmin=2)
+    predecessors = load_predecessor_indices_from_file(predecessors_path, vertices)
+
+    save_binary_artifacts(directory, lengths, predecessors, vertices, dtype=dtype)
+
+def convert_binary_to_text(directory:str, lengths_path:str, predecessors_path:str, vertices_path:str):
+    """
+    Write binary artifacts back to the legacy text files.
+    Args:
+        directory (str): Directory of the binary artifacts.
+        lengths_path (str): Output path of the legacy length matrix file.
+        predecessors_path (str): Output path of the legacy predecessors file.
+        vertices_path (str): Output path of the legacy vertices file.
+    """
+    lengths, predecessors, table = load_binary_artifacts(directory)
+    vertices = table_to_vertices(table)
+    save_fload_warshall_to_file(lengths.tolist(), lengths_path)
+    save_predecessors_to_file([[vertices[p] if p >= 0 else None for p in row] for row in predecessors.tolist()], predecessors_path)
+    save_vertices_to_file(vertices, vertices_path)
@@ -0,0 +1,221 @@
+from .floyd_warshall import AVERAGE_SPEED, ARTIFACTS_DIRECTORY
+from .manage_files import load_binary_artifacts
+from os import path
+import argparse
+import os
+import numpy as np
+
+"""
+od_analytics.py
+---------------------
+Origin-destination analytics derived from the Floyd-Warshall length matrix (kilometers):
+travel-time matrices in minutes at AVERAGE_SPEED, accessibility metrics per station and
+line-to-line summaries. Every computation walks the matrix in blocks of rows, so a memory-mapped
+artifact is never copied whole and no Python list of n^2 values is built.
+The module is also a command-line tool:
+    python -m src.floyd_warshall.od_analytics --output src/files/od
+"""
+
+BLOCK_ROWS = 256
+ACCESSIBILITY_THRESHOLDS = (15, 30, 45, 60)  # Minutes
+OD_COLUMNS = ("origin_id", "destiny_id", "minutes")
+
+def travel_minutes(lengths: np.ndarray, speed: float = AVERAGE_SPEED) -> np.ndarray:
+    """
+    Convert distances in kilometers to travel times in minutes.
+    Args:
+        lengths (np.ndarray): Distances in kilometers (inf when there is no path).
+        speed (float): Average speed in km/h.
+    Returns:
+        np.ndarray: Travel times in minutes, inf when there is no path.
+    """
+    return np.asarray(lengths, dtype=np.float64) * (60.0 / speed)
+
+def row_blocks(n: int, block_rows: int = BLOCK_ROWS):
+    """
+    Yield (start, end) bounds of consecutive blocks of rows.
+    """
+    for start in range(0, n, block_rows):
+        yield start, min(start + block_rows, n)
+
+def station_accessibility(lengths: np.ndarray, speed: float = AVERAGE_SPEED, thresholds=ACCESSIBILITY_THRESHOLDS, block_rows: int = BLOCK_ROWS) -> dict[str:np.ndarray]:
+    """
+    Accessibility metrics of each station, as origin, over the other reachable stations.
+    Args:
+        lengths (np.ndarray): Length matrix in kilometers.
+        speed (float): Average speed in km/h.
+        thresholds (tuple[int]): Minutes for the "within" counts.
+        block_rows (int): Rows processed at once.
+    Returns:
+        dict[str:np.ndarray]: Columns reachable, mean_minutes, max_minutes, within_<t>_min for each threshold,
+            and accessibility (share of the other stations reachable within the second threshold, or the only one).
+    """
+    n = lengths.shape[0]
+    metrics = {"reachable": np.zeros(n, dtype=np.int64), "mean_minutes": np.full(n, np.nan), "max_minutes": np.full(n, np.nan)}
+    for threshold in thresholds:
+        metrics[f"within_{threshold}_min"] = np.zeros(n, dtype=np.int64)
+
+    for start, end in row_blocks(n, block_rows):
+        minutes = travel_minutes(lengths[start:end], speed)
+        rows = np.arange(end - start)
+        minutes[rows, rows + start] = np.inf  # The station itself does not count
+        finite = np.isfinite(minutes)
+        reachable = finite.sum(axis=1)
+        total = np.where(finite, minutes, 0.0).sum(axis=1)
+        metrics["reachable"][start:end] = reachable
+        with np.errstate(invalid="ignore", divide="ignore"):
+            metrics["mean_minutes"][start:end] = np.where(reachable > 0, total / reachable, np.nan)
+        metrics["max_minutes"][start:end] = np.where(reachable > 0, np.where(finite, minutes, -np.inf).max(axis=1), np.nan)
+        for threshold in thresholds:
+            metrics[f"within_{threshold}_min"][start:end] = (minutes <= threshold).sum(axis=1)
+
+    reference = thresholds[1] if len(thresholds) > 1 else thresholds[0]
+    metrics["accessibility"] = metrics[f"within_{reference}_min"] / max(n - 1, 1)
+    return metrics
+
+def line_summary(lengths: np.ndarray, lines: np.ndarray, speed: float = AVERAGE_SPEED, block_rows: int = BLOCK_ROWS) -> dict[str:np.ndarray]:
+    """
+    Travel-time summary for every ordered pair of lines, over the reachable pairs of distinct stations.
+    Args:
+        lengths (np.ndarray): Length matrix in kilometers.
+        lines (np.ndarray): Line of each station.
+        speed (float): Average speed in km/h.
+        block_rows (int): Rows processed at once.
+    Returns:
+        dict[str:np.ndarray]: Columns origin_line, destiny_line, pairs, mean_minutes, min_minutes, max_minutes.
+    """
+    n = lengths.shape[0]
+    names, codes = np.unique(np.asarray(lines).astype(str), return_inverse=True)
+    count = len(names)
+    # Columns sorted by line, so each line is a contiguous slice for reduceat
+    order = np.argsort(codes, kind="stable")
+    starts = np.searchsorted(codes[order], np.arange(count))
+    indicator = np.zeros((n, count))
+    indicator[np.arange(n), codes] = 1.0
+
+    sums = np.zeros((count, count))
+    pairs = np.zeros((count, count))
+    minimum = np.full((count, count), np.inf)
+    maximum = np.full((count, count), -np.inf)
+    for start, end in row_blocks(n, block_rows):
+        minutes = travel_minutes(lengths[start:end], speed)
+        rows = np.arange(end - start)
+        minutes[rows, rows + start] = np.inf
+        finite = np.isfinite(minutes)
+        block_lines = indicator[start:end].T
+        sums += block_lines @ np.where(finite, minutes, 0.0) @ indicator
+        pairs += block_lines @ finite.astype(np.float64) @ indicator
+        block_codes = codes[start:end, None]
+        columns = np.arange(count)[None, :]
+        np.minimum.at(minimum, (block_codes, columns), np.minimum.reduceat(minutes[:, order], starts, axis=1))
+        np.maximum.at(maximum, (block_codes, columns), np.maximum.reduceat(np.where(finite, minutes, -np.inf)[:, order], starts, axis=1))
+
+    origin, destiny = np.meshgrid(np.arange(count), np.arange(count), indexing="ij")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(pairs > 0, sums / pairs, np.nan)
+    return {
+        "origin_line": names[origin.ravel()],
+        "destiny_line": names[destiny.ravel()],
+        "pairs": pairs.ravel().astype(np.int64),
+        "mean_minutes": mean.ravel(),
+        "min_minutes": np.where(pairs > 0, minimum, np.nan).ravel(),
+        "max_minutes": np.where(pairs > 0, maximum, np.nan).ravel(),
+    }
+
+def write_columns_csv(columns: dict[str:np.ndarray], filepath: str):
+    """
+    Write equally long column arrays to a CSV file with a header.
+    """
+    names = list(columns)
+    formats = ["%s" if columns[name].dtype.kind in "UO" else "%d" if columns[name].dtype.kind in "iu" else "%.4f" for name in names]
+    table = np.rec.fromarrays([columns[name] for name in names], names=names)
+    with open(filepath, "w") as file:
+        file.write(",".join(names) + "\n")
+        np.savetxt(file, table, fmt=formats, delimiter=",")
+
+def export_od_matrix(lengths: np.ndarray, ids: np.ndarray, output: str, file_format: str = "csv", speed: float = AVERAGE_SPEED, block_rows: int = BLOCK_ROWS, dtype=np.float32) -> list[str]:
+    """
+    Stream the travel-time matrix in long form (origin_id, destiny_id, minutes), one block of rows at a time.
+    Args:
+        lengths (np.ndarray): Length matrix in kilometers.
+        ids (np.ndarray): Vertice id of each row/column.
+        output (str): Output directory.
+        file_format (str): "csv" for od_matrix.csv, "npy" for one columnar .npy file per column in od_matrix/.
+        speed (float): Average speed in km/h.
+        block_rows (int): Rows written at once.
+        dtype: Storage type of the minutes column in the "npy" format.
+    Returns:
+        list[str]: Paths of the written files.
+    """
+    n = lengths.shape[0]
+    ids = np.asarray(ids, dtype=np.int32)
+    os.makedirs(output, exist_ok=True)
+
+    if file_format == "csv":
+        filepath = path.join(output, "od_matrix.csv")
+        with open(filepath, "w") as file:
+            file.write(",".join(OD_COLUMNS) + "\n")
+            for start, end in row_blocks(n, block_rows):
+                minutes = travel_minutes(lengths[start:end], speed)
+                block = np.empty((end - start) * n, dtype=[("o", np.int32), ("d", np.int32), ("m", np.float64)])
+                block["o"] = np.repeat(ids[start:end], n)
+                block["d"] = np.tile(ids, end - start)
+                block["m"] = minutes.ravel()
+                np.savetxt(file, block, fmt=["%d", "%d", "%.4f"], delimiter=",")
+        return [filepath]
+
+    if file_format == "npy":
+        directory = path.join(output, "od_matrix")
+        os.makedirs(directory, exist_ok=True)
+        files = [path.join(directory, f"{name}.npy") for name in OD_COLUMNS]
+        origin = np.lib.format.open_memmap(files[0], mode="w+", dtype=np.int32, shape=(n * n,))
+        destiny = np.lib.format.open_memmap(files[1], mode="w+", dtype=np.int32, shape=(n * n,))
+        minutes = np.lib.format.open_memmap(files[2], mode="w+", dtype=dtype, shape=(n * n,))
+        for start, end in row_blocks(n, block_rows):
+            cells = slice(start * n, end * n)
+            origin[cells] = np.repeat(ids[start:end], n)
+            destiny[cells] = np.tile(ids, end - start)
+            minutes[cells] = travel_minutes(lengths[start:end], speed).ravel()
+        for column in (origin, destiny, minutes):
+            column.flush()
+        return files
+
+    raise ValueError(f"Unknown OD format: {file_format}")
+
+def export_od_analytics(output: str, artifacts_directory: str = ARTIFACTS_DIRECTORY, file_format: str = "csv", speed: float = AVERAGE_SPEED, block_rows: int = BLOCK_ROWS) -> list[str]:
+    """
+    Write the OD matrix, the station accessibility table and the line summary from the binary artifacts.
+    Args:
+        output (str): Output directory.
+        artifacts_directory (str): Directory of the binary Floyd-Warshall artifacts.
+        file_format (str): Format of the OD matrix ("csv" or "npy").
+        speed (float): Average speed in km/h.
+        block_rows (int): Rows processed at once.
+    Returns:
+        list[str]: Paths of the written files.
+    """
+    lengths, _, table = load_binary_artifacts(artifacts_directory)
+    files = export_od_matrix(lengths, table["id"], output, file_format, speed, block_rows)
+
+    accessibility = {"id": np.asarray(table["id"]), "station_name": np.asarray(table["station_name"]), "line": np.asarray(table["line"])}
+    accessibility.update(station_accessibility(lengths, speed, block_rows=block_rows))
+    files.append(path.join(output, "station_accessibility.csv"))
+    write_columns_csv(accessibility, files[-1])
+
+    files.append(path.join(output, "line_summary.csv"))
+    write_columns_csv(line_summary(lengths, table["line"], speed, block_rows), files[-1])
+    return files
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export origin-destination travel-time analytics from the Floyd-Warshall artifacts.")
+    parser.add_argument("--output", default=path.join("src", "files", "od"), help="Output directory")
+    parser.add_argument("--artifacts", default=ARTIFACTS_DIRECTORY, help="Directory of the binary artifacts")
+    parser.add_argument("--format", default="csv", choices=("csv", "npy"), help="Format of the OD matrix")
+    parser.add_argument("--speed", type=float, default=AVERAGE_SPEED, help="Average speed in km/h")
+    parser.add_argument("--block-rows", type=int, default=BLOCK_ROWS, help="Matrix rows processed at once")
+    args = parser.parse_args(argv)
+    for filepath in export_od_analytics(args.output, args.artifacts, args.format, args.speed, args.block_rows):
+        print(f"Written {filepath}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+from src.models.csr_graph_definition import csr_graph
+from src.instrumentation import timed
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, util
+import heapq
+import os
+import time
+import numpy as np
+
+"""
+parallel_apsp.py
+---------------------
+All-pairs shortest paths on several cores: one single-source Dijkstra per origin, with the origins
+split across a process pool. The distance and predecessor matrices live in
+multiprocessing.shared_memory blocks; each worker writes its rows there directly, so only the
+number of solved rows travels back through the pool.
+"""
+
+SERIAL_SAMPLE = 16  # Origins timed in the calling process to estimate the single-core time
+
+_worker = {}
+
+def single_source(offsets: list[int], neighbors: list[int], weights: list[float], origin: int) -> tuple[list[float], list[int]]:
+    """
+    Dijkstra from one origin over CSR lists.
+    Args:
+        offsets, neighbors, weights (list): CSR arrays converted to lists.
+        origin (int): Index of the origin.
+    Returns:
+        tuple[list[float], list[int]]: Distance and predecessor index (-1 if unreachable) of every vertice.
+    """
+    n = len(offsets) - 1
+    distance = [float('inf')] * n
+    parent = [-1] * n
+    done = [False] * n
+    distance[origin] = 0.0
+    parent[origin] = origin
+    heap = [(0.0, origin)]
+    while heap:
+        current_distance, current = heapq.heappop(heap)
+        if done[current]:
+            continue
+        done[current] = True
+        for position in range(offsets[current], offsets[current + 1]):
+            neighbor = neighbors[position]
+            candidate = current_distance + weights[position]
+            if candidate < distance[neighbor]:
+                distance[neighbor] = candidate
+                parent[neighbor] = current
+                heapq.heappush(heap, (candidate, neighbor))
+    return distance, parent
+
+def _init_worker(offsets, neighbors, weights, distances_name, predecessors_name, n):
+    # Runs once per worker: keeps the graph as lists and attaches the shared matrices
+    _worker["graph"] = (offsets.tolist(), neighbors.tolist(), weights.tolist())
+    _worker["blocks"] = [shared_memory.SharedMemory(name=distances_name), shared_memory.SharedMemory(name=predecessors_name)]
+    _worker["distances"] = np.ndarray((n, n), dtype=np.float64, buffer=_worker["blocks"][0].buf)
+    _worker["predecessors"] = np.ndarray((n, n), dtype=np.int32, buffer=_worker["blocks"][1].buf)
+    # Pool workers leave through multiprocessing's exit handlers, not atexit
+    util.Finalize(None, _close_worker, exitpriority=10)
+
+def _close_worker():
+    # Drop the matrix views before closing the blocks they point into; the parent unlinks them
+    _worker.pop("distances", None)
+    _worker.pop("predecessors", None)
+    for block in _worker.pop("blocks", []):
+        block.close()
+
+def _solve_rows(origins: list[int]) -> int:
+    offsets, neighbors, weights = _worker["graph"]
+    for origin in origins:
+        distance, parent = single_source(offsets, neighbors, weights, origin)
+        _worker["distances"][origin] = distance
+        _worker["predecessors"][origin] = parent
+    return len(origins)
+
+def estimate_serial_seconds(csr: csr_graph, sample: int = SERIAL_SAMPLE) -> float:
+    """
+    Estimate the single-core time of the whole computation by timing a sample of origins in this process.
+    Args:
+        csr (csr_graph): The packed graph.
+        sample (int): Number of origins timed, spread over the index range.
+    Returns:
+        float: Estimated seconds for all the origins on one core.
+    """
+    n = len(csr)
+    origins = np.linspace(0, n - 1, min(sample, n), dtype=np.int64).tolist()
+    offsets, neighbors, weights = csr.offsets.tolist(), csr.neighbors.tolist(), csr.weights.tolist()
+    start = time.perf_counter()
+    for origin in origins:
+        single_source(offsets, neighbors, weights, origin)
+    return (time.perf_counter() - start) * n / max(len(origins), 1)
+
+@timed("parallel_apsp")
+def parallel_apsp(csr: csr_graph, workers: int = None, chunks_per_worker: int = 4) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the distance and predecessor index matrices with a process pool.
+    Distances equal the Floyd-Warshall ones; among equally short paths the predecessor chosen may differ.
+    Args:
+        csr (csr_graph): The packed graph.
+        workers (int): Number of processes; defaults to the number of CPUs.
+        chunks_per_worker (int): Tasks per worker, to balance the load.
+    Returns:
+        tuple[np.ndarray, np.ndarray]: float64 distance matrix and int32 predecessor index matrix.
+    """
+    n = len(csr)
+    workers = workers or os.cpu_count() or 1
+    blocks = [shared_memory.SharedMemory(create=True, size=max(n * n * 8, 1)), shared_memory.SharedMemory(create=True, size=max(n * n * 4, 1))]
+    try:
+        distances = np.ndarray((n, n), dtype=np.float64, buffer=blocks[0].buf)
+        predecessors = np.ndarray((n, n), dtype=np.int32, buffer=blocks[1].buf)
+        # Interleaved origins give every task a similar mix of cheap and expensive searches
+        tasks = [list(range(start, n, workers * chunks_per_worker)) for start in range(min(n, workers * chunks_per_worker))]
+        initargs = (csr.offsets, csr.neighbors, csr.weights, blocks[0].name, blocks[1].name, n)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+            solved = sum(pool.map(_solve_rows, tasks))
+        if solved != n:
+            raise RuntimeError(f"Parallel APSP solved {solved} of {n} origins")
+        result = distances.copy(), predecessors.copy()
+        del distances, predecessors
+        return result
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
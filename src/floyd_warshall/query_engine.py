@@ -0,0 +1,175 @@
+from src.models.vertice_definition import vertice
+from src.models.graph_definition import graph
+from src.models.csr_graph_definition import csr_graph
+from src.distance import distance_memo, haversine_km
+from .floyd_warshall import edge_distance, adjacent_pairs
+import heapq
+import numpy as np
+
+"""
+query_engine.py
+---------------------
+Point-to-point shortest path queries over a CSR graph, without the all-pairs matrices.
+Dijkstra answers a single origin/destiny query with a binary heap; A* adds a haversine lower bound
+from the vertice coordinates. Both return the same list[vertice] as get_short_path.
+"""
+
+def build_csr_graph(graph: graph, vertices: list[vertice], weight_function=None, memo: distance_memo = None) -> csr_graph:
+    """
+    Pack the adjacency list of the graph into CSR arrays.
+    Duplicated neighbors in the adjacency list are stored only once.
+    Args:
+        graph (graph): Graph with the adjacency list.
+        vertices (list[vertice]): List of vertice objects, defining the indices.
+        weight_function (callable): Function receiving two vertices and returning the edge weight.
+            Defaults to the same weight used by the Floyd-Warshall matrices.
+        memo (distance_memo): Distances of the current build, used by the default weight.
+    Returns:
+        csr_graph: The packed graph.
+    """
+    if weight_function is None:
+        memo = memo if memo is not None else distance_memo()
+        memo.prefetch(adjacent_pairs(graph.adjacency_list))
+        weight_function = lambda i, j: edge_distance(i, j, memo)
+    index_of = {v: index for index, v in enumerate(vertices)}
+    offsets = [0]
+    neighbors = []
+    weights = []
+    for v in vertices:
+        seen = set()
+        for element in graph.adjacency_list.get(v, []):
+            index_w = index_of.get(element[0])
+            if index_w is None or index_w in seen:
+                continue
+            seen.add(index_w)
+            neighbors.append(index_w)
+            weights.append(weight_function(v, vertices[index_w]))
+        offsets.append(len(neighbors))
+
+    return csr_graph(
+        offsets=np.array(offsets, dtype=np.int64),
+        neighbors=np.array(neighbors, dtype=np.int32),
+        weights=np.array(weights, dtype=np.float64),
+        vertices=vertices,
+    )
+
+def astar_potential(csr: csr_graph, destiny: int) -> list[float]:
+    """
+    Haversine lower bound from every vertice to the destiny, used as the A* heuristic.
+    Complex transfers cost nothing although complex members are up to a few hundred meters apart,
+    so the bound is measured between complex centroids and scaled by the smallest ratio between
+    an edge weight and the centroid distance it covers. This keeps the heuristic consistent,
+    and A* returns the same distances as Dijkstra.
+    Args:
+        csr (csr_graph): The packed graph.
+        destiny (int): Index of the destiny vertice.
+    Returns:
+        list[float]: Lower bound of the distance from each vertice to the destiny.
+    """
+    if csr.centroids is None:
+        complex_ids = np.array([int(v.complex_id) for v in csr.vertices])
+        lats = np.array([float(v.lat) for v in csr.vertices])
+        lons = np.array([float(v.lon) for v in csr.vertices])
+        _, groups = np.unique(complex_ids, return_inverse=True)
+        counts = np.bincount(groups)
+        centroid_lat = (np.bincount(groups, lats) / counts)[groups]
+        centroid_lon = (np.bincount(groups, lons) / counts)[groups]
+
+        origins = np.repeat(np.arange(len(csr)), np.diff(csr.offsets))
+        bound = haversine_km(centroid_lat[origins], centroid_lon[origins], centroid_lat[csr.neighbors], centroid_lon[csr.neighbors])
+        constrained = bound > 0
+        scale = float(np.min(csr.weights[constrained] / bound[constrained])) if constrained.any() else 1.0
+        csr.centroids = (centroid_lat, centroid_lon, max(scale, 0.0))
+
+    centroid_lat, centroid_lon, scale = csr.centroids
+    potential = scale * haversine_km(centroid_lat, centroid_lon, centroid_lat[destiny], centroid_lon[destiny])
+    return potential.tolist()
+
+def _search(csr: csr_graph, origin: int, destiny: int, potential: list[float] | None) -> tuple[float, list[int]]:
+    """
+    Heap based Dijkstra (or A* when a potential is given) from origin to destiny.
+    Returns:
+        tuple[float, list[int]]: Distance and the parent of each visited index (-1 if not reached).
+    """
+    n = len(csr)
+    distance = [float('inf')] * n
+    parent = [-1] * n
+    done = [False] * n
+    distance[origin] = 0.0
+    parent[origin] = origin
+    heap = [(potential[origin] if potential is not None else 0.0, origin)]
+
+    while heap:
+        _, current = heapq.heappop(heap)
+        if done[current]:
+            continue
+        if current == destiny:
+            break
+        done[current] = True
+        neighbors, weights = csr.edges_from(current)
+        for neighbor, weight in zip(neighbors, weights):
+            candidate = distance[current] + weight
+            if candidate < distance[neighbor]:
+                distance[neighbor] = candidate
+                parent[neighbor] = current
+                priority = candidate + potential[neighbor] if potential is not None else candidate
+                heapq.heappush(heap, (priority, neighbor))
+    return distance[destiny], parent
+
+def _query(csr: csr_graph, origin: vertice, destiny: vertice, use_astar: bool) -> list[vertice]:
+    try:
+        i = csr.index_of[origin]
+        j = csr.index_of[destiny]
+    except KeyError:
+        print("Erro: origin and destiny outside from the list.")
+        return []
+    if i == j:
+        return [origin]
+
+    potential = astar_potential(csr, j) if use_astar else None
+    distance, parent = _search(csr, i, j, potential)
+    if distance == float('inf'):
+        print("Any path founded.")
+        return []
+
+    path = [j]
+    while path[-1] != i:
+        path.append(parent[path[-1]])
+    path.reverse()
+    return [csr.vertices[index] for index in path]
+
+def dijkstra_short_path(csr: csr_graph, origin: vertice, destiny: vertice) -> list[vertice]:
+    """
+    Retrieve the shortest path between two vertices with Dijkstra over the CSR graph.
+    Args:
+        csr (csr_graph): The packed graph.
+        origin (vertice): Starting vertice.
+        destiny (vertice): Destination vertice.
+    Returns:
+        list[vertice]: List of vertices representing the shortest path, or empty if not found.
+    """
+    return _query(csr, origin, destiny, use_astar=False)
+
+def astar_short_path(csr: csr_graph, origin: vertice, destiny: vertice) -> list[vertice]:
+    """
+    Retrieve the shortest path between two vertices with A* over the CSR graph.
+    Args:
+        csr (csr_graph): The packed graph.
+        origin (vertice): Starting vertice.
+        destiny (vertice): Destination vertice.
+    Returns:
+        list[vertice]: List of vertices representing the shortest path, or empty if not found.
+    """
+    return _query(csr, origin, destiny, use_astar=True)
+
+def path_distance(csr: csr_graph, path: list[vertice]) -> float:
+    """
+    Sum the edge weights along a path.
+    Args:
+        csr (csr_graph): The packed graph.
+        path (list[vertice]): Path returned by a query.
+    Returns:
+        float: Total weight of the path.
+    """
+    indices = [csr.index_of[v] for v in path]
+    return sum(csr.edge_weight(a, b) for a, b in zip(indices, indices[1:]))
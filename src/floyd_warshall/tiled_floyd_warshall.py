@@ -0,0 +1,197 @@
+from src.models.vertice_definition import vertice
+from src.models.graph_definition import graph
+from src.instrumentation import timed, count, progress
+from .manage_files import BINARY_LENGTHS, BINARY_PREDECESSORS, BINARY_MANIFEST, BUILD_MANIFEST, save_binary_vertices
+import hashlib
+import json
+import os
+import numpy as np
+
+"""
+tiled_floyd_warshall.py
+---------------------
+Blocked (tiled) Floyd-Warshall over disk-backed matrices, for networks whose n^2 matrices do not fit in RAM.
+The length and predecessor matrices are .npy memory maps written in place in the artifact directory.
+Round K processes pivot block K in three phases: the diagonal tile, the tiles of row K and column K,
+then every other tile. At most six tiles are held in memory at a time, four of the length dtype and two
+of int32 predecessors, plus a boolean mask tile: in the last phase the column tile, the row tile and its
+predecessors, the updated tile and its predecessors, and the candidate lengths and their mask inside
+_relax_tile. That is about 41 * tile_size^2 bytes with float64 lengths and 25 * tile_size^2 with float32
+(41 MiB and 25 MiB for the default TILE_SIZE).
+A checkpoint is written after each round, and an interrupted run resumes from the last completed round.
+"""
+
+TILE_SIZE = 1024
+CHECKPOINT_FILE = "tiled_checkpoint.json"
+
+def edge_list(graph: graph, vertices: list[vertice], weight_function) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Edges of the adjacency list as index and weight arrays, in adjacency order.
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: origin indices, destiny indices and weights.
+    """
+    index_of = {v: index for index, v in enumerate(vertices)}
+    origins, destinies, weights = [], [], []
+    for index_i, i in enumerate(vertices):
+        for element in graph.adjacency_list.get(i, []):
+            index_j = index_of.get(element[0])
+            if index_j is None:
+                continue
+            origins.append(index_i)
+            destinies.append(index_j)
+            weights.append(weight_function(i, vertices[index_j]))
+    return np.array(origins, dtype=np.int64), np.array(destinies, dtype=np.int64), np.array(weights, dtype=np.float64)
+
+def _signature(n: int, tile_size: int, dtype, origins: np.ndarray, destinies: np.ndarray, weights: np.ndarray) -> str:
+    digest = hashlib.sha256(f"{n}|{tile_size}|{np.dtype(dtype).name}".encode())
+    for array in (origins, destinies, weights):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+def _relax_tile(c: np.ndarray, pc: np.ndarray, a: np.ndarray, b: np.ndarray, pb: np.ndarray):
+    """
+    c = min(c, a (+) b) over the pivot columns of a / rows of b, with the predecessors taken from pb.
+    a or b may be c itself (diagonal and panel phases); the in-place update then sees the new values,
+    as in the plain algorithm. Predecessors are written before lengths, so re-running a tile after an
+    interruption restores any cell whose length was not written yet.
+    The candidate lengths and their mask are one buffer each, reused for every pivot column.
+    """
+    candidate = np.empty(c.shape, dtype=c.dtype)
+    improved = np.empty(c.shape, dtype=bool)
+    for k in range(a.shape[1]):
+        np.add(a[:, k, None], b[None, k, :], out=candidate)
+        np.less(candidate, c, out=improved)
+        if not improved.any():
+            continue
+        np.copyto(pc, pb[k].copy(), where=improved)
+        np.copyto(c, candidate, where=improved)
+
+def _initialize(lengths: np.ndarray, predecessors: np.ndarray, origins, destinies, weights, block: int):
+    n = lengths.shape[0]
+    for start in range(0, n, block):
+        end = min(start + block, n)
+        lengths[start:end] = np.inf
+        predecessors[start:end] = -1
+        rows = np.arange(start, end)
+        lengths[rows, rows] = 0
+        predecessors[rows, rows] = rows
+    # Both directions of each edge, in adjacency order
+    lengths[origins, destinies] = weights
+    lengths[destinies, origins] = weights
+    predecessors[origins, destinies] = origins
+    predecessors[destinies, origins] = destinies
+
+def _write_checkpoint(directory: str, state: dict):
+    temporary = os.path.join(directory, CHECKPOINT_FILE + ".tmp")
+    with open(temporary, "w") as file:
+        json.dump(state, file, indent=2)
+    os.replace(temporary, os.path.join(directory, CHECKPOINT_FILE))
+
+def _read_checkpoint(directory: str) -> dict | None:
+    try:
+        with open(os.path.join(directory, CHECKPOINT_FILE), "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+@timed("floyd_warshall")
+def tiled_floyd_warshall(graph: graph, vertices: list[vertice], directory: str, weight_function, tile_size: int = TILE_SIZE, dtype=np.float64, resume: bool = True) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Run the blocked Floyd-Warshall directly on memory-mapped .npy matrices in directory, and complete
+    it as a binary artifact directory (vertex table and manifest) at the end.
+    Args:
+        graph (graph): Graph with the adjacency list.
+        vertices (list[vertice]): List of vertice objects, defining the indices.
+        directory (str): Artifact directory holding the matrices and the checkpoint.
+        weight_function (callable): Function receiving two vertices and returning the edge weight.
+        tile_size (int): Side of the tiles held in memory.
+        dtype: np.float64 or np.float32, storage type of the length matrix.
+        resume (bool): Continue from the checkpoint of an interrupted run with the same graph and settings.
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Length and predecessor index matrices (read-only memory maps).
+    """
+    n = len(vertices)
+    tile_size = max(1, min(tile_size, n))
+    blocks = (n + tile_size - 1) // tile_size
+    origins, destinies, weights = edge_list(graph, vertices, weight_function)
+    signature = _signature(n, tile_size, dtype, origins, destinies, weights)
+    lengths_path = os.path.join(directory, BINARY_LENGTHS)
+    predecessors_path = os.path.join(directory, BINARY_PREDECESSORS)
+    os.makedirs(directory, exist_ok=True)
+
+    state = _read_checkpoint(directory) if resume else None
+    if state is not None and state.get("signature") == signature and os.path.isfile(lengths_path) and os.path.isfile(predecessors_path):
+        lengths = np.lib.format.open_memmap(lengths_path, mode="r+")
+        predecessors = np.lib.format.open_memmap(predecessors_path, mode="r+")
+        progress(f"Resuming tiled Floyd Washal at block {state['completed_blocks']} of {blocks}...")
+    else:
+        # The artifacts are incomplete until the end of the run
+        for name in (BINARY_MANIFEST, BUILD_MANIFEST):
+            if os.path.exists(os.path.join(directory, name)):
+                os.remove(os.path.join(directory, name))
+        lengths = np.lib.format.open_memmap(lengths_path, mode="w+", dtype=dtype, shape=(n, n))
+        predecessors = np.lib.format.open_memmap(predecessors_path, mode="w+", dtype=np.int32, shape=(n, n))
+        _initialize(lengths, predecessors, origins, destinies, weights, tile_size)
+        lengths.flush()
+        predecessors.flush()
+        state = {"signature": signature, "n": n, "tile_size": tile_size, "dtype": np.dtype(dtype).name, "completed_blocks": 0}
+        _write_checkpoint(directory, state)
+        progress(f"Getting tiled Floyd Washal ({blocks} blocks of {tile_size})...")
+
+    bounds = [(start, min(start + tile_size, n)) for start in range(0, n, tile_size)]
+    for pivot in range(state["completed_blocks"], blocks):
+        kk = slice(*bounds[pivot])
+        diagonal = np.array(lengths[kk, kk])
+        diagonal_predecessors = np.array(predecessors[kk, kk])
+        _relax_tile(diagonal, diagonal_predecessors, diagonal, diagonal, diagonal_predecessors)
+        predecessors[kk, kk] = diagonal_predecessors
+        lengths[kk, kk] = diagonal
+
+        # Row K and column K
+        for other in range(blocks):
+            if other == pivot:
+                continue
+            oo = slice(*bounds[other])
+            row = np.array(lengths[kk, oo])
+            row_predecessors = np.array(predecessors[kk, oo])
+            _relax_tile(row, row_predecessors, diagonal, row, row_predecessors)
+            predecessors[kk, oo] = row_predecessors
+            lengths[kk, oo] = row
+            del row, row_predecessors
+
+            column = np.array(lengths[oo, kk])
+            column_predecessors = np.array(predecessors[oo, kk])
+            _relax_tile(column, column_predecessors, column, diagonal, diagonal_predecessors)
+            predecessors[oo, kk] = column_predecessors
+            lengths[oo, kk] = column
+            del column, column_predecessors
+        del diagonal, diagonal_predecessors
+
+        # Every other tile, through the finished row and column of the pivot block
+        for i in range(blocks):
+            if i == pivot:
+                continue
+            ii = slice(*bounds[i])
+            column = np.array(lengths[ii, kk])
+            for j in range(blocks):
+                if j == pivot:
+                    continue
+                jj = slice(*bounds[j])
+                tile = np.array(lengths[ii, jj])
+                tile_predecessors = np.array(predecessors[ii, jj])
+                _relax_tile(tile, tile_predecessors, column, np.array(lengths[kk, jj]), np.array(predecessors[kk, jj]))
+                predecessors[ii, jj] = tile_predecessors
+                lengths[ii, jj] = tile
+                del tile, tile_predecessors
+            del column
+
+        lengths.flush()
+        predecessors.flush()
+        state["completed_blocks"] = pivot + 1
+        count("tiled_blocks")
+        _write_checkpoint(directory, state)
+
+    save_binary_vertices(directory, vertices, dtype)
+    os.remove(os.path.join(directory, CHECKPOINT_FILE))
+    del lengths, predecessors
+    return np.load(lengths_path, mmap_mode="r"), np.load(predecessors_path, mmap_mode="r")
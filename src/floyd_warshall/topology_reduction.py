@@ -0,0 +1,282 @@
+from src.models.vertice_definition import vertice
+from src.models.graph_definition import graph
+from src.models.csr_graph_definition import csr_graph
+from src.distance import distance_memo
+from src.instrumentation import timed, count, progress
+from .floyd_warshall import relax_numpy, as_registry
+from .query_engine import build_csr_graph
+import numpy as np
+
+"""
+topology_reduction.py
+---------------------
+Shrinks the graph before the all-pairs step. The members of a complex are connected to each other at
+no cost, so each complex becomes one super-node, and a super-edge keeps the lightest edge between two
+complexes. Super-nodes with exactly two neighbors (plain stops in the middle of a line) are folded into
+chains between the remaining core nodes (terminals, junctions and transfers), and each chain into one
+core edge. Floyd-Warshall then runs on the core only.
+Any distance is expanded on demand: a super-node on a chain reaches the rest of the network through
+the two ends of its chain, so the distance between two vertices is the best of the four
+end-to-end combinations (plus the direct stretch when both are on the same chain). Paths are rebuilt
+from the core predecessors, the chains and the vertices of each super-edge. The distances are the ones
+of the full matrices (to the rounding of the sums); where several paths have the same length, the
+vertices may differ from get_short_path.
+"""
+
+INF = float('inf')
+
+class reduced_network:
+    """
+    Complex and chain reduction of an undirected graph, with the all-pairs matrices of its core.
+    Attributes:
+        vertices (list[vertice]): Vertices in index order.
+        complex_of (np.ndarray): Super-node of each vertice index.
+        core_of (np.ndarray): Core index of each super-node (-1 for a chain node).
+        chain_of (np.ndarray): Chain of each super-node (-1 for a core node).
+        position (np.ndarray): Index of each chain node in its chain.
+        end_a, end_b (np.ndarray): Core index of the two ends reached from each super-node (itself for a core node).
+        offset_a, offset_b (np.ndarray): Distance from each super-node to end_a and end_b.
+        chains (list[tuple[int, int, list[int]]]): Core index of both ends and the inner super-nodes, from end a to end b.
+        core_chain (dict[tuple[int, int]:int]): Chain realizing the core edge between two core indices.
+        edge_vertices (dict[tuple[int, int]:tuple[int, int]]): Vertice indices of the lightest edge between two super-nodes.
+        lengths (np.ndarray): float64 distance matrix of the core.
+        predecessors (np.ndarray): int32 predecessor index matrix of the core.
+    """
+    def __init__(self, csr: csr_graph):
+        self.vertices = csr.vertices
+        self.registry = as_registry(self.vertices)
+        n = len(csr)
+        _, complex_of = np.unique([int(v.complex_id) for v in self.vertices], return_inverse=True)
+        self.complex_of = complex_of.astype(np.int32)
+        super_count = int(self.complex_of.max()) + 1 if n else 0
+
+        # Super-edges: the lightest edge between two complexes (the first one on ties)
+        neighbors = [dict() for _ in range(super_count)]
+        self.edge_vertices = {}
+        for i in range(n):
+            s = int(self.complex_of[i])
+            for j, weight in zip(*csr.edges_from(i)):
+                t = int(self.complex_of[j])
+                if s != t and weight < neighbors[s].get(t, INF):
+                    neighbors[s][t] = weight
+                    neighbors[t][s] = weight
+                    self.edge_vertices[(s, t)] = (i, j)
+                    self.edge_vertices[(t, s)] = (j, i)
+
+        is_core = [len(elements) != 2 for elements in neighbors]
+        self.chains = []
+        chain_of = [-1] * super_count
+        position = [0] * super_count
+
+        def walk(start: int, first: int) -> tuple[int, list[int], list[float]]:
+            # Follow the degree-2 super-nodes from start through first until the next core node
+            members, weights = [], [neighbors[start][first]]
+            previous, current = start, first
+            while not is_core[current]:
+                members.append(current)
+                following = next(t for t in neighbors[current] if t != previous)
+                weights.append(neighbors[current][following])
+                previous, current = current, following
+            return current, members, weights
+
+        chain_weights = []
+        pending = [s for s in range(super_count) if is_core[s]]
+        while True:
+            for s in pending:
+                for t in neighbors[s]:
+                    # Each chain is found from both ends: keep the first walk
+                    if (is_core[t] and t < s) or (not is_core[t] and chain_of[t] >= 0):
+                        continue
+                    end, members, weights = walk(s, t)
+                    for index, member in enumerate(members):
+                        chain_of[member] = len(self.chains)
+                        position[member] = index
+                    self.chains.append((s, end, members))
+                    chain_weights.append(weights)
+            # A cycle of degree-2 super-nodes without any core node gets one of them as core
+            unreached = next((s for s in range(super_count) if not is_core[s] and chain_of[s] < 0), None)
+            if unreached is None:
+                break
+            is_core[unreached] = True
+            pending = [unreached]
+
+        core = [s for s in range(super_count) if is_core[s]]
+        self.core_of = np.full(super_count, -1, dtype=np.int32)
+        self.core_of[core] = np.arange(len(core), dtype=np.int32)
+        self.core = np.array(core, dtype=np.int32)
+        self.chain_of = np.array(chain_of, dtype=np.int32)
+        self.position = np.array(position, dtype=np.int32)
+        self.chains = [(int(self.core_of[a]), int(self.core_of[b]), members) for a, b, members in self.chains]
+
+        # Offsets to both ends, each summed from its own end
+        self.end_a = self.core_of.copy()
+        self.end_b = self.core_of.copy()
+        self.offset_a = np.zeros(super_count)
+        self.offset_b = np.zeros(super_count)
+        lengths = np.full((len(core), len(core)), np.inf)
+        np.fill_diagonal(lengths, 0)
+        self.core_chain = {}
+        for index, ((a, b, members), weights) in enumerate(zip(self.chains, chain_weights)):
+            forward = np.cumsum(weights)
+            backward = np.cumsum(weights[::-1])[::-1]
+            for k, member in enumerate(members):
+                self.end_a[member], self.end_b[member] = a, b
+                self.offset_a[member], self.offset_b[member] = forward[k], backward[k + 1]
+            total = float(forward[-1])
+            if a != b and total < lengths[a, b]:
+                lengths[a, b] = lengths[b, a] = total
+                self.core_chain[(a, b)] = index
+                self.core_chain[(b, a)] = index
+
+        predecessors = np.where(np.isfinite(lengths), np.arange(len(core), dtype=np.int32)[:, None], -1).astype(np.int32)
+        self.lengths, self.predecessors = relax_numpy(lengths, predecessors)
+        count("reduced_core", len(core))
+
+    def __len__(self):
+        return len(self.vertices)
+
+    @classmethod
+    @timed("reduce_network")
+    def from_graph(cls, graph: graph, vertices: list[vertice], memo: distance_memo = None) -> "reduced_network":
+        """
+        Reduce the graph of get_graph, with the same edge weights as the Floyd-Warshall matrices, and solve its core.
+        """
+        progress("Reducing the network...")
+        return cls(build_csr_graph(graph, vertices, memo=memo))
+
+    def _ends(self, s: int) -> list[tuple[int, int, float]]:
+        """
+        Side (0 for end a, 1 for end b), core index and distance of both ends reached from a super-node.
+        """
+        return [(0, int(self.end_a[s]), float(self.offset_a[s])), (1, int(self.end_b[s]), float(self.offset_b[s]))]
+
+    def _direct(self, s: int, t: int) -> float:
+        """
+        Distance between two super-nodes along their common chain (inf if they are not on the same chain).
+        """
+        if self.chain_of[s] < 0 or self.chain_of[s] != self.chain_of[t]:
+            return INF
+        return abs(float(self.offset_a[s]) - float(self.offset_a[t]))
+
+    def _best(self, s: int, t: int) -> tuple[float, int, int]:
+        """
+        Best route between two super-nodes: distance and the side of the end left from s and reached
+        from t (-1, -1 for the direct stretch).
+        """
+        best = (self._direct(s, t), -1, -1)
+        for side_s, p, offset_s in self._ends(s):
+            row = self.lengths[p]
+            for side_t, q, offset_t in self._ends(t):
+                candidate = offset_s + row[q] + offset_t
+                if candidate < best[0]:
+                    best = (candidate, side_s, side_t)
+        return best
+
+    def distance(self, origin: int, destiny: int) -> float:
+        """
+        Shortest distance between two vertice indices (inf if not connected).
+        """
+        s, t = int(self.complex_of[origin]), int(self.complex_of[destiny])
+        return 0.0 if s == t else self._best(s, t)[0]
+
+    def lengths_from(self, origin: int) -> np.ndarray:
+        """
+        Row of the full distance matrix of one vertice index, computed from the core matrix.
+        """
+        s = int(self.complex_of[origin])
+        row = np.full(len(self.end_a), np.inf)
+        for _, p, offset_s in self._ends(s):
+            for ends, offsets in ((self.end_a, self.offset_a), (self.end_b, self.offset_b)):
+                np.minimum(row, offset_s + self.lengths[p, ends] + offsets, out=row)
+        if self.chain_of[s] >= 0:
+            same = np.flatnonzero(self.chain_of == self.chain_of[s])
+            np.minimum.at(row, same, np.abs(self.offset_a[same] - self.offset_a[s]))
+        row[s] = 0.0
+        return row[self.complex_of]
+
+    def _chain_walk(self, s: int, side: int) -> list[int]:
+        """
+        Super-nodes from s to one end of its chain (0 for end a, 1 for end b), both included.
+        """
+        if self.chain_of[s] < 0:
+            return [s]
+        a, b, members = self.chains[int(self.chain_of[s])]
+        k = int(self.position[s])
+        if side == 0:
+            return members[k::-1] + [int(self.core[a])]
+        return members[k:] + [int(self.core[b])]
+
+    def _core_walk(self, p: int, q: int) -> list[int]:
+        """
+        Super-nodes of the shortest path between two core indices, chains included.
+        """
+        hops = [q]
+        while hops[-1] != p:
+            hops.append(int(self.predecessors[p, hops[-1]]))
+        hops.reverse()
+        path = [int(self.core[p])]
+        for c1, c2 in zip(hops, hops[1:]):
+            a, b, members = self.chains[self.core_chain[(c1, c2)]]
+            path += (members if a == c1 else members[::-1]) + [int(self.core[c2])]
+        return path
+
+    def path_indices(self, origin: int, destiny: int) -> list[int]:
+        """
+        Shortest path between two vertice indices, as indices of the original graph (empty if not connected).
+        """
+        s, t = int(self.complex_of[origin]), int(self.complex_of[destiny])
+        if s == t:
+            return [origin] if origin == destiny else [origin, destiny]
+        distance, side_s, side_t = self._best(s, t)
+        if distance == INF:
+            return []
+        if side_s < 0:
+            _, _, members = self.chains[int(self.chain_of[s])]
+            i, j = int(self.position[s]), int(self.position[t])
+            supers = members[i:j + 1] if i <= j else members[j:i + 1][::-1]
+        else:
+            p = self._ends(s)[side_s][1]
+            q = self._ends(t)[side_t][1]
+            supers = self._chain_walk(s, side_s) + self._core_walk(p, q)[1:] + self._chain_walk(t, side_t)[::-1][1:]
+
+        path = [origin]
+        for u, v in zip(supers, supers[1:]):
+            first, second = self.edge_vertices[(u, v)]
+            if first != path[-1]:
+                path.append(first)  # Transfer inside the complex
+            path.append(second)
+        if path[-1] != destiny:
+            path.append(destiny)
+        return path
+
+    def short_path(self, origin: vertice, destiny: vertice) -> list[vertice]:
+        """
+        Retrieve the shortest path between two vertices, like get_short_path.
+        Args:
+            origin (vertice): Starting vertice.
+            destiny (vertice): Destination vertice.
+        Returns:
+            list[vertice]: List of vertices representing the shortest path, or empty if not found.
+        """
+        i = self.registry.index_of(origin)
+        j = self.registry.index_of(destiny)
+        if i is None or j is None:
+            print("Erro: origin and destiny outside from the list.")
+            return []
+        indices = self.path_indices(i, j)
+        if not indices:
+            print("Any path founded.")
+            return []
+        return [self.registry[index] for index in indices]
+
+def reduce_network(graph: graph, vertices: list[vertice], memo: distance_memo = None) -> reduced_network:
+    """
+    Reduce the network and solve the all-pairs matrices of its core.
+    Args:
+        graph (graph): Graph with the adjacency list.
+        vertices (list[vertice]): List of vertice objects, defining the indices.
+        memo (distance_memo): Distances of the current build.
+    Returns:
+        reduced_network: The reduction, answering distance and path queries between any vertices.
+    """
+    return reduced_network.from_graph(graph, vertices, memo)
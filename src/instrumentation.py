@@ -0,0 +1,221 @@
+from functools import wraps
+import json
+import os
+import re
+import threading
+import time
+import tracemalloc
+
+"""
+instrumentation.py
+---------------------
+Per-stage timers, counters and peak memory for the pipeline, instead of ad-hoc print()s.
+    with stage("get_graph"): ...          time a block
+    @timed("load_data_csv")               time every call of a function
+    count("vertices", len(vertices))      add to a counter
+    progress("Getting graph...")          progress message (printed unless set_progress(False))
+The figures are exported with snapshot() / write_json(), appended as JSON lines to a log file, and
+rendered in the Prometheus text format by prometheus_text() (served at /metrics by the routing service).
+Metrics are disabled by default: stage() then returns a shared no-op context, and timed() and count()
+return after testing one flag. Enable them with enable(), or with the environment variables
+ROUTE_METRICS=1, ROUTE_METRICS_LOG=<file.jsonl> and ROUTE_METRICS_MEMORY=1.
+Peak memory is measured with tracemalloc, only when memory tracking is enabled, as it slows allocations down.
+"""
+
+PROMETHEUS_PREFIX = "route_"
+
+_enabled = False
+_memory = False
+_show_progress = True
+_log_path = None
+_lock = threading.Lock()
+_local = threading.local()
+_stages = {}    # name -> {"calls", "seconds", "max_seconds", "peak_bytes"}
+_counters = {}  # name -> value
+
+def enable(log_path: str = None, memory: bool = False):
+    """
+    Start collecting metrics.
+    Args:
+        log_path (str): Also append every stage and message as a JSON line to this file.
+        memory (bool): Measure the peak memory of each stage with tracemalloc.
+    """
+    global _enabled, _memory, _log_path
+    _enabled = True
+    _memory = memory
+    _log_path = log_path
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def disable():
+    """
+    Stop collecting metrics; the figures collected so far are kept.
+    """
+    global _enabled, _memory
+    if _memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _enabled = False
+    _memory = False
+
+def enabled() -> bool:
+    return _enabled
+
+def reset():
+    """
+    Forget the collected stages and counters.
+    """
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+
+def set_progress(show: bool):
+    """
+    Print the progress messages or not (the routing service keeps stdout clean).
+    """
+    global _show_progress
+    _show_progress = show
+
+def _log(record: dict):
+    if _log_path is None:
+        return
+    record["time"] = round(time.time(), 6)
+    with _lock:
+        with open(_log_path, "a") as file:
+            file.write(json.dumps(record) + "\n")
+
+def progress(message: str):
+    """
+    Report the progress of the pipeline.
+    """
+    if _show_progress:
+        print(message)
+    if _enabled:
+        _log({"event": "message", "message": message})
+
+def count(name: str, value: int | float = 1):
+    """
+    Add value to a counter.
+    """
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+class _null_stage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_STAGE = _null_stage()
+
+class _stage:
+    """
+    Timer of one stage. Nested stages each get their own peak: the peak of the outer stage is
+    carried across the tracemalloc.reset_peak() of the inner one.
+    """
+    __slots__ = ("name", "start", "base", "outer_peak", "child_peak")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        if _memory:
+            stack = _local.__dict__.setdefault("stack", [])
+            current, peak = tracemalloc.get_traced_memory()
+            self.base = current
+            self.outer_peak = peak
+            self.child_peak = 0
+            stack.append(self)
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        peak_bytes = None
+        if _memory and getattr(_local, "stack", None) and _local.stack[-1] is self:
+            _local.stack.pop()
+            absolute = max(tracemalloc.get_traced_memory()[1], self.child_peak)
+            peak_bytes = absolute - self.base
+            if _local.stack:
+                parent = _local.stack[-1]
+                parent.child_peak = max(parent.child_peak, absolute, self.outer_peak)
+        with _lock:
+            entry = _stages.setdefault(self.name, {"calls": 0, "seconds": 0.0, "max_seconds": 0.0, "peak_bytes": None})
+            entry["calls"] += 1
+            entry["seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            if peak_bytes is not None:
+                entry["peak_bytes"] = max(entry["peak_bytes"] or 0, peak_bytes)
+        _log({"event": "stage", "stage": self.name, "seconds": round(seconds, 6), "peak_bytes": peak_bytes})
+        return False
+
+def stage(name: str):
+    """
+    Context manager timing a block as the stage name.
+    """
+    return _stage(name) if _enabled else _NULL_STAGE
+
+def timed(name: str = None):
+    """
+    Decorator timing every call of a function as a stage (named after the function by default).
+    """
+    def decorator(function):
+        stage_name = name or function.__name__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _stage(stage_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def snapshot() -> dict:
+    """
+    Copy of the collected figures.
+    Returns:
+        dict: {"stages": {name: {"calls", "seconds", "max_seconds", "peak_bytes"}}, "counters": {name: value}}.
+            peak_bytes is None for the stages timed without memory tracking.
+    """
+    with _lock:
+        return {"stages": {name: dict(entry) for name, entry in _stages.items()}, "counters": dict(_counters)}
+
+def write_json(file_path: str):
+    """
+    Write the snapshot as a JSON file.
+    """
+    with open(file_path, "w") as file:
+        json.dump(snapshot(), file, indent=2)
+
+def _metric_name(name: str) -> str:
+    return PROMETHEUS_PREFIX + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+def prometheus_text() -> str:
+    """
+    The collected figures in the Prometheus text exposition format.
+    """
+    figures = snapshot()
+    lines = []
+    stage_metrics = (("stage_calls_total", "counter", "calls", "Calls of the stage"),
+                     ("stage_seconds_total", "counter", "seconds", "Total seconds spent in the stage"),
+                     ("stage_max_seconds", "gauge", "max_seconds", "Longest call of the stage, in seconds"),
+                     ("stage_peak_bytes", "gauge", "peak_bytes", "Peak memory allocated during the stage (with memory tracking)"))
+    for metric, kind, key, description in stage_metrics:
+        lines.append(f"# HELP {PROMETHEUS_PREFIX}{metric} {description}")
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}{metric} {kind}")
+        for name, entry in sorted(figures["stages"].items()):
+            if entry[key] is None:
+                continue
+            lines.append(f'{PROMETHEUS_PREFIX}{metric}{{stage="{name}"}} {entry[key]}')
+    for name, value in sorted(figures["counters"].items()):
+        metric = _metric_name(name) + "_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+if os.environ.get("ROUTE_METRICS", "") not in ("", "0"):
+    enable(os.environ.get("ROUTE_METRICS_LOG") or None, os.environ.get("ROUTE_METRICS_MEMORY", "") not in ("", "0"))
@@ -0,0 +1,88 @@
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import urlopen
+from urllib.error import HTTPError
+import argparse
+import json
+import random
+import time
+import numpy as np
+
+"""
+load_test.py
+---------------------
+Load test of the routing service: random origin-destiny pairs are requested from a pool of concurrent
+clients, and the latency percentiles, the throughput and the error count are reported.
+Run it against a running service with:
+    python -m src.load_test --url http://127.0.0.1:8060 --requests 2000 --concurrency 16
+"""
+
+def fetch_json(url: str, timeout: float = 10.0):
+    with urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read())
+
+def timed_request(url: str) -> tuple[float, bool]:
+    """
+    Request one URL.
+    Returns:
+        tuple[float, bool]: Latency in seconds and whether the answer was a 200.
+    """
+    start = time.perf_counter()
+    try:
+        with urlopen(url, timeout=30.0) as response:
+            response.read()
+            ok = response.status == 200
+    except (HTTPError, OSError):
+        ok = False
+    return time.perf_counter() - start, ok
+
+def run_load_test(base_url: str, requests: int = 1000, concurrency: int = 16, seed: int = 0) -> dict:
+    """
+    Send random /route requests to the service.
+    Args:
+        base_url (str): Address of the service, e.g. http://127.0.0.1:8060.
+        requests (int): Total number of requests.
+        concurrency (int): Number of concurrent clients.
+        seed (int): Seed of the random station pairs.
+    Returns:
+        dict: Latency percentiles in milliseconds, throughput in requests per second and error count.
+    """
+    base_url = base_url.rstrip("/")
+    ids = [station["id"] for station in fetch_json(f"{base_url}/stations")]
+    generator = random.Random(seed)
+    urls = [f"{base_url}/route?origin={generator.choice(ids)}&destiny={generator.choice(ids)}&time=08:00" for _ in range(requests)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed_request, urls))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([latency for latency, _ in results]) * 1000.0
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": sum(1 for _, ok in results if not ok),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p90_ms": round(float(np.percentile(latencies, 90)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "max_ms": round(float(latencies.max()), 3),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the routing service.")
+    parser.add_argument("--url", default="http://127.0.0.1:8060")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the report to this JSON file")
+    args = parser.parse_args(argv)
+    report = run_load_test(args.url, args.requests, args.concurrency, args.seed)
+    for key, value in report.items():
+        print(f"{key}: {value}")
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,10 @@
 main_cli.py
 -------------
 Command-line interface for running shortest path queries and graph operations on the subway network.
-Loads precomputed Floyd-Warshall matrices and graph data if available, or generates them if not.
+Memory-maps the precomputed Floyd-Warshall binary artifacts and loads graph data, rebuilding them first if the inputs changed.
 Prints the shortest path and step-by-step traversal between two stations.
 """
 
-from os import path
 from file_operate import *
 from floyd_warshall import *
 from next_train import next_train_time, datetime
@@ -14,64 +13,73 @@ from next_train import next_train_time, datetime
 AVERAGE_SPEED = 30
 SUBWAY_TICKET = 2.9
 
+# True answers the query with Dijkstra over the graph, without generating the matrix files
+USE_QUERY_ENGINE = False
+
 if __name__=="__main__":
     """
     Main entry point for the CLI application.
     Loads graph, vertices, predecessors, and length matrix from files if available.
     Computes and prints the shortest path between two stations, including step-by-step traversal and transfer information.
-    If the required files do not exist, generates them using Floyd-Warshall.
+    The files are regenerated when the station data or the build parameters changed (see build_cache).
     """
-    if path.isfile("src\\files\\predecessors.txt") and path.isfile("src\\files\\floyd_washal_lenght.txt"):
-        # Load all necessary data from files
-        graph = load_graph_from_file("src\\files\\graph.txt")
-        predecessors = load_predecessors_from_file("src\\files\\predecessors.txt")
-        vertices = load_vertices_from_file("src\\files\\vertices.txt")
-        lengh_matrix = load_length_matrix_from_file("src\\files\\floyd_washal_lenght.txt")
+    if USE_QUERY_ENGINE:
+        # Build the graph in memory and answer the query over its CSR arrays
+        vertices, graph = build_network()
+        csr = build_csr_graph(graph, vertices)
+    else:
+        # Rebuild the files if the inputs changed, then load all necessary data from them
+        ensure_artifacts(ARTIFACTS_DIRECTORY)
+        graph = load_graph_from_file(GRAPH_FILE)
+        lengh_matrix, predecessors, vertices = load_binary_network(ARTIFACTS_DIRECTORY)
 
-        temp = []
-        origem = 340
-        destino = 312
-        
-        # Print origin and destination station info
-        print(vertices[origem-1].to_string())
-        print(vertices[destino-1].to_string())
-        
-        # Print shortest path length (in minutes)
-        now = datetime.now().time()
-        crime_rate = 0.0
+    temp = []
+    origem = 340
+    destino = 312
+    
+    # Print origin and destination station info
+    print(vertices[origem-1].to_string())
+    print(vertices[destino-1].to_string())
+    
+    # Print shortest path length (in minutes)
+    now = datetime.now().time()
+    crime_rate = 0.0
+    if USE_QUERY_ENGINE:
+        short_path = dijkstra_short_path(csr, vertices[origem - 1], vertices[destino - 1])
+        print(f"Short lenght from {origem - 1} to {destino - 1}: {path_distance(csr, short_path)/AVERAGE_SPEED*60:.2f} minutes")
+    else:
         print(f"Short lenght from {origem - 1} to {destino - 1}: {lengh_matrix[origem - 1][destino - 1]/AVERAGE_SPEED*60:.2f} minutes")
-        short_path = get_short_path(vertices, predecessors, vertices[origem - 1],vertices[destino - 1])
-        for index, current_vertex in enumerate(short_path):
-            crime_rate += float(current_vertex.crime_rate)
-            if index == 0:
-                now = next_train_time(current_vertex.line, current_vertex.station_name, now, 0.0)
-                print(f"{index+1} - {current_vertex.to_string()} - Next Train: {now.strftime("%H:%M:%S")}")
-                print(f"Acumulated crime_rate: {crime_rate/(index+1)}")
-                continue
-            
-            previous_vertex = short_path[index-1]
+        short_path = get_short_path_indexed(vertices, predecessors, vertices[origem - 1],vertices[destino - 1])
+    for index, current_vertex in enumerate(short_path):
+        crime_rate += float(current_vertex.crime_rate)
+        if index == 0:
+            now = next_train_time(current_vertex.line, current_vertex.station_name, now, 0.0)
+            print(f"{index+1} - {current_vertex.to_string()} - Next Train: {now.strftime("%H:%M:%S")}")
+            print(f"Acumulated crime_rate: {crime_rate/(index+1)}")
+            continue
+        
+        previous_vertex = short_path[index-1]
 
-            edge_found = None
-            for edge in graph.adjacency_list.get(previous_vertex, []):
-                if edge[0] == current_vertex:
-                    edge_found = edge
-                    break
+        edge_found = None
+        for edge in graph.adjacency_list.get(previous_vertex, []):
+            if edge[0] == current_vertex:
+                edge_found = edge
+                break
+        
+        if edge_found:
             
-            if edge_found:
-                
-                # If the third element has not None, it is a transfer (walked)
-                if edge_found[2] != None:
-                    print(f"{index+1} - {current_vertex.to_string()} - Walked")
-                    print(f"Acumulated crime_rate: {crime_rate/(index+1)}")
+            # If the third element has not None, it is a transfer (walked)
+            if edge_found[2] != None:
+                print(f"{index+1} - {current_vertex.to_string()} - Walked")
+                print(f"Acumulated crime_rate: {crime_rate/(index+1)}")
+            else:
+                if USE_QUERY_ENGINE:
+                    travel_time = csr.edge_weight(csr.index_of[previous_vertex], csr.index_of[current_vertex])/AVERAGE_SPEED
                 else:
                     travel_time = (lengh_matrix[index-1][index]/AVERAGE_SPEED)
-                    now = next_train_time(current_vertex.line, current_vertex.station_name, now, travel_time)
-                    print(f"{index+1} - {current_vertex.to_string()} - Next Train: {now.strftime("%H:%M:%S")}")
-                    print(f"Acumulated crime_rate: {crime_rate/(index+1)}")
-            else:
-                print(f"{index+1} - {current_vertex.to_string()}")
-
-    else:
-        # If files do not exist, generate them
-        generate_floyd_warshall()
+                now = next_train_time(current_vertex.line, current_vertex.station_name, now, travel_time)
+                print(f"{index+1} - {current_vertex.to_string()} - Next Train: {now.strftime("%H:%M:%S")}")
+                print(f"Acumulated crime_rate: {crime_rate/(index+1)}")
+        else:
+            print(f"{index+1} - {current_vertex.to_string()}")
 
@@ -0,0 +1,185 @@
+from src.models.vertice_definition import vertice
+from src.floyd_warshall.floyd_warshall import get_short_paths_batch, ARTIFACTS_DIRECTORY
+from src.floyd_warshall.manage_files import load_binary_network
+from src.models.vertex_registry_definition import vertex_registry
+from os import path
+import argparse
+import hashlib
+import json
+import os
+import time
+import numpy as np
+
+"""
+map_figure.py
+---------------------
+Figure of the route map of the Dash app, as plain figure dictionaries (no Plotly object is built).
+The base layer (every line and station, plus an empty route trace) only depends on the vertices, so it
+is built once, cached as JSON in src/files/base_map.json under a digest of the stations, and sent with
+the page. A route then only changes the route trace and the map view, which the app sends as a
+Patch. Run python -m src.map_figure to compare the payload of a route update with the figure the app
+sent per route before (one route trace on an empty map) and with a full figure, and to see how much
+the base map adds to the first page load.
+"""
+
+BASE_MAP_VERSION = 1
+BASE_MAP_FILE = path.join("src", "files", "base_map.json")
+ROUTE_TRACE = 2            # Index of the route trace in the figure data
+COORDINATE_DECIMALS = 6    # About 0.1 m, keeps the JSON small
+ROUTE_ZOOM = 12            # Map zoom when a route is shown
+
+def _station_rows(vertices: list[vertice]) -> list[tuple]:
+    return [(int(v.id), round(float(v.lat), COORDINATE_DECIMALS), round(float(v.lon), COORDINATE_DECIMALS), str(v.station_name), str(v.line)) for v in vertices]
+
+def base_map_figure(vertices: list[vertice]) -> dict:
+    """
+    Figure with the whole network: one trace with the line segments, one with the stations and an empty route trace.
+    Args:
+        vertices (list[vertice]): Vertices of the network, in the order of define_vertice.
+    Returns:
+        dict: Figure dictionary ({"data": [...], "layout": {...}}).
+    """
+    rows = _station_rows(vertices)
+    lines = {}
+    for row in rows:
+        lines.setdefault(row[4], []).append(row)
+    # Consecutive vertices of a line are connected, as in define_routes; None breaks the line between segments
+    line_lats, line_lons = [], []
+    for members in lines.values():
+        line_lats += [row[1] for row in members] + [None]
+        line_lons += [row[2] for row in members] + [None]
+
+    lats = [row[1] for row in rows]
+    lons = [row[2] for row in rows]
+    return {
+        "data": [
+            {"type": "scattermapbox", "name": "Linhas", "mode": "lines", "lat": line_lats, "lon": line_lons,
+             "line": {"width": 1.5, "color": "#9E9E9E"}, "hoverinfo": "skip"},
+            {"type": "scattermapbox", "name": "Estações", "mode": "markers", "lat": lats, "lon": lons,
+             "marker": {"size": 5, "color": "#616161"}, "text": [f"{row[3]} ({row[4]})" for row in rows], "hoverinfo": "text"},
+            {"type": "scattermapbox", "name": "Rota", "mode": "markers+lines", "lat": [], "lon": [],
+             "marker": {"size": 10, "color": "#00AD54"}, "line": {"width": 3, "color": "blue"}, "text": []},
+        ],
+        "layout": {
+            "mapbox": {"style": "open-street-map", "zoom": 11,
+                       "center": {"lat": float(np.mean(lats)) if lats else 0.0, "lon": float(np.mean(lons)) if lons else 0.0}},
+            "margin": {"r": 0, "t": 0, "l": 0, "b": 0},
+            "showlegend": False,
+        },
+    }
+
+def load_base_map(vertices: list[vertice], file_path: str = BASE_MAP_FILE) -> dict:
+    """
+    Base map of the vertices, read from the JSON cache or built (and cached) when the stations changed.
+    Args:
+        vertices (list[vertice]): Vertices of the network.
+        file_path (str): JSON cache file.
+    Returns:
+        dict: Figure dictionary of base_map_figure.
+    """
+    key = hashlib.sha256(json.dumps([BASE_MAP_VERSION, _station_rows(vertices)]).encode()).hexdigest()
+    try:
+        with open(file_path, "r", encoding="utf-8") as file:
+            cached = json.load(file)
+        if cached.get("key") == key:
+            return cached["figure"]
+    except (OSError, ValueError):
+        pass
+
+    figure = base_map_figure(vertices)
+    os.makedirs(path.dirname(file_path) or ".", exist_ok=True)
+    temporary = file_path + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump({"key": key, "figure": figure}, file, separators=(",", ":"))
+    os.replace(temporary, file_path)
+    return figure
+
+def route_update(path: list[vertice]) -> dict:
+    """
+    Values changed by a route: the points of the route trace, and the map center (the first station) and zoom.
+    Args:
+        path (list[vertice]): Route, empty to clear it.
+    Returns:
+        dict: {"lat", "lon", "text"} of the route trace, "center" ({"lat", "lon"}) and "zoom" (None for an empty route).
+    """
+    return {
+        "lat": [round(float(v.lat), COORDINATE_DECIMALS) for v in path],
+        "lon": [round(float(v.lon), COORDINATE_DECIMALS) for v in path],
+        "text": [f"{v.station_name} ({v.line})" for v in path],
+        "center": {"lat": float(path[0].lat), "lon": float(path[0].lon)} if path else None,
+        "zoom": ROUTE_ZOOM if path else None,
+    }
+
+def full_figure(base_map: dict, path: list[vertice]) -> dict:
+    """
+    Copy of the base map with the route, to send the whole figure instead of a Patch.
+    """
+    update = route_update(path)
+    data = list(base_map["data"])
+    data[ROUTE_TRACE] = {**data[ROUTE_TRACE], "lat": update["lat"], "lon": update["lon"], "text": update["text"]}
+    layout = base_map["layout"]
+    if update["center"] is not None:
+        layout = {**layout, "mapbox": {**layout["mapbox"], "center": update["center"], "zoom": update["zoom"]}}
+    return {"data": data, "layout": layout}
+
+def legacy_route_figure(path: list[vertice]) -> dict:
+    """
+    Figure the app sent for each route before the base map: a go.Figure with the route trace only, as a dict.
+    go.Figure also serializes its default template, so the JSON size of this dict is a lower bound.
+    """
+    return {
+        "data": [{"type": "scattermapbox", "mode": "markers+lines", "lat": [float(v.lat) for v in path], "lon": [float(v.lon) for v in path],
+                  "marker": {"size": 10, "color": "#00AD54"}, "text": [f"{v.station_name} ({v.line})" for v in path],
+                  "line": {"width": 3, "color": "blue"}}],
+        "layout": {"mapbox": {"style": "open-street-map", "zoom": ROUTE_ZOOM, "center": {"lat": float(path[0].lat), "lon": float(path[0].lon)}},
+                   "margin": {"r": 0, "t": 0, "l": 0, "b": 0}},
+    }
+
+def compare_payloads(vertices: list[vertice], predecessors: np.ndarray, routes: int = 200, seed: int = 0) -> dict:
+    """
+    JSON size and build time, for random routes, of the figure the app sent per route before the base
+    map (legacy_figure), of the base map with the route (full_figure) and of a route update.
+    The route update size is the patched values only (Dash adds a small envelope per operation).
+    The base map is sent once with the page, where the graph used to start without a figure.
+    Args:
+        vertices (list[vertice]): Vertices in matrix order.
+        predecessors (np.ndarray): Predecessor index matrix.
+        routes (int): Number of random routes.
+        seed (int): Seed of the station pairs.
+    Returns:
+        dict: Base map bytes, the mean bytes and milliseconds of each kind of update, and the number
+            of routes after which the base map is paid back against legacy_figure.
+    """
+    registry = vertex_registry(vertices)
+    generator = np.random.default_rng(seed)
+    origins = generator.integers(0, len(registry), routes)
+    destinies = generator.integers(0, len(registry), routes)
+    # Routes between different stations, like the callback (an empty path cleared the figure)
+    paths = [p for p in get_short_paths_batch(registry, predecessors, origins, destinies) if p]
+    base_map = base_map_figure(registry.vertices)
+
+    measures = {}
+    for name, build in (("legacy_figure", legacy_route_figure), ("full_figure", lambda p: full_figure(base_map, p)), ("route_update", route_update)):
+        start = time.perf_counter()
+        sizes = [len(json.dumps(build(p), separators=(",", ":"))) for p in paths]
+        measures[name] = {"bytes": float(np.mean(sizes)), "milliseconds": (time.perf_counter() - start) / len(paths) * 1000}
+    measures["base_map_bytes"] = len(json.dumps(base_map, separators=(",", ":")))
+    saved = measures["legacy_figure"]["bytes"] - measures["route_update"]["bytes"]
+    measures["break_even_routes"] = measures["base_map_bytes"] / saved if saved > 0 else float("inf")
+    return measures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the payload of a full route map figure and of a route update.")
+    parser.add_argument("--artifacts", default=ARTIFACTS_DIRECTORY)
+    parser.add_argument("--routes", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    _, predecessors, vertices = load_binary_network(args.artifacts)
+    measures = compare_payloads(vertices, predecessors, args.routes)
+    print(f"Base map: {measures['base_map_bytes'] / 1024:.1f} KiB added to the first page load")
+    for name in ("legacy_figure", "full_figure", "route_update"):
+        print(f"  {name:<13} {measures[name]['bytes'] / 1024:8.1f} KiB  {measures[name]['milliseconds']:7.3f} ms per route")
+    print(f"The base map is paid back after {measures['break_even_routes']:.1f} routes against legacy_figure (a lower bound of the go.Figure JSON)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+from src.models.vertice_definition import vertice
+import numpy as np
+
+"""
+csr_graph_definition.py
+---------------------
+Defines the csr_graph class, a compact Compressed Sparse Row representation of the subway graph.
+Neighbors of the vertice at index i are neighbors[offsets[i]:offsets[i+1]], with matching weights.
+"""
+
+class csr_graph:
+    """
+    Represents a subway graph packed in CSR arrays.
+    Attributes:
+        offsets (np.ndarray): int64 array of size n+1 with the start of each vertice's neighbors.
+        neighbors (np.ndarray): int32 array with the index of each neighbor.
+        weights (np.ndarray): float64 array with the weight of each edge.
+        vertices (list[vertice]): Vertices in index order.
+        index_of (dict[vertice:int]): Index of each vertice.
+        centroids (tuple | None): Complex centroids and scale cached by the A* heuristic.
+    """
+    def __init__(self, offsets: np.ndarray, neighbors: np.ndarray, weights: np.ndarray, vertices: list[vertice]):
+        # Initialize graph attributes
+        self.offsets = offsets
+        self.neighbors = neighbors
+        self.weights = weights
+        self.vertices = vertices
+        self.index_of = {v: index for index, v in enumerate(vertices)}
+        self.centroids = None
+
+    def __len__(self):
+        return len(self.vertices)
+
+    def edges_from(self, index: int) -> tuple[list[int], list[float]]:
+        """
+        Return the neighbors and weights of the vertice at the given index.
+        Args:
+            index (int): Index of the vertice.
+        Returns:
+            tuple[list[int], list[float]]: Neighbor indices and edge weights.
+        """
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.neighbors[start:end].tolist(), self.weights[start:end].tolist()
+
+    def edge_weight(self, origin: int, destiny: int) -> float:
+        """
+        Return the weight of the edge between two vertice indices.
+        Args:
+            origin (int): Index of the origin vertice.
+            destiny (int): Index of the destiny vertice.
+        Returns:
+            float: Edge weight, or inf if the vertices are not adjacent.
+        """
+        neighbors, weights = self.edges_from(origin)
+        for neighbor, weight in zip(neighbors, weights):
+            if neighbor == destiny:
+                return weight
+        return float('inf')
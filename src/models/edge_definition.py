@@ -37,7 +37,7 @@ class edge:
         Returns:
             int: Hash value.
         """
-        return hash(hash(self.origin), hash(self.destiny))
+        return hash((hash(self.origin), hash(self.destiny)))
 
     def to_string(self):
         """
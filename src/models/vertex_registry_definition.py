@@ -0,0 +1,51 @@
+from src.models.vertice_definition import vertice
+import numpy as np
+
+"""
+vertex_registry_definition.py
+---------------------
+Defines the vertex_registry class, mapping vertice ids to matrix indices and back in O(1).
+The order of the registry is the order of the rows and columns of the Floyd-Warshall matrices.
+"""
+
+class vertex_registry:
+    """
+    Index of a list of vertices.
+    Attributes:
+        vertices (list[vertice]): Vertices in index order (index -> vertice).
+        ids (np.ndarray): int64 array with the id of each index.
+        index_by_id (dict[int:int]): Index of each vertice id.
+    """
+    def __init__(self, vertices: list[vertice]):
+        # Initialize registry attributes
+        self.vertices = list(vertices)
+        self.ids = np.array([int(v.id) for v in self.vertices], dtype=np.int64)
+        self.index_by_id = {vertex_id: index for index, vertex_id in enumerate(self.ids.tolist())}
+
+    def __len__(self):
+        return len(self.vertices)
+
+    def __getitem__(self, index: int) -> vertice:
+        return self.vertices[index]
+
+    def __iter__(self):
+        return iter(self.vertices)
+
+    def index_of(self, v: vertice) -> int | None:
+        """
+        Return the index of a vertice, or None if it is not registered.
+        """
+        return self.index_by_id.get(int(v.id))
+
+    def index_of_id(self, vertex_id) -> int | None:
+        """
+        Return the index of a vertice id (int or numeric string), or None if it is not registered.
+        """
+        return self.index_by_id.get(int(vertex_id))
+
+    def by_id(self, vertex_id) -> vertice | None:
+        """
+        Return the vertice with the given id, or None if it is not registered.
+        """
+        index = self.index_of_id(vertex_id)
+        return None if index is None else self.vertices[index]
@@ -0,0 +1,140 @@
+import sys
+import numpy as np
+
+"""
+vertex_table_definition.py
+---------------------
+Defines the vertex_table class, a struct-of-arrays store of the subway vertices, and vertex_view,
+a lightweight __slots__ object reading one row of it. A view has the same attributes as a vertice
+(id, lat, lon, station_name, line, complex_id, crime_rate), so it can be used wherever a vertice is read.
+Together with int predecessor indices, this replaces the n^2 vertice references of the legacy matrices.
+"""
+
+class vertex_view:
+    """
+    Read-only view of one row of a vertex_table.
+    Attributes:
+        table (vertex_table): The table.
+        index (int): Row of the vertice in the table.
+    """
+    __slots__ = ("table", "index")
+
+    def __init__(self, table: "vertex_table", index: int):
+        self.table = table
+        self.index = index
+
+    @property
+    def id(self) -> int:
+        return int(self.table.ids[self.index])
+
+    @property
+    def lat(self) -> float:
+        return float(self.table.lats[self.index])
+
+    @property
+    def lon(self) -> float:
+        return float(self.table.lons[self.index])
+
+    @property
+    def station_name(self) -> str:
+        return self.table.station_names[self.index]
+
+    @property
+    def line(self) -> str:
+        return self.table.line_names[self.table.line_codes[self.index]]
+
+    @property
+    def complex_id(self) -> int:
+        return int(self.table.complex_ids[self.index])
+
+    @property
+    def crime_rate(self) -> float:
+        return float(self.table.crime_rates[self.index])
+
+    def __eq__(self, other):
+        """
+        Check equality with another view or vertice based on ID.
+        """
+        if not hasattr(other, "id"):
+            return False
+        return self.id == int(other.id)
+
+    def __hash__(self):
+        # Same hash as a vertice with the same ID
+        return hash(self.id)
+
+    def to_string(self):
+        """
+        Return vertice information as a formatted string.
+        Returns:
+            str: String representation of the vertice.
+        """
+        return f"Coordinates: {self.lat}, {self.lon} - Line: {self.line} - ID: {self.id} - Name: {self.station_name} - Complex ID: {self.complex_id} - Crime Rate: {self.crime_rate}"
+
+class vertex_table:
+    """
+    Subway vertices stored as parallel arrays, in matrix index order.
+    Attributes:
+        ids (np.ndarray): int32 id of each vertice.
+        lats (np.ndarray): float64 latitude.
+        lons (np.ndarray): float64 longitude.
+        station_names (list[str]): Station name (names repeat across lines, so the strings are shared).
+        line_codes (np.ndarray): int16 index of the line in line_names.
+        line_names (list[str]): Distinct line names.
+        complex_ids (np.ndarray): int32 complex id.
+        crime_rates (np.ndarray): float64 crime rate.
+    """
+    def __init__(self, ids, lats, lons, station_names, lines, complex_ids, crime_rates):
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        names = {}
+        self.station_names = [names.setdefault(str(name), str(name)) for name in station_names]
+        line_names, line_codes = np.unique(np.asarray([str(line) for line in lines], dtype=str), return_inverse=True)
+        self.line_names = line_names.tolist()
+        self.line_codes = line_codes.astype(np.int16)
+        self.complex_ids = np.asarray(complex_ids, dtype=np.int32)
+        self.crime_rates = np.asarray(crime_rates, dtype=np.float64)
+
+    @classmethod
+    def from_vertices(cls, vertices: list) -> "vertex_table":
+        """
+        Build the table from vertice objects.
+        """
+        return cls([int(v.id) for v in vertices], [float(v.lat) for v in vertices], [float(v.lon) for v in vertices],
+                   [v.station_name for v in vertices], [v.line for v in vertices],
+                   [int(v.complex_id) for v in vertices], [float(v.crime_rate) for v in vertices])
+
+    @classmethod
+    def from_array(cls, table: np.ndarray) -> "vertex_table":
+        """
+        Build the table from the structured vertex array of the binary artifacts (VERTEX_TABLE_DTYPE).
+        """
+        return cls(table["id"], table["lat"], table["lon"], table["station_name"].tolist(), table["line"].tolist(), table["complex_id"], table["crime_rate"])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index: int) -> vertex_view:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("vertex_table index out of range")
+        return vertex_view(self, index)
+
+    def __iter__(self):
+        return (vertex_view(self, index) for index in range(len(self)))
+
+    def lines(self) -> np.ndarray:
+        """
+        Line name of every vertice.
+        """
+        return np.asarray(self.line_names)[self.line_codes]
+
+    def nbytes(self) -> int:
+        """
+        Approximate memory used by the table, strings included.
+        """
+        arrays = sum(array.nbytes for array in (self.ids, self.lats, self.lons, self.line_codes, self.complex_ids, self.crime_rates))
+        strings = sum(sys.getsizeof(name) for name in set(self.station_names)) + sum(sys.getsizeof(name) for name in self.line_names)
+        return arrays + strings + sys.getsizeof(self.station_names)
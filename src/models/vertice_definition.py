@@ -16,6 +16,9 @@ class vertice:
         station_name (str): Name of the station.
         line (str): Subway line name or code.
         complex_id (int): Identifier for station complexes (for transfers).
+        crime_rate (float): Crimes per capita around the station.
+        total_crimes (int): Number of crimes at the station.
+        total_riders (int): Number of riders at the station.
     """
     def __init__(self, id:int, lat:float, lon:float, station_name:str, line:str, complex_id:int, crime_rate:float, total_crimes:int=0, total_riders:int=0):
         # Initialize vertice attributes
@@ -26,18 +29,18 @@ class vertice:
         self.line = line
         self.complex_id = complex_id
         self.crime_rate = crime_rate
-        self.total_crimes = 0
-        self.total_riders = 0
+        self.total_crimes = total_crimes
+        self.total_riders = total_riders
     
     def __eq__(self, other):
         """
-        Check equality with another vertice based on ID.
+        Check equality with another vertice (or vertex_view) based on ID.
         Args:
             other (vertice): Another vertice object.
         Returns:
             bool: True if IDs are equal, False otherwise.
         """
-        if not isinstance(other, vertice):
+        if not hasattr(other, "id"):
             return False
         return int(self.id) == int(other.id)
 
@@ -1,31 +1,218 @@
 import pandas as pd
+import numpy as np
+import hashlib
+import os
+from os import path
 from datetime import datetime, timedelta
+from src.instrumentation import timed, count, stage, progress
 
-stops = pd.read_csv("src\\gtfs_files\\stops.txt")
-routes = pd.read_csv("src\\gtfs_files\\routes.txt")
-trips = pd.read_csv("src\\gtfs_files\\trips.txt")
-stop_times = pd.read_csv("src\\gtfs_files\\stop_times.txt")
-calendar = pd.read_csv("src\\gtfs_files\\calendar.txt")
+GTFS_DIRECTORY = path.join("src", "gtfs_files")
+GTFS_CACHE_DIRECTORY = path.join("src", "files", "gtfs_cache")
+GTFS_TABLES = ('stops', 'routes', 'trips', 'stop_times', 'calendar')
 day_week = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+SECONDS_PER_DAY = 24 * 3600
 
-def parse_time(t):
+class timetable_index:
     """
-    Converts a string in the format HH:MM:SS to a datetime.time object,
-    adjusting for hours greater than 24.
+    Timetable compiled once from the GTFS tables.
+    Attributes:
+        departures (dict[tuple:np.ndarray]): Sorted arrival times (seconds since midnight of the service day,
+            possibly above 24:00) for each (route_id, stop_name, service_id).
+        route_ids (dict[str:object]): route_id of each route_short_name.
+        services_by_day (list[list]): service_ids active on each day of the week (0 = monday).
+    """
+    def __init__(self, departures: dict, route_ids: dict, services_by_day: list):
+        self.departures = departures
+        self.route_ids = route_ids
+        self.services_by_day = services_by_day
+
+    @classmethod
+    def from_gtfs(cls, stops: pd.DataFrame, routes: pd.DataFrame, trips: pd.DataFrame, stop_times: pd.DataFrame, calendar: pd.DataFrame) -> "timetable_index":
+        """
+        Build the index from the GTFS tables.
+        Args:
+            stops, routes, trips, stop_times, calendar (pd.DataFrame): GTFS tables.
+        Returns:
+            timetable_index: The compiled timetable.
+        """
+        table = stop_times[['trip_id', 'arrival_time', 'stop_id']].merge(trips[['trip_id', 'route_id', 'service_id']], on='trip_id')
+        table = table.merge(stops[['stop_id', 'stop_name']], on='stop_id')
+        table['seconds'] = time_to_seconds(table['arrival_time'])
+        table = table.dropna(subset=['seconds'])
+
+        departures = {}
+        for key, group in table.groupby(['route_id', 'stop_name', 'service_id'], sort=False):
+            departures[key] = np.sort(group['seconds'].to_numpy(dtype=np.int32))
+
+        route_ids = dict(zip(routes['route_short_name'].astype(str), routes['route_id']))
+        services_by_day = [calendar[calendar[day] == 1]['service_id'].tolist() for day in day_week]
+        return cls(departures, route_ids, services_by_day)
+
+    def next_arrival(self, route_id, stop_name: str, weekday: int, seconds: float) -> int | None:
+        """
+        First arrival strictly after a given moment, looking at the services of the current day and
+        the times after 24:00 of the previous day's services. The next day's services are only
+        searched when the moment itself is already past midnight.
+        Args:
+            route_id: GTFS route_id.
+            stop_name (str): Name of the stop.
+            weekday (int): Day of the week of the moment (0 = monday).
+            seconds (float): Seconds since midnight of that day (may exceed one day).
+        Returns:
+            int | None: Seconds since midnight of that day of the next arrival, or None if there is none.
+        """
+        best = None
+        offsets = (-1, 0, 1) if seconds >= SECONDS_PER_DAY else (-1, 0)
+        for offset in offsets:
+            for service_id in self.services_by_day[(weekday + offset) % 7]:
+                times = self.departures.get((route_id, stop_name, service_id))
+                if times is None:
+                    continue
+                shift = offset * SECONDS_PER_DAY
+                position = np.searchsorted(times, seconds - shift, side='right')
+                if position < len(times):
+                    candidate = int(times[position]) + shift
+                    if best is None or candidate < best:
+                        best = candidate
+        return best
 
+def file_hash(file_path: str) -> str:
+    """
+    SHA-256 digest of a file, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def save_columnar(table: pd.DataFrame, cache_path: str) -> bool:
+    """
+    Save a table as an uncompressed .npz file with one array per column.
+    Text columns are stored as int32 codes plus the array of their distinct values.
     Args:
-        t (str): Time string in the format 'HH:MM:SS'. May exceed 24 hours.
+        table (pd.DataFrame): Table read from the GTFS file.
+        cache_path (str): Path of the .npz file.
+    Returns:
+        bool: False, and nothing is written, if a text column holds values that are not strings.
+    """
+    arrays = {"columns": np.array(table.columns, dtype=str)}
+    for index, column in enumerate(table.columns):
+        values = table[column]
+        if not pd.api.types.is_numeric_dtype(values.dtype):
+            codes, categories = pd.factorize(values)
+            if not all(isinstance(category, str) for category in categories):
+                return False
+            arrays[f"codes_{index}"] = codes.astype(np.int32)
+            arrays[f"categories_{index}"] = np.array(list(categories), dtype=str)
+        else:
+            arrays[f"values_{index}"] = values.to_numpy()
+
+    os.makedirs(path.dirname(cache_path), exist_ok=True)
+    temporary = cache_path + ".tmp"
+    with open(temporary, 'wb') as file:
+        np.savez(file, **arrays)
+    os.replace(temporary, cache_path)
+    return True
 
+def load_columnar(cache_path: str) -> pd.DataFrame:
+    """
+    Load a table saved by save_columnar.
+    Args:
+        cache_path (str): Path of the .npz file.
+    Returns:
+        pd.DataFrame: The table, with the same columns and dtypes as read from the CSV file.
+    """
+    with np.load(cache_path, allow_pickle=False) as data:
+        columns = data["columns"].tolist()
+        table = {}
+        for index, column in enumerate(columns):
+            if f"codes_{index}" in data.files:
+                # Code -1 (missing value) picks the NaN appended at the end
+                lookup = np.append(data[f"categories_{index}"].astype(object), np.nan)
+                table[column] = lookup[data[f"codes_{index}"]]
+            else:
+                table[column] = data[f"values_{index}"]
+    return pd.DataFrame(table, columns=columns)
+
+@timed("load_gtfs_table")
+def load_gtfs_table(name: str, directory: str = GTFS_DIRECTORY, cache_directory: str = GTFS_CACHE_DIRECTORY, use_cache: bool = True) -> pd.DataFrame:
+    """
+    Read a GTFS table, from the columnar cache when it holds the current version of the file.
+    Cache files are keyed by the SHA-256 of the source file, so an updated feed is parsed again
+    and its cache replaces the stale one.
+    Args:
+        name (str): Table name (e.g. 'stop_times').
+        directory (str): Directory of the GTFS .txt files.
+        cache_directory (str): Directory of the .npz cache.
+        use_cache (bool): If False, always parse the CSV file.
     Returns:
-        datetime.time or None: A time object, or None if parsing fails.
-    """
-    try:
-        h, m, s = map(int, t.split(":"))
-        h = h % 24  # To avoid errors with hours above 24
-        return datetime.strptime(f"{h:02}:{m:02}:{s:02}", "%H:%M:%S").time()
-    except:
-        return None
-    
+        pd.DataFrame: The table.
+    """
+    source = path.join(directory, f"{name}.txt")
+    if not use_cache:
+        return pd.read_csv(source)
+
+    prefix = f"{name}-"
+    cache_path = path.join(cache_directory, f"{prefix}{file_hash(source)[:16]}.npz")
+    if path.exists(cache_path):
+        try:
+            table = load_columnar(cache_path)
+            count("gtfs_cache_hits")
+            return table
+        except (OSError, ValueError, KeyError):
+            count("gtfs_cache_invalid")
+            progress(f"Invalid cache {cache_path}, reading {source}.")
+
+    count("gtfs_cache_misses")
+    table = pd.read_csv(source)
+    if save_columnar(table, cache_path):
+        for file_name in os.listdir(cache_directory):
+            stale = path.join(cache_directory, file_name)
+            if file_name.startswith(prefix) and file_name.endswith(".npz") and stale != cache_path:
+                os.remove(stale)
+    return table
+
+_gtfs = {}
+
+def get_gtfs_table(name: str) -> pd.DataFrame:
+    """
+    Return a GTFS table, loading it on the first call.
+    """
+    if name not in _gtfs:
+        _gtfs[name] = load_gtfs_table(name)
+    return _gtfs[name]
+
+def __getattr__(name):
+    # The tables (stops, routes, trips, stop_times, calendar) are loaded on first access, not at import
+    if name in GTFS_TABLES:
+        return get_gtfs_table(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+_timetable = None
+
+def get_timetable() -> timetable_index:
+    """
+    Return the timetable index, building it on the first call.
+    """
+    global _timetable
+    if _timetable is None:
+        tables = [get_gtfs_table(name) for name in GTFS_TABLES]
+        with stage("timetable_build"):
+            _timetable = timetable_index.from_gtfs(*tables)
+    return _timetable
+
+def time_to_seconds(values: pd.Series) -> pd.Series:
+    """
+    Convert GTFS HH:MM:SS strings (hours may exceed 24) to seconds since midnight of the service day.
+    Invalid values become NaN.
+    """
+    parts = values.astype(str).str.split(':', expand=True)
+    if parts.shape[1] != 3:
+        return pd.Series(np.nan, index=values.index)
+    parts = parts.apply(pd.to_numeric, errors='coerce')
+    return parts[0] * 3600 + parts[1] * 60 + parts[2]
+
 def sum_time_from_travel(time, add):
     """
     Adds a number of hours to a datetime.time object.
@@ -40,6 +227,7 @@ def sum_time_from_travel(time, add):
     dummy_date = datetime.combine(datetime.today(), time)
     return (dummy_date + timedelta(hours=add)).time()
 
+@timed("next_train_time")
 def next_train_time(line, station, hour, time_travel):
     """
     Returns the time of the next available train for a given line and station,
@@ -56,35 +244,22 @@ def next_train_time(line, station, hour, time_travel):
     """
     # 1. Find out the current day of the week
     today_index = datetime.now().weekday()  # 0 = monday, 6 = sunday
-    today = day_week[today_index]
-
-    # 2. Filters the service_ids active today
-    active_services = calendar[calendar[today] == 1]['service_id'].tolist()
 
-    # 3. Filters trips from line and with service_id valid today
+    # 2. Find the route of the line
     line_prefix = line[0]
     if line_prefix == 'S':
         line_prefix = "SI"
-    
-    line_id = routes[routes['route_short_name'] == line_prefix]['route_id'].values[0]
-    valid_trips = trips[(trips['route_id'] == line_id) & (trips['service_id'].isin(active_services))]
+    timetable = get_timetable()
+    line_id = timetable.route_ids[line_prefix]
 
-    # 4. Filter times for these trips
-    schedules = stop_times[stop_times['trip_id'].isin(valid_trips['trip_id'])]
-    schedules = schedules.merge(stops, on='stop_id')
-    station_schedules = schedules[schedules['stop_name'] == station]
-
-    # 5. Convert times and filter by current time
+    # 3. Search the next arrival after the current time plus the travel time
     now_plus_time_travel = sum_time_from_travel(hour,time_travel)
-    station_schedules = station_schedules.copy()
-    station_schedules['arrival_time_parsed'] = station_schedules['arrival_time'].apply(parse_time)
-    next_schedules = station_schedules[station_schedules['arrival_time_parsed'] > now_plus_time_travel]
+    seconds = hour.hour * 3600 + hour.minute * 60 + hour.second + hour.microsecond / 1e6 + time_travel * 3600
+    next_arrival = timetable.next_arrival(line_id, station, today_index, seconds)
 
-    # 6. Get the next time and convert it to a string
-    if next_schedules.empty:
+    # 4. Convert it to a time, folding arrivals after midnight into the next day
+    if next_arrival is None:
         return now_plus_time_travel
-    
-    next_train = next_schedules.sort_values(by='arrival_time_parsed').iloc[0]
-    next_train_hour = next_train['arrival_time_parsed']
-    
-    return next_train_hour
+
+    next_arrival %= SECONDS_PER_DAY
+    return (datetime.min + timedelta(seconds=next_arrival)).time()
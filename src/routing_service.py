@@ -0,0 +1,535 @@
+from src.floyd_warshall import ARTIFACTS_DIRECTORY, ensure_artifacts, load_binary_network, get_short_paths_batch, dynamic_apsp, load_artifact_edges, load_artifact_network
+from src.floyd_warshall.floyd_warshall import AVERAGE_SPEED
+from src.models.vertex_registry_definition import vertex_registry
+from src.floyd_utils import calculate_route_crime_rate_score
+from src.next_train import GTFS_TABLES, next_train_time, get_gtfs_table
+from src.spatial_index import nearest_grid
+from src.connection_scan import WALKING_SPEED, connection_scan
+from src.distance import haversine_km
+from src import instrumentation
+from src.instrumentation import timed, count
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from datetime import datetime, timedelta
+import argparse
+import json
+import threading
+import numpy as np
+
+"""
+routing_service.py
+---------------------
+Local HTTP/JSON routing service. The binary artifacts are loaded once, and requests are answered
+concurrently by a fixed pool of worker threads. Closures update a dynamic_apsp copy of the matrices;
+each route reads one published snapshot of them, so it never sees a closure half applied.
+Journeys on the timetable itself are answered by a connection_scan router built at startup.
+Endpoints:
+    GET /route?origin=<id>&destiny=<id>[&time=HH:MM]   Path, distance, ETA and crime score.
+    GET /route?from=<lat>,<lon>&to=<lat>,<lon>[&time=HH:MM]
+                                                      Same, between two coordinates, with the walks to and from the stations.
+    GET /journey?origin=<id>&destiny=<id>[&time=HH:MM]  Earliest arrival on the GTFS timetable (Connection Scan), leg by leg.
+    GET /nearest?lat=<lat>&lon=<lon>[&k=<k>]          The k nearest stations and the walk to each one.
+    GET /stations                                     Ids, names and lines of the stations.
+    POST /close?station=<id>                          Close a station (all of its segments).
+    POST /close?origin=<id>&destiny=<id>              Close the segment between two stations.
+    POST /reopen[?steps=<n>]                          Undo the last n closures (1 by default).
+    GET /closures                                     Closures in effect, oldest first.
+    GET /health                                       Liveness check.
+    GET /metrics                                      Stage timers and counters (Prometheus text format).
+Run it with:
+    python -m src.routing_service --port 8060 --workers 8 [--metrics-log metrics.jsonl]
+"""
+
+DEFAULT_PORT = 8060
+DEFAULT_WORKERS = 8
+NEAREST_STATIONS = 3   # Stations tried at each end of a route between coordinates
+MAX_NEAREST = 16       # Largest k of /nearest
+
+class route_service:
+    """
+    Route queries over the memory-mapped Floyd-Warshall artifacts.
+    Unless rebuild is False, the artifacts are first brought up to date with ensure_artifacts.
+    Attributes:
+        lengths (np.ndarray): Length matrix in kilometers.
+        predecessors (np.ndarray): Predecessor index matrix.
+        vertices (vertex_table): The vertices, in matrix order.
+        registry (vertex_registry): id <-> index lookup.
+        stations_grid (nearest_grid): Nearest-station index over the vertice coordinates.
+        timetable (bool): Whether the GTFS timetable is available for the next-train lookup.
+        journeys (connection_scan | None): Earliest-arrival router over the timetable, None without it.
+        closures_apsp (dynamic_apsp | None): Matrices under the closures, built on the first closure.
+        closed (list[dict]): Description of each closure in effect, in the order of the dynamic_apsp history.
+    """
+    def __init__(self, artifacts_directory: str = ARTIFACTS_DIRECTORY, use_timetable: bool = True, rebuild: bool = True):
+        if rebuild:
+            ensure_artifacts(artifacts_directory)
+        self.artifacts_directory = artifacts_directory
+        self.lengths, self.predecessors, self.vertices = load_binary_network(artifacts_directory)
+        self.closures_apsp = None
+        self.closed = []
+        self.closures_lock = threading.Lock()
+        self.registry = vertex_registry(self.vertices)
+        self.stations_grid = nearest_grid(self.vertices.lats, self.vertices.lons)
+        # Build the candidate table before serving, so concurrent requests never build it twice
+        self.stations_grid.nearest(self.vertices.lats[0], self.vertices.lons[0], NEAREST_STATIONS)
+        self.timetable = use_timetable and self._warm_timetable()
+        self.journeys = self._warm_journeys() if self.timetable else None
+
+    def _warm_timetable(self) -> bool:
+        # Build the timetable before serving, so concurrent requests never build it twice
+        try:
+            next_train_time(self.vertices[0].line, self.vertices[0].station_name, datetime.now().time(), 0.0)
+            return True
+        except (OSError, KeyError, ValueError) as error:
+            instrumentation.progress(f"Timetable not available, ETAs use the requested time: {error}")
+            return False
+
+    def _warm_journeys(self) -> connection_scan:
+        # The connection arrays, the footpaths of the network cache and today's sorted connections, before serving
+        stops, _, trips, stop_times, calendar = (get_gtfs_table(name) for name in GTFS_TABLES)
+        router = connection_scan.from_gtfs(stops, trips, stop_times, calendar)
+        network = load_artifact_network(self.artifacts_directory)
+        if network is not None:
+            router.add_footpaths_from_graph(network[1], network[0])
+        else:
+            instrumentation.progress("No network cache next to the artifacts, journeys have no walking transfers")
+        router.prepare_days([datetime.now().weekday()])
+        return router
+
+    def stations(self) -> list[dict]:
+        """
+        Id, name and line of every station.
+        """
+        return [{"id": v.id, "station_name": v.station_name, "line": v.line} for v in self.vertices]
+
+    @timed("route")
+    def route(self, origin_id: int, destiny_id: int, departure=None) -> dict | None:
+        """
+        Shortest route between two station ids.
+        Args:
+            origin_id (int): Id of the origin station.
+            destiny_id (int): Id of the destiny station.
+            departure (datetime.time): Time of arrival at the origin station; now if None.
+        Returns:
+            dict | None: Route description, or None if a station id is unknown.
+        Raises:
+            LookupError: If there is no path between the stations.
+        """
+        i = self.registry.index_of_id(origin_id)
+        j = self.registry.index_of_id(destiny_id)
+        if i is None or j is None:
+            return None
+        return self._route(i, j, departure)
+
+    def _matrices(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Length and predecessor matrices to answer one request with: the loaded artifacts, or the
+        last published snapshot once a station or segment was closed.
+        """
+        closures = self.closures_apsp
+        return closures.snapshot() if closures is not None else (self.lengths, self.predecessors)
+
+    def _route(self, i: int, j: int, departure=None, matrices: tuple[np.ndarray, np.ndarray] = None) -> dict:
+        """
+        Shortest route between two vertice indices (see route).
+        """
+        lengths, predecessors = matrices if matrices is not None else self._matrices()
+        # The batch walker does not print, so it is safe to call from many threads
+        indices = get_short_paths_batch(self.registry, predecessors, [i], [j], as_indices=True)[0]
+        if not indices:
+            raise LookupError("No path between the stations")
+
+        path = [self.vertices[index] for index in indices]
+        origin, destiny = path[0], path[-1]
+        distance = float(sum(lengths[a, b] for a, b in zip(indices, indices[1:])))
+        minutes = distance / AVERAGE_SPEED * 60.0
+        crime_rate = sum(v.crime_rate for v in path) / len(path)
+
+        departure = departure or datetime.now().time()
+        train = departure
+        if self.timetable:
+            try:
+                train = next_train_time(origin.line, origin.station_name, departure, 0.0)
+            except KeyError:
+                # Line missing from the timetable
+                pass
+        arrival = (datetime.combine(datetime.today(), train) + timedelta(minutes=minutes)).time()
+        return {
+            "origin": origin.id,
+            "destiny": destiny.id,
+            "path": [{"id": v.id, "station_name": v.station_name, "line": v.line, "lat": v.lat, "lon": v.lon} for v in path],
+            "connections": len(path) - 1,
+            "distance_km": round(distance, 4),
+            "duration_minutes": round(minutes, 2),
+            "next_train": train.strftime("%H:%M:%S"),
+            "arrival": arrival.strftime("%H:%M:%S"),
+            "crime_rate": round(crime_rate, 6),
+            "crime_score": calculate_route_crime_rate_score(round(crime_rate, 6)),
+        }
+
+    @timed("journey")
+    def journey(self, origin_id: int, destiny_id: int, departure=None) -> dict | None:
+        """
+        Earliest arrival on the GTFS timetable between two station ids, with the Connection Scan router.
+        Args:
+            origin_id (int): Id of the origin station.
+            destiny_id (int): Id of the destiny station.
+            departure (datetime.time): Departure time from the origin station, today; now if None.
+        Returns:
+            dict | None: Departure, arrival and train/walk legs, or None if a station id is unknown.
+        Raises:
+            RuntimeError: If the timetable is not available.
+            LookupError: If the destiny cannot be reached today after the departure.
+        """
+        if self.journeys is None:
+            raise RuntimeError("Journeys need the GTFS timetable")
+        i = self.registry.index_of_id(origin_id)
+        j = self.registry.index_of_id(destiny_id)
+        if i is None or j is None:
+            return None
+        when = datetime.combine(datetime.today(), departure or datetime.now().time())
+        arrival, legs = self.journeys.route(self.vertices[i], self.vertices[j], when)
+        if arrival is None:
+            raise LookupError("No journey between the stations today after the departure")
+        start = when.hour * 3600 + when.minute * 60 + when.second
+        return {
+            "origin": origin_id,
+            "destiny": destiny_id,
+            "departure": self._clock(start),
+            "arrival": self._clock(arrival),
+            "duration_minutes": round((arrival - start) / 60.0, 2),
+            "legs": [{"kind": kind, "from": a, "to": b, "departure": self._clock(leg_departure), "arrival": self._clock(leg_arrival), "route_id": route}
+                     for kind, a, b, leg_departure, leg_arrival, route in legs],
+        }
+
+    @staticmethod
+    def _clock(seconds: int) -> str:
+        # GTFS style: times of the next day go past 24:00:00
+        return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+    def nearest(self, lat: float, lon: float, k: int = NEAREST_STATIONS) -> list[dict]:
+        """
+        The k nearest stations of a coordinate, nearest first.
+        Args:
+            lat (float): Latitude.
+            lon (float): Longitude.
+            k (int): Number of stations.
+        Returns:
+            list[dict]: Id, name, line and coordinates of each station, and the walk to it.
+        """
+        indices, meters = self.stations_grid.nearest(lat, lon, k)
+        stations = [(self.vertices[index], distance) for index, distance in zip(indices[0].tolist(), meters[0].tolist())]
+        return [{"id": v.id, "station_name": v.station_name, "line": v.line, "lat": v.lat, "lon": v.lon, **self._walk(distance)} for v, distance in stations]
+
+    @staticmethod
+    def _walk(meters: float) -> dict:
+        return {"walk_meters": round(meters, 1), "walk_minutes": round(meters / WALKING_SPEED / 60.0, 2)}
+
+    @timed("route_coordinates")
+    def route_coordinates(self, origin: tuple[float, float], destiny: tuple[float, float], departure=None) -> dict:
+        """
+        Fastest route between two coordinates: a walk to a station, the subway, and a walk from a station.
+        The NEAREST_STATIONS nearest stations of each end are tried, and the pair with the shortest walks
+        plus ride is kept; walking the whole way is chosen when it is faster than that route.
+        Args:
+            origin (tuple[float, float]): Latitude and longitude of the start.
+            destiny (tuple[float, float]): Latitude and longitude of the end.
+            departure (datetime.time): Time of departure from the start; now if None.
+        Returns:
+            dict: The route of route between the chosen stations (empty path when walking), with "from", "to",
+            the walks ("walk_to_origin", "walk_from_destiny"), "total_minutes" and the arrival at the end.
+        Raises:
+            LookupError: If no pair of the nearest stations is connected (however short the walk).
+        """
+        k = min(NEAREST_STATIONS, len(self.vertices))
+        starts, start_meters = self.stations_grid.nearest(origin[0], origin[1], k)
+        ends, end_meters = self.stations_grid.nearest(destiny[0], destiny[1], k)
+        to_minutes = 1 / WALKING_SPEED / 60.0
+        matrices = self._matrices()
+        ride = np.asarray(matrices[0][np.ix_(starts[0], ends[0])], dtype=np.float64) / AVERAGE_SPEED * 60.0
+        totals = start_meters[0][:, None] * to_minutes + ride + end_meters[0][None, :] * to_minutes
+        a, b = np.unravel_index(np.argmin(totals), totals.shape)
+        direct = float(haversine_km(origin[0], origin[1], destiny[0], destiny[1])) * 1000
+        start = datetime.combine(datetime.today(), departure or datetime.now().time())
+        ends_of = {"from": {"lat": origin[0], "lon": origin[1]}, "to": {"lat": destiny[0], "lon": destiny[1]}}
+
+        if not np.isfinite(totals[a, b]):
+            raise LookupError("No path between the nearest stations")
+        if direct * to_minutes <= totals[a, b]:
+            end = start + timedelta(minutes=direct * to_minutes)
+            return {**ends_of, "origin": None, "destiny": None, "path": [], "connections": 0, "distance_km": 0.0, "duration_minutes": 0.0,
+                    "walk_to_origin": self._walk(direct), "walk_from_destiny": self._walk(0.0),
+                    "total_minutes": round(direct * to_minutes, 2), "arrival": end.strftime("%H:%M:%S")}
+
+        walk_to, walk_from = float(start_meters[0][a]), float(end_meters[0][b])
+        at_station = start + timedelta(minutes=walk_to * to_minutes)
+        result = self._route(int(starts[0][a]), int(ends[0][b]), at_station.time(), matrices)
+        # The subway route arrives after the wait for the train and the ride, possibly past midnight
+        ride_end = datetime.combine(at_station.date(), datetime.strptime(result["arrival"], "%H:%M:%S").time())
+        if ride_end < at_station:
+            ride_end += timedelta(days=1)
+        end = ride_end + timedelta(minutes=walk_from * to_minutes)
+        return {**ends_of, **result, "walk_to_origin": self._walk(walk_to), "walk_from_destiny": self._walk(walk_from),
+                "total_minutes": round((end - start).total_seconds() / 60.0, 2), "arrival": end.strftime("%H:%M:%S")}
+
+    def _closures(self) -> dynamic_apsp:
+        # Called with closures_lock held
+        if self.closures_apsp is None:
+            edges = load_artifact_edges(self.artifacts_directory)
+            if edges is None:
+                raise RuntimeError("Closures need the build manifest and the network cache of the artifacts")
+            self.closures_apsp = dynamic_apsp.from_attributes(*edges, self.lengths, self.predecessors)
+        return self.closures_apsp
+
+    def close_station(self, station_id: int) -> list[dict] | None:
+        """
+        Close a station: every segment to and from it is removed until it is reopened.
+        Args:
+            station_id (int): Id of the station.
+        Returns:
+            list[dict] | None: Closures in effect, or None if the station id is unknown.
+        Raises:
+            RuntimeError: If the artifacts have no network cache to update.
+        """
+        index = self.registry.index_of_id(station_id)
+        if index is None:
+            return None
+        with self.closures_lock:
+            self._closures().close_station(index)
+            self.closed.append({"station": station_id})
+            return list(self.closed)
+
+    def close_segment(self, origin_id: int, destiny_id: int) -> list[dict] | None:
+        """
+        Close the segment between two adjacent stations.
+        Args:
+            origin_id (int): Id of one station.
+            destiny_id (int): Id of the other station.
+        Returns:
+            list[dict] | None: Closures in effect, or None if a station id is unknown.
+        Raises:
+            LookupError: If there is no open segment between the stations.
+            RuntimeError: If the artifacts have no network cache to update.
+        """
+        i = self.registry.index_of_id(origin_id)
+        j = self.registry.index_of_id(destiny_id)
+        if i is None or j is None:
+            return None
+        with self.closures_lock:
+            closures = self._closures()
+            if not np.isfinite(closures.edge_weight(i, j)):
+                raise LookupError("No open segment between the stations")
+            closures.remove_edge(i, j)
+            self.closed.append({"origin": origin_id, "destiny": destiny_id})
+            return list(self.closed)
+
+    def reopen(self, steps: int = 1) -> list[dict]:
+        """
+        Undo the last closures.
+        Args:
+            steps (int): Number of closures to undo.
+        Returns:
+            list[dict]: Closures still in effect.
+        """
+        with self.closures_lock:
+            steps = min(steps, len(self.closed))
+            if steps > 0:
+                self.closures_apsp.rollback(steps)
+                del self.closed[len(self.closed) - steps:]
+            return list(self.closed)
+
+    def closures(self) -> list[dict]:
+        """
+        Closures in effect, oldest first.
+        """
+        with self.closures_lock:
+            return list(self.closed)
+
+class route_request_handler(BaseHTTPRequestHandler):
+    """
+    JSON handler of the routing endpoints; the service is read from the server.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status: int, body: dict | list | str):
+        count("http_responses")
+        if status >= 400:
+            count("http_errors")
+        if isinstance(body, str):
+            payload, content_type = body.encode(), "text/plain; version=0.0.4"
+        else:
+            payload, content_type = json.dumps(body).encode(), "application/json"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        service = self.server.service
+        if url.path == "/health":
+            return self._send(200, {"status": "ok", "stations": len(service.vertices)})
+        if url.path == "/stations":
+            return self._send(200, service.stations())
+        if url.path == "/metrics":
+            return self._send(200, instrumentation.prometheus_text())
+        if url.path == "/closures":
+            return self._send(200, service.closures())
+        if url.path == "/nearest":
+            try:
+                lat, lon = float(query["lat"][0]), float(query["lon"][0])
+                k = int(query["k"][0]) if "k" in query else NEAREST_STATIONS
+            except (KeyError, ValueError):
+                return self._send(400, {"error": "Expected numeric lat and lon and an optional integer k"})
+            if not 1 <= k <= min(MAX_NEAREST, len(service.vertices)):
+                return self._send(400, {"error": f"k must be between 1 and {min(MAX_NEAREST, len(service.vertices))}"})
+            return self._send(200, service.nearest(lat, lon, k))
+        if url.path == "/journey":
+            try:
+                origin = int(query["origin"][0])
+                destiny = int(query["destiny"][0])
+                departure = datetime.strptime(query["time"][0], "%H:%M").time() if "time" in query else None
+            except (KeyError, ValueError):
+                return self._send(400, {"error": "Expected integer origin and destiny ids and an optional time=HH:MM"})
+            try:
+                result = service.journey(origin, destiny, departure)
+            except LookupError as error:
+                return self._send(404, {"error": str(error)})
+            except RuntimeError as error:
+                return self._send(503, {"error": str(error)})
+            if result is None:
+                return self._send(404, {"error": "Unknown station id"})
+            return self._send(200, result)
+        if url.path != "/route":
+            return self._send(404, {"error": "Unknown endpoint"})
+        if "from" in query or "to" in query:
+            try:
+                origin = tuple(float(value) for value in query["from"][0].split(","))
+                destiny = tuple(float(value) for value in query["to"][0].split(","))
+                departure = datetime.strptime(query["time"][0], "%H:%M").time() if "time" in query else None
+                if len(origin) != 2 or len(destiny) != 2:
+                    raise ValueError
+            except (KeyError, ValueError):
+                return self._send(400, {"error": "Expected from=<lat>,<lon> and to=<lat>,<lon> and an optional time=HH:MM"})
+            try:
+                return self._send(200, service.route_coordinates(origin, destiny, departure))
+            except LookupError as error:
+                return self._send(404, {"error": str(error)})
+        try:
+            origin = int(query["origin"][0])
+            destiny = int(query["destiny"][0])
+            departure = datetime.strptime(query["time"][0], "%H:%M").time() if "time" in query else None
+        except (KeyError, ValueError):
+            return self._send(400, {"error": "Expected integer origin and destiny ids and an optional time=HH:MM"})
+        try:
+            result = service.route(origin, destiny, departure)
+        except LookupError as error:
+            return self._send(404, {"error": str(error)})
+        if result is None:
+            return self._send(404, {"error": "Unknown station id"})
+        return self._send(200, result)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        service = self.server.service
+        # The closures are given in the query string: drain any body so the connection stays usable
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if url.path == "/reopen":
+            try:
+                steps = int(query["steps"][0]) if "steps" in query else 1
+            except ValueError:
+                return self._send(400, {"error": "Expected an integer steps"})
+            return self._send(200, service.reopen(steps))
+        if url.path != "/close":
+            return self._send(404, {"error": "Unknown endpoint"})
+        try:
+            if "station" in query:
+                closed = service.close_station(int(query["station"][0]))
+            else:
+                closed = service.close_segment(int(query["origin"][0]), int(query["destiny"][0]))
+        except (KeyError, ValueError):
+            return self._send(400, {"error": "Expected an integer station id, or integer origin and destiny ids"})
+        except LookupError as error:
+            return self._send(404, {"error": str(error)})
+        except RuntimeError as error:
+            return self._send(503, {"error": str(error)})
+        if closed is None:
+            return self._send(404, {"error": "Unknown station id"})
+        return self._send(200, closed)
+
+    def log_message(self, format, *args):
+        # Per-request logging would dominate the latency under load
+        pass
+
+class pooled_http_server(HTTPServer):
+    """
+    HTTP server handing each connection to a fixed-size thread pool instead of a new thread.
+    """
+    daemon_threads = True
+    request_queue_size = 128  # The default backlog of 5 drops connections under concurrent clients
+
+    def __init__(self, address, service: route_service, workers: int = DEFAULT_WORKERS):
+        super().__init__(address, route_request_handler)
+        self.service = service
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+def serve(port: int = DEFAULT_PORT, workers: int = DEFAULT_WORKERS, artifacts_directory: str = ARTIFACTS_DIRECTORY, host: str = "127.0.0.1", service: route_service = None) -> pooled_http_server:
+    """
+    Start the routing server in a background thread.
+    Args:
+        port (int): TCP port (0 picks a free one).
+        workers (int): Threads answering requests.
+        artifacts_directory (str): Directory of the binary artifacts.
+        host (str): Interface to listen on.
+        service (route_service): Already loaded service; loaded from artifacts_directory if None.
+    Returns:
+        pooled_http_server: The running server; call shutdown() and server_close() to stop it.
+    """
+    server = pooled_http_server((host, port), service or route_service(artifacts_directory), workers)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve shortest routes over HTTP/JSON.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--artifacts", default=ARTIFACTS_DIRECTORY)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--no-rebuild", action="store_true", help="Serve the artifacts as they are, without checking the build manifest")
+    parser.add_argument("--no-metrics", action="store_true", help="Do not collect the /metrics figures")
+    parser.add_argument("--metrics-log", help="Append the stage timings as JSON lines to this file")
+    args = parser.parse_args(argv)
+    # Keep stdout for the server messages, and collect the metrics served at /metrics
+    instrumentation.set_progress(False)
+    if not args.no_metrics:
+        instrumentation.enable(args.metrics_log)
+    server = pooled_http_server((args.host, args.port), route_service(args.artifacts, rebuild=not args.no_rebuild), args.workers)
+    print(f"Routing service on http://{args.host}:{server.server_address[1]} with {args.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,440 @@
+from src.distance import haversine_km, EARTH_RADIUS_KM
+import math
+import numpy as np
+
+"""
+spatial_index.py
+---------------------
+Uniform latitude/longitude grids over vertice coordinates.
+spatial_grid answers radius queries: each cell is at least as wide as the indexed radius, so all
+neighbours of a point within that radius lie in its own cell or in one of the 8 surrounding cells.
+nearest_grid answers nearest-k queries for whole arrays of points at once: each cell keeps the points
+that can be among the k nearest of any point inside it, found by searching the rings of cells around it
+until nothing outside them can be closer, and a query point only compares itself with those candidates.
+The distances are haversine, as in spatial_grid.
+"""
+
+# Smallest length of one degree of latitude on the WGS-84 ellipsoid (at the equator)
+METERS_PER_DEGREE_LAT = 110574.0
+# Length of one degree of longitude at the equator; scaled by cos(lat) below
+METERS_PER_DEGREE_LON = 111320.0
+NEAREST_POINTS_PER_CELL = 0.5   # Mean number of indexed points per cell of nearest_grid
+NEAREST_CHUNK = 65536           # Query points searched together, bounds the memory of a batch
+NEAREST_MARGIN = 10000          # Meters around the indexed points where query points use the candidate tables
+NEAREST_OUTER_SCALE = 4         # Cell side of the coarse grid answering the query points around the indexed area, in cells
+NEAREST_TABLE_K = 16            # Largest k answered from candidate tables; larger ones compare every point
+NEAREST_MARGIN_CELLS = 64       # Most cells across the margin, bounds the grid when the points are close together
+
+class spatial_grid:
+    """
+    Uniform grid index over a set of coordinates.
+    Attributes:
+        lats (np.ndarray): Latitude of each indexed point.
+        lons (np.ndarray): Longitude of each indexed point.
+        radius_m (float): Radius (meters) the cells were sized for.
+        cells (dict[tuple[int, int]:list[int]]): Point indices stored in each cell.
+    """
+    def __init__(self, lats, lons, radius_m: float):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.radius_m = radius_m
+        max_abs_lat = float(np.max(np.abs(self.lats))) if len(self.lats) else 0.0
+        # Degrees are converted with the shortest meters-per-degree of the indexed area,
+        # so a cell is never narrower than radius_m
+        self.cell_lat = radius_m / METERS_PER_DEGREE_LAT
+        self.cell_lon = radius_m / (METERS_PER_DEGREE_LON * max(math.cos(math.radians(min(max_abs_lat, 89.0))), 1e-6))
+        self.cells = {}
+        rows, cols = self._cell_of(self.lats, self.lons)
+        for index, key in enumerate(zip(rows.tolist(), cols.tolist())):
+            self.cells.setdefault(key, []).append(index)
+
+    @classmethod
+    def from_vertices(cls, vertices: list, radius_m: float) -> "spatial_grid":
+        """
+        Build the grid over the coordinates of a list of vertices; query results are indices in that list.
+        Args:
+            vertices (list[vertice]): List of vertice objects.
+            radius_m (float): Radius (meters) the cells are sized for.
+        Returns:
+            spatial_grid: The index.
+        """
+        return cls([float(v.lat) for v in vertices], [float(v.lon) for v in vertices], radius_m)
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _cell_of(self, lat, lon):
+        return np.floor(np.asarray(lat) / self.cell_lat).astype(np.int64), np.floor(np.asarray(lon) / self.cell_lon).astype(np.int64)
+
+    def candidates(self, lat: float, lon: float) -> list[int]:
+        """
+        Indices of the points in the cell of (lat, lon) and in the 8 surrounding cells, in ascending order.
+        Args:
+            lat (float): Latitude of the query point.
+            lon (float): Longitude of the query point.
+        Returns:
+            list[int]: Candidate indices, a superset of the points within radius_m.
+        """
+        row, col = self._cell_of(lat, lon)
+        row, col = int(row), int(col)
+        found = []
+        for d_row in (-1, 0, 1):
+            for d_col in (-1, 0, 1):
+                found.extend(self.cells.get((row + d_row, col + d_col), ()))
+        found.sort()
+        return found
+
+    def query_radius(self, lat: float, lon: float, radius_m: float | None = None) -> list[int]:
+        """
+        Indices of the points within radius_m (haversine) of (lat, lon), in ascending order.
+        Args:
+            lat (float): Latitude of the query point.
+            lon (float): Longitude of the query point.
+            radius_m (float | None): Search radius in meters, at most the radius the grid was built for.
+        Returns:
+            list[int]: Indices of the neighbours.
+        """
+        radius_m = self.radius_m if radius_m is None else radius_m
+        if radius_m > self.radius_m:
+            raise ValueError(f"Radius {radius_m} m is larger than the grid radius {self.radius_m} m")
+        found = np.array(self.candidates(lat, lon), dtype=np.int64)
+        if len(found) == 0:
+            return []
+        distances = haversine_km(lat, lon, self.lats[found], self.lons[found]) * 1000
+        return found[distances <= radius_m].tolist()
+
+    def candidate_pairs(self) -> list[tuple[int, int]]:
+        """
+        Ordered pairs (i, j), i != j, of points sharing a cell neighbourhood, sorted by i then j.
+        Every pair of points within radius_m of each other is included.
+        Returns:
+            list[tuple[int, int]]: Candidate pairs.
+        """
+        pairs = []
+        for i in range(len(self)):
+            for j in self.candidates(self.lats[i], self.lons[i]):
+                if j != i:
+                    pairs.append((i, j))
+        return pairs
+
+class nearest_grid:
+    """
+    Dense uniform grid over a set of coordinates for vectorized nearest-k queries.
+    The points are sorted by cell, and each cell keeps the range of its points (CSR layout). Query points
+    inside the grid are answered from a table of candidates per cell, built on the first query of each k
+    up to NEAREST_TABLE_K. The grid covers the indexed area; a margin of margin_m meters around it is
+    covered by a grid with outer_scale times wider cells (or by this grid when outer_scale is 1), and
+    spans at least half the size of the indexed area when that grid is used.
+    Query points beyond the margin, and larger k, are compared with every point.
+    Attributes:
+        lats (np.ndarray): Latitude of each indexed point.
+        lons (np.ndarray): Longitude of each indexed point.
+        origin (tuple[float, float]): Latitude and longitude of the corner of cell (0, 0).
+        cell_lat, cell_lon (float): Size of a cell, in degrees.
+        rows, cols (int): Number of cells along the latitude and the longitude.
+        cell_start (np.ndarray): Start of the points of each cell (row * cols + col) in order, plus the end.
+        order (np.ndarray): Point indices sorted by cell.
+        max_abs_lat (float): Largest absolute latitude of the indexed points.
+        outer (nearest_grid | None): Coarse grid over the same points and the margin.
+        empty_rings (np.ndarray): Number of rings of empty cells around each cell (Chebyshev distance to the nearest occupied cell).
+    """
+    def __init__(self, lats, lons, points_per_cell: float = NEAREST_POINTS_PER_CELL, margin_m: float = NEAREST_MARGIN, outer_scale: int = NEAREST_OUTER_SCALE):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        if len(self.lats) == 0:
+            raise ValueError("nearest_grid needs at least one point")
+        lat_min, lat_max = float(self.lats.min()), float(self.lats.max())
+        lon_min, lon_max = float(self.lons.min()), float(self.lons.max())
+        self.max_abs_lat = float(np.max(np.abs(self.lats)))
+        # Square cells (in meters at the mean latitude), about points_per_cell points each
+        scale = max(math.cos(math.radians((lat_min + lat_max) / 2)), 1e-6)
+        height = (lat_max - lat_min) * METERS_PER_DEGREE_LAT
+        width = (lon_max - lon_min) * METERS_PER_DEGREE_LON * scale
+        cells = max(len(self.lats) / points_per_cell, 1.0)
+        # The margin is covered by a coarse grid: fine cells far from every point would be slow to tabulate.
+        # It spans at least half the indexed area on each side, so a wide network keeps a wide margin
+        self.outer = None
+        if margin_m > 0 and outer_scale > 1:
+            self.outer = nearest_grid(self.lats, self.lons, points_per_cell * outer_scale ** 2, max(margin_m, max(height, width) / 2), outer_scale=1)
+            margin_m = 0
+        # A single point (or points at the same place) would otherwise get 1 m cells across the whole margin
+        side = max(math.sqrt(height * width / cells), max(height, width) / cells, margin_m / NEAREST_MARGIN_CELLS, 1.0)
+        self.cell_lat = side / METERS_PER_DEGREE_LAT
+        self.cell_lon = side / (METERS_PER_DEGREE_LON * scale)
+        margin = int(margin_m / side)
+        self.origin = (lat_min - margin * self.cell_lat, lon_min - margin * self.cell_lon)
+        self.rows = int((lat_max - lat_min) / self.cell_lat) + 1 + 2 * margin
+        self.cols = int((lon_max - lon_min) / self.cell_lon) + 1 + 2 * margin
+
+        rows, cols = self._cell_of(self.lats, self.lons)
+        cell = rows * self.cols + cols
+        self.order = np.argsort(cell, kind="stable")
+        self.cell_start = np.searchsorted(cell[self.order], np.arange(self.rows * self.cols + 1))
+        self.empty_rings = self._empty_rings(np.diff(self.cell_start).reshape(self.rows, self.cols) > 0).ravel()
+        # Haversine terms of the points, computed once
+        self._phi = np.radians(self.lats)
+        self._lambda = np.radians(self.lons)
+        self._cos_phi = np.cos(self._phi)
+        self._tables = {}
+
+    @classmethod
+    def from_vertices(cls, vertices: list) -> "nearest_grid":
+        """
+        Build the grid over the coordinates of a list of vertices; query results are indices in that list.
+        Args:
+            vertices (list[vertice]): List of vertice objects.
+        Returns:
+            nearest_grid: The index.
+        """
+        return cls([float(v.lat) for v in vertices], [float(v.lon) for v in vertices])
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _cell_of(self, lat, lon):
+        return (np.floor((np.asarray(lat) - self.origin[0]) / self.cell_lat).astype(np.int64),
+                np.floor((np.asarray(lon) - self.origin[1]) / self.cell_lon).astype(np.int64))
+
+    @staticmethod
+    def _empty_rings(occupied: np.ndarray) -> np.ndarray:
+        """
+        Chebyshev distance (in cells) from each cell to the nearest occupied one, with the two-pass
+        chamfer transform: each pass sweeps the rows in order, taking the previous row and then the
+        running minimum along the row.
+        """
+        rows, cols = occupied.shape
+        steps = np.arange(cols)
+        distance = np.where(occupied, 0, rows + cols).astype(np.int64)
+        for row_order in (range(rows), range(rows - 1, -1, -1)):
+            previous = None
+            for r in row_order:
+                line = distance[r]
+                if previous is not None:
+                    line = np.minimum(line, previous + 1)
+                    line[1:] = np.minimum(line[1:], previous[:-1] + 1)
+                    line[:-1] = np.minimum(line[:-1], previous[1:] + 1)
+                line = np.minimum(np.minimum.accumulate(line - steps) + steps, (np.minimum.accumulate((line + steps)[::-1]) - steps[::-1])[::-1])
+                distance[r] = previous = line
+        return distance
+
+    def _outside_bound(self, lat, lon, row, col, ring):
+        """
+        Lower bound (meters) of the distance from each query point to any point outside the cells at
+        most ring cells away from its cell.
+        """
+        lat_edges = np.minimum(lat - (self.origin[0] + (row - ring) * self.cell_lat), self.origin[0] + (row + ring + 1) * self.cell_lat - lat)
+        lon_edges = np.minimum(lon - (self.origin[1] + (col - ring) * self.cell_lon), self.origin[1] + (col + ring + 1) * self.cell_lon - lon)
+        radius = EARTH_RADIUS_KM * 1000
+        # Along a meridian the distance is exact; across meridians it shrinks with the cosine of the
+        # highest latitude of the two points
+        cos_lat = np.cos(np.radians(np.minimum(np.maximum(np.abs(lat), self.max_abs_lat), 90.0)))
+        by_lon = 2 * radius * np.arcsin(np.minimum(cos_lat * np.sin(np.radians(np.minimum(lon_edges, 180.0)) / 2), 1.0))
+        bound = np.minimum(radius * np.radians(lat_edges), by_lon)
+        # Once the rings cover the whole grid, nothing is left outside
+        covers = (row - ring <= 0) & (row + ring >= self.rows - 1) & (col - ring <= 0) & (col + ring >= self.cols - 1)
+        return np.where(covers, np.inf, bound)
+
+    def _ring_cells(self, row, col, low, high):
+        """
+        Query of each grid cell between low and high cells away (Chebyshev) from the cell of each
+        query, and the cell number. The rings are enumerated as four bands clipped to the grid.
+        """
+        zero = np.zeros_like(low)
+        # (first row, last row, first col, last col) offsets of the top, bottom, left and right bands
+        bands = [(-high, -low, -high, high), (np.maximum(low, 1), high, -high, high),
+                 (1 - low, low - 1, -high, -low), (1 - low, low - 1, low, high)]
+        owners, cells = [], []
+        for first_row, last_row, first_col, last_col in bands:
+            first_row = np.maximum(row + first_row + zero, 0)
+            last_row = np.minimum(row + last_row + zero, self.rows - 1)
+            first_col = np.maximum(col + first_col + zero, 0)
+            last_col = np.minimum(col + last_col + zero, self.cols - 1)
+            heights = np.maximum(last_row - first_row + 1, 0)
+            widths = np.maximum(last_col - first_col + 1, 0)
+            sizes = heights * widths
+            owner = np.repeat(np.arange(len(row)), sizes)
+            d_row, d_col = np.divmod(np.arange(len(owner)) - np.repeat(np.cumsum(sizes) - sizes, sizes), np.repeat(np.maximum(widths, 1), sizes))
+            owners.append(owner)
+            cells.append((first_row[owner] + d_row) * self.cols + first_col[owner] + d_col)
+        return np.concatenate(owners), np.concatenate(cells)
+
+    def _ring_points(self, lats, lons, row, col, low, high, active):
+        """
+        Query index, point index and distance (meters) of the points in the rings low to high of each active query.
+        """
+        owner, cell = self._ring_cells(row[active], col[active], low[active], high[active])
+        counts = self.cell_start[cell + 1] - self.cell_start[cell]
+        owner = np.repeat(owner, counts)
+        starts = np.repeat(self.cell_start[cell] - (np.cumsum(counts) - counts), counts)
+        points = self.order[starts + np.arange(len(owner))]
+        queries = active[owner]
+        return queries, points, haversine_km(lats[queries], lons[queries], self.lats[points], self.lons[points]) * 1000
+
+    def _ring_search(self, lats, lons, visit):
+        """
+        Walk the rings of cells around each query point, from the first one with points, doubling the
+        width of the step each time.
+        visit(active, queries, points, meters, bound) receives the queries still searching, the points
+        found in the new rings and, for each active query, the lower bound of the distance to the points
+        not reached yet; it returns the mask of the active queries that are done.
+        """
+        row, col = self._cell_of(lats, lons)
+        # Rings closer than the grid have no cells, and rings of empty cells no points: start each query
+        # at the first ring with points
+        start = np.maximum.reduce([np.zeros(len(row), dtype=np.int64), -row, row - (self.rows - 1), -col, col - (self.cols - 1)])
+        inside = start == 0
+        start[inside] = self.empty_rings[row[inside] * self.cols + col[inside]]
+        low, high = start.copy(), start.copy()
+        active = np.arange(len(lats))
+        while len(active):
+            queries, points, meters = self._ring_points(lats, lons, row, col, low, high, active)
+            bound = self._outside_bound(lats[active], lons[active], row[active], col[active], high[active])
+            done = visit(active, queries, points, meters, bound)
+            low[active], high[active] = high[active] + 1, 2 * high[active] - start[active] + 1
+            active = active[~done]
+
+    @staticmethod
+    def _merge_best(best_index, best_meters, queries, points, meters):
+        """
+        Merge the points found for some queries into their k best so far (sorted by distance, then index).
+        """
+        k = best_index.shape[1]
+        # Only the points not farther than the current k-th can enter, usually few after the first rings
+        closer = meters <= best_meters[queries, k - 1]
+        queries, points, meters = queries[closer], points[closer], meters[closer]
+        if len(queries) == 0:
+            return
+        touched = np.unique(queries)
+        queries = np.concatenate([np.repeat(touched, k), queries])
+        points = np.concatenate([best_index[touched].ravel(), points])
+        meters = np.concatenate([best_meters[touched].ravel(), meters])
+        sort = np.lexsort((points, meters, queries))
+        queries, points, meters = queries[sort], points[sort], meters[sort]
+        first = np.r_[True, queries[1:] != queries[:-1]]
+        rank = np.arange(len(queries)) - np.maximum.accumulate(np.where(first, np.arange(len(queries)), 0))
+        chosen = rank < k
+        best_index[queries[chosen], rank[chosen]] = points[chosen]
+        best_meters[queries[chosen], rank[chosen]] = meters[chosen]
+
+    def _candidates(self, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Points that can be among the k nearest of a query point of each cell, as a (cells, width) table
+        padded with -1 and the number of candidates of each cell, built once per k.
+        If the k-th nearest point of the cell center is d meters away and its farthest corner h meters,
+        the k nearest points of any point of the cell are within d + 2h of the center (triangle inequality).
+        """
+        if k in self._tables:
+            return self._tables[k]
+        rows, cols = np.divmod(np.arange(self.rows * self.cols), self.cols)
+        center_lat = self.origin[0] + (rows + 0.5) * self.cell_lat
+        center_lon = self.origin[1] + (cols + 0.5) * self.cell_lon
+        corner = np.max([haversine_km(center_lat, center_lon, center_lat + d_lat * self.cell_lat / 2, center_lon + d_lon * self.cell_lon / 2)
+                         for d_lat in (-1, 1) for d_lon in (-1, 1)], axis=0) * 1000
+        cells, points = [], []
+        # Far from the points a center walks many cells: search fewer centers at a time than query points
+        for start in range(0, len(rows), NEAREST_CHUNK // 64):
+            chunk = slice(start, start + NEAREST_CHUNK // 64)
+            best_index = np.full((len(rows[chunk]), k), -1, dtype=np.int64)
+            best_meters = np.full((len(rows[chunk]), k), np.inf)
+            seen = []
+
+            def visit(active, queries, points, meters, bound):
+                # One walk finds the k nearest of the center and every point within d + 2h: the k-th
+                # distance so far is exact once the bound passes it
+                self._merge_best(best_index, best_meters, queries, points, meters)
+                seen.append((queries, points, meters))
+                return best_meters[active, k - 1] + 2 * corner[chunk][active] <= bound
+
+            self._ring_search(center_lat[chunk], center_lon[chunk], visit)
+            queries, found, meters = (np.concatenate(values) for values in zip(*seen))
+            within = meters <= best_meters[queries, k - 1] + 2 * corner[chunk][queries]
+            cells.append(queries[within] + start)
+            points.append(found[within])
+        cells, points = np.concatenate(cells), np.concatenate(points)
+
+        sort = np.lexsort((points, cells))
+        cells, points = cells[sort], points[sort]
+        counts = np.bincount(cells, minlength=len(rows))
+        table = np.full((len(rows), int(counts.max())), -1, dtype=np.int32)
+        table[cells, np.arange(len(cells)) - np.repeat(np.cumsum(counts) - counts, counts)] = points
+        self._tables[k] = (table, counts)
+        return self._tables[k]
+
+    def _select(self, lats: np.ndarray, lons: np.ndarray, candidates: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        The k nearest of the candidate points (row i for query point i, -1 for none), nearest first.
+        """
+        # The haversine term grows with the distance: rank by it and only take the arcsin of the k nearest
+        phi = np.radians(lats)[:, None]
+        terms = (np.sin((self._phi[candidates] - phi) / 2) ** 2
+                 + np.cos(phi) * self._cos_phi[candidates] * np.sin((self._lambda[candidates] - np.radians(lons)[:, None]) / 2) ** 2)
+        terms[candidates < 0] = np.inf
+        if candidates.shape[1] > k:
+            chosen = np.argpartition(terms, k - 1, axis=1)[:, :k]
+            candidates = np.take_along_axis(candidates, chosen, axis=1)
+            terms = np.take_along_axis(terms, chosen, axis=1)
+        order = np.lexsort((candidates, terms), axis=1)
+        meters = 2 * EARTH_RADIUS_KM * 1000 * np.arcsin(np.sqrt(np.minimum(np.take_along_axis(terms, order, axis=1), 1.0)))
+        return np.take_along_axis(candidates, order, axis=1), meters
+
+    def _table_nearest(self, lats: np.ndarray, lons: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Nearest-k search of query points inside the grid, among the candidates of their cell.
+        """
+        row, col = self._cell_of(lats, lons)
+        cell = row * self.cols + col
+        table, counts = self._candidates(k)
+        indices = np.empty((len(lats), k), dtype=np.int64)
+        meters = np.empty((len(lats), k))
+        # Queries are grouped by the number of candidates of their cell (rounded up to a power of two),
+        # so a few crowded cells do not widen the distance matrix of all the others
+        widths = 2 ** np.ceil(np.log2(np.maximum(counts[cell], k))).astype(np.int64)
+        for width in np.unique(widths).tolist():
+            group = np.flatnonzero(widths == width)
+            indices[group], meters[group] = self._select(lats[group], lons[group], table[cell[group], :width], k)
+        return indices, meters
+
+    def _all_nearest(self, lats: np.ndarray, lons: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Nearest-k search of query points against every point, for the query points outside the grid.
+        """
+        indices = np.empty((len(lats), k), dtype=np.int64)
+        meters = np.empty((len(lats), k))
+        step = max(1, NEAREST_CHUNK * 16 // len(self))
+        for start in range(0, len(lats), step):
+            chunk = slice(start, start + step)
+            candidates = np.broadcast_to(np.arange(len(self)), (len(lats[chunk]), len(self)))
+            indices[chunk], meters[chunk] = self._select(lats[chunk], lons[chunk], candidates, k)
+        return indices, meters
+
+    def nearest(self, lats, lons, k: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        """
+        The k nearest indexed points (haversine) of each query point, nearest first.
+        Args:
+            lats: Latitudes of the query points (scalar or array).
+            lons: Longitudes of the query points (scalar or array).
+            k (int): Number of neighbours, at most the number of indexed points.
+        Returns:
+            tuple[np.ndarray, np.ndarray]: (m, k) point indices and (m, k) distances in meters, m being the number of query points.
+        """
+        if not 1 <= k <= len(self):
+            raise ValueError(f"k must be between 1 and {len(self)}, got {k}")
+        lats = np.atleast_1d(np.asarray(lats, dtype=np.float64)).ravel()
+        lons = np.atleast_1d(np.asarray(lons, dtype=np.float64)).ravel()
+        if lats.shape != lons.shape:
+            raise ValueError("lats and lons must have the same length")
+        indices = np.empty((len(lats), k), dtype=np.int64)
+        meters = np.empty((len(lats), k))
+        row, col = self._cell_of(lats, lons)
+        inside = (row >= 0) & (row < self.rows) & (col >= 0) & (col < self.cols)
+        if k > NEAREST_TABLE_K:
+            inside[:] = False
+        outside = np.flatnonzero(~inside)
+        if len(outside) and self.outer is not None and k <= NEAREST_TABLE_K:
+            indices[outside], meters[outside] = self.outer.nearest(lats[outside], lons[outside], k)
+            outside = outside[:0]
+        for selected, search in ((np.flatnonzero(inside), self._table_nearest), (outside, self._all_nearest)):
+            for start in range(0, len(selected), NEAREST_CHUNK):
+                chunk = selected[start:start + NEAREST_CHUNK]
+                indices[chunk], meters[chunk] = search(lats[chunk], lons[chunk], k)
+        return indices, meters
@@ -0,0 +1,196 @@
+from src.models.vertice_definition import vertice
+from src.floyd_warshall.floyd_warshall import ARTIFACTS_DIRECTORY
+from src.floyd_warshall.manage_files import load_binary_network
+from bisect import bisect_left
+import argparse
+import heapq
+import re
+import time
+import unicodedata
+import numpy as np
+
+"""
+station_search.py
+---------------------
+Search index over the station names and lines, built once from the vertices, so the station dropdowns
+of the app only receive the best matches of what is typed instead of every station.
+A query is answered in three tiers, each one only filling the places left by the previous ones:
+    1. labels starting with the query            (binary search in the sorted labels)
+    2. labels with a word starting with each query word, in any order  (sorted words, rarest one first)
+    3. labels sharing the most trigrams with the query, for typos      (trigram posting lists)
+The stations are numbered in a fixed order (shorter names first, then alphabetically), so the best
+matches of a tier are its smallest numbers.
+"""
+
+DEFAULT_LIMIT = 10
+MIN_TRIGRAM_SHARE = 0.5  # Share of the query trigrams a typo match must have
+
+def normalize(text: str) -> str:
+    """
+    Lowercase text without accents or punctuation, words separated by one space.
+    """
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(character for character in text if not unicodedata.combining(character)).lower()
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", text).split())
+
+def trigrams(text: str) -> set[str]:
+    """
+    Trigrams of each word, padded so that short words and word starts have their own trigrams.
+    """
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[k:k + 3] for k in range(len(padded) - 2))
+    return grams
+
+class station_index:
+    """
+    Search index of the stations.
+    Attributes:
+        options (list[dict]): Dropdown option ({"label", "value"}) of each station, in rank order.
+        texts (list[str]): Normalized label of each station, in rank order.
+        labels (list[str]): Normalized labels, sorted.
+        label_ranks (np.ndarray): Station of each sorted label.
+        words (list[str]): Distinct normalized words of the labels, sorted.
+        word_ranks (list[np.ndarray]): Stations with each word, in rank order.
+        word_postings (np.ndarray): Cumulative number of stations of the sorted words.
+        text_words (list[tuple[str]]): Words of each normalized label, in rank order.
+        trigram_ranks (dict[str:np.ndarray]): Stations with each trigram.
+    """
+    def __init__(self, vertices: list[vertice]):
+        options = [{"label": f"{v.station_name} ({v.line})", "value": int(v.id)} for v in vertices]
+        texts = [normalize(f"{v.station_name} {v.line}") for v in vertices]
+        order = sorted(range(len(options)), key=lambda k: (len(texts[k]), texts[k], options[k]["value"]))
+        self.options = [options[k] for k in order]
+        self.texts = [texts[k] for k in order]
+        self.by_value = {option["value"]: option for option in self.options}
+
+        sorted_labels = sorted((text, rank) for rank, text in enumerate(self.texts))
+        self.labels = [text for text, _ in sorted_labels]
+        self.label_ranks = np.array([rank for _, rank in sorted_labels], dtype=np.int32)
+
+        words, grams = {}, {}
+        for rank, text in enumerate(self.texts):
+            for word in set(text.split()):
+                words.setdefault(word, []).append(rank)
+            for gram in trigrams(text):
+                grams.setdefault(gram, []).append(rank)
+        self.words = sorted(words)
+        self.word_ranks = [np.array(words[word], dtype=np.int32) for word in self.words]
+        self.word_postings = np.concatenate([[0], np.cumsum([len(ranks) for ranks in self.word_ranks])]).astype(np.int64)
+        self.text_words = [tuple(text.split()) for text in self.texts]
+        self.trigram_ranks = {gram: np.array(ranks, dtype=np.int32) for gram, ranks in grams.items()}
+
+    def __len__(self):
+        return len(self.options)
+
+    def option(self, value) -> dict | None:
+        """
+        Dropdown option of a station id, or None if it is unknown.
+        """
+        return self.by_value.get(value)
+
+    def _label_prefix(self, query: str) -> np.ndarray:
+        lo = bisect_left(self.labels, query)
+        hi = bisect_left(self.labels, query + "\x7f")
+        return self.label_ranks[lo:hi]
+
+    def _word_prefix(self, query: str, wanted: int) -> list[int]:
+        """
+        Smallest ranks whose label has a word starting with each query word.
+        The stations of the rarest query word are checked in rank order until enough of them match the others.
+        """
+        ranges = []
+        for word in query.split():
+            lo = bisect_left(self.words, word)
+            hi = bisect_left(self.words, word + "\x7f")
+            if lo == hi:
+                return []
+            ranges.append((int(self.word_postings[hi] - self.word_postings[lo]), word, lo, hi))
+        ranges.sort()
+        _, _, lo, hi = ranges[0]
+        others = [word for _, word, _, _ in ranges[1:]]
+        found = []
+        # The posting lists are in rank order: merge them lazily instead of building their union
+        for rank in heapq.merge(*(iter(ranks) for ranks in self.word_ranks[lo:hi])):
+            rank = int(rank)
+            if found and found[-1] == rank:
+                continue
+            words = self.text_words[rank]
+            if all(any(word.startswith(other) for word in words) for other in others):
+                found.append(rank)
+                if len(found) >= wanted:
+                    break
+        return found
+
+    def _trigram(self, query: str, limit: int) -> np.ndarray:
+        grams = [self.trigram_ranks[gram] for gram in trigrams(query) if gram in self.trigram_ranks]
+        if not grams:
+            return np.empty(0, dtype=np.int32)
+        shared = np.bincount(np.concatenate(grams), minlength=len(self.options))
+        candidates = np.flatnonzero(shared >= max(1, MIN_TRIGRAM_SHARE * len(trigrams(query))))
+        # Most shared trigrams first, then the rank order
+        return candidates[np.lexsort((candidates, -shared[candidates]))[:limit]]
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> list[dict]:
+        """
+        Best matching stations of a query.
+        Args:
+            query (str): Text typed by the user (name and/or line, in any case, with or without accents).
+            limit (int): Maximum number of results.
+        Returns:
+            list[dict]: Dropdown options ({"label", "value"}) of the best matches, best first.
+        """
+        query = normalize(query)
+        if not query or limit <= 0:
+            return []
+        found = []
+        seen = set()
+
+        def take(ranks):
+            for rank in ranks:
+                if rank not in seen:
+                    seen.add(rank)
+                    found.append(rank)
+                    if len(found) >= limit:
+                        return
+
+        # Each tier is only searched when the previous ones left places, for as many ranks as could be new
+        prefix = self._label_prefix(query)
+        if len(prefix) > limit:
+            prefix = np.partition(prefix, limit - 1)[:limit]
+        take(np.sort(prefix).tolist())
+        if len(found) < limit:
+            take(self._word_prefix(query, limit))
+        if len(found) < limit:
+            take(self._trigram(query, limit + len(found)).tolist())
+        return [self.options[rank] for rank in found]
+
+def measure_search(index: station_index, queries: list[str], repeat: int = 100) -> float:
+    """
+    Mean time of a search, in milliseconds.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            index.search(query)
+    return (time.perf_counter() - start) / (repeat * len(queries)) * 1000
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search the stations of the binary artifacts and time the index.")
+    parser.add_argument("query", nargs="*", help="Queries to answer (default: a set of sample queries)")
+    parser.add_argument("--artifacts", default=ARTIFACTS_DIRECTORY)
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    args = parser.parse_args(argv)
+
+    _, _, vertices = load_binary_network(args.artifacts)
+    start = time.perf_counter()
+    index = station_index(vertices)
+    print(f"Index of {len(index)} stations built in {(time.perf_counter() - start) * 1000:.1f} ms")
+    queries = args.query or ["t", "times", "times sq", "42 st", "14 st a", "grand central", "brodway", "canal st n"]
+    for query in queries:
+        print(f"  {query!r}: {[option['label'] for option in index.search(query, args.limit)]}")
+    print(f"Mean search time: {measure_search(index, queries):.3f} ms")
+
+if __name__ == "__main__":
+    main()
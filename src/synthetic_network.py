@@ -0,0 +1,155 @@
+from os import path
+import csv
+import math
+import os
+import random
+
+"""
+synthetic_network.py
+---------------------
+Synthetic subway networks and timetables for the benchmarks, in the same formats as the real input files:
+the stations file has the columns of all_stations_results.csv, and the GTFS feed has the stops, routes,
+trips, stop_times and calendar tables read by next_train.py.
+Two layouts are generated:
+    grid    Horizontal and vertical lines; the two stations at each crossing form a complex.
+    radial  Lines from the center outwards, all meeting at a central complex, crossed by ring lines.
+"""
+
+CENTER = (40.7580, -73.9855)      # Midtown Manhattan
+STATION_SPACING = 600.0           # Meters between consecutive stations of a line
+JITTER = 40.0                     # Random displacement of each station, in meters
+STATIONS_HEADER = ["Latitude", "Longitude", "Source File", "Stop Name", "Line", "Distance (m)", " Complex ID", "Crime_Per_Capita"]
+LINE_PREFIXES = "123456789ABCDEFGJLMNQRWZ"
+METERS_PER_DEGREE = 111_320.0
+
+def _offset(meters_north: float, meters_east: float) -> tuple[float, float]:
+    lat = CENTER[0] + meters_north / METERS_PER_DEGREE
+    lon = CENTER[1] + meters_east / (METERS_PER_DEGREE * math.cos(math.radians(CENTER[0])))
+    return lat, lon
+
+def _line_name(index: int) -> str:
+    # The first character is the route_short_name used by next_train_time
+    return f"{LINE_PREFIXES[index % len(LINE_PREFIXES)]}{index}Line"
+
+def _rows(stops: list[tuple[int, float, float]], lines: list[list[int]], generator: random.Random) -> list[list]:
+    """
+    Stations file rows: one row per (line, station), stations sharing a point share its complex id.
+    """
+    crime_rates = {point: generator.lognormvariate(math.log(1e-4), 0.8) for point, _, _ in stops}
+    coordinates = {point: (north, east) for point, north, east in stops}
+    rows = [list(STATIONS_HEADER)]
+    for line_index, points in enumerate(lines):
+        name = _line_name(line_index)
+        for point in points:
+            north, east = coordinates[point]
+            lat, lon = _offset(north + generator.uniform(-JITTER, JITTER), east + generator.uniform(-JITTER, JITTER))
+            rows.append([f"{lat:.6f}", f"{lon:.6f}", "synthetic.csv", f"Station {point}", name, "0", str(point), f"{crime_rates[point]:.10f}"])
+    return rows
+
+def grid_network(n: int, seed: int = 0) -> list[list]:
+    """
+    Grid layout with about n vertices.
+    Args:
+        n (int): Target number of vertices (one per line and station).
+        seed (int): Seed of the coordinates jitter and the crime rates.
+    Returns:
+        list[list]: Rows of the stations file, header included.
+    """
+    side = max(2, round(math.sqrt(n / 2)))
+    half = (side - 1) / 2
+    stops = [(row * side + column, (row - half) * STATION_SPACING, (column - half) * STATION_SPACING) for row in range(side) for column in range(side)]
+    lines = [[row * side + column for column in range(side)] for row in range(side)]
+    lines += [[row * side + column for row in range(side)] for column in range(side)]
+    return _rows(stops, lines, random.Random(seed))
+
+def radial_network(n: int, seed: int = 0, spokes: int = 8, rings: int = 3) -> list[list]:
+    """
+    Radial layout with about n vertices.
+    Args:
+        n (int): Target number of vertices (one per line and station).
+        seed (int): Seed of the coordinates jitter and the crime rates.
+        spokes (int): Number of lines leaving the center.
+        rings (int): Number of circular lines crossing the spokes.
+    Returns:
+        list[list]: Rows of the stations file, header included.
+    """
+    # Each spoke has the center plus length stations, and each ring one station per spoke plus its closing one
+    length = max(2, round((n - rings * (spokes + 1)) / spokes) - 1)
+    stops = [(0, 0.0, 0.0)]
+    lines = []
+    for spoke in range(spokes):
+        angle = 2 * math.pi * spoke / spokes
+        points = [0]
+        for step in range(1, length + 1):
+            point = spoke * length + step
+            stops.append((point, step * STATION_SPACING * math.cos(angle), step * STATION_SPACING * math.sin(angle)))
+            points.append(point)
+        lines.append(points)
+    for ring in range(1, rings + 1):
+        step = max(1, ring * length // (rings + 1))
+        points = [spoke * length + step for spoke in range(spokes)]
+        lines.append(points + points[:1])
+    return _rows(stops, lines, random.Random(seed))
+
+NETWORK_KINDS = {"grid": grid_network, "radial": radial_network}
+
+def write_rows(rows: list[list], file_path: str):
+    """
+    Write rows as a comma separated file (the values never contain commas, as load_data_csv expects).
+    """
+    os.makedirs(path.dirname(file_path) or ".", exist_ok=True)
+    with open(file_path, "w", newline="", encoding="utf-8") as file:
+        csv.writer(file, lineterminator="\n").writerows(rows)
+
+def synthetic_gtfs(rows: list[list], directory: str, headway: int = 600, hop_seconds: int = 90, first: int = 5 * 3600, last: int = 25 * 3600):
+    """
+    Write a GTFS feed running every line of a stations file in both directions, every day of the week.
+    Lines sharing the first character share a route, as next_train_time only reads that character.
+    Args:
+        rows (list[list]): Rows of the stations file, header included.
+        directory (str): Output directory of the .txt tables.
+        headway (int): Seconds between two trips of a line and direction.
+        hop_seconds (int): Seconds between two consecutive stations.
+        first (int): Departure of the first trip, in seconds since midnight.
+        last (int): Last departure (may be after 24:00).
+    """
+    os.makedirs(directory, exist_ok=True)
+    lines = {}
+    for row in rows[1:]:
+        lines.setdefault(row[4], []).append((row[6], row[3], row[0], row[1]))
+
+    stops = [["stop_id", "stop_name", "stop_lat", "stop_lon", "location_type", "parent_station"]]
+    seen = set()
+    for members in lines.values():
+        for complex_id, name, lat, lon in members:
+            if complex_id in seen:
+                continue
+            seen.add(complex_id)
+            stops.append([complex_id, name, lat, lon, "1", ""])
+            stops.append([f"{complex_id}N", name, lat, lon, "", complex_id])
+            stops.append([f"{complex_id}S", name, lat, lon, "", complex_id])
+
+    routes = [["route_id", "agency_id", "route_short_name", "route_long_name", "route_type"]]
+    for prefix in sorted({name[0] for name in lines}):
+        routes.append([prefix, "SYNTHETIC", prefix, f"Synthetic {prefix}", "1"])
+
+    services = {"Weekday": [1, 1, 1, 1, 1, 0, 0], "Saturday": [0, 0, 0, 0, 0, 1, 0], "Sunday": [0, 0, 0, 0, 0, 0, 1]}
+    calendar = [["service_id", "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday", "start_date", "end_date"]]
+    calendar += [[service, *days, "20250101", "20351231"] for service, days in services.items()]
+
+    trips = [["route_id", "trip_id", "service_id", "trip_headsign", "direction_id", "shape_id"]]
+    stop_times = [["trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"]]
+    for line, members in lines.items():
+        for direction, suffix in ((0, "N"), (1, "S")):
+            ordered = members if direction == 0 else members[::-1]
+            for service in services:
+                for start in range(first, last + 1, headway):
+                    trip_id = f"{service}-{line}-{suffix}-{start}"
+                    trips.append([line[0], trip_id, service, ordered[-1][1], str(direction), f"{line}..{suffix}"])
+                    for sequence, (complex_id, _, _, _) in enumerate(ordered):
+                        seconds = start + sequence * hop_seconds
+                        clock = f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+                        stop_times.append([trip_id, clock, clock, f"{complex_id}{suffix}", str(sequence + 1)])
+
+    for name, table in (("stops", stops), ("routes", routes), ("trips", trips), ("stop_times", stop_times), ("calendar", calendar)):
+        write_rows(table, path.join(directory, f"{name}.txt"))
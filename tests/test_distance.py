@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from src.distance import vincenty_km
+
+geopy_distance = pytest.importorskip("geopy.distance")
+
+TOLERANCE_M = 0.001  # Largest accepted difference with geopy, in meters
+SAMPLES = 1000
+
+def random_pairs(local: bool, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    if local:
+        # Subway scale: both ends inside New York City
+        return rng.uniform(40.5, 40.95, SAMPLES), rng.uniform(-74.3, -73.7, SAMPLES), rng.uniform(40.5, 40.95, SAMPLES), rng.uniform(-74.3, -73.7, SAMPLES)
+    # Anywhere on the globe, but not antipodal
+    lat1, lon1 = rng.uniform(-80, 80, SAMPLES), rng.uniform(-180, 180, SAMPLES)
+    return lat1, lon1, rng.uniform(-80, 80, SAMPLES), lon1 + rng.uniform(-120, 120, SAMPLES)
+
+@pytest.mark.parametrize("local", [True, False], ids=["local", "global"])
+def test_vincenty_matches_geopy_geodesic(local):
+    lat1, lon1, lat2, lon2 = random_pairs(local)
+    ours = vincenty_km(lat1, lon1, lat2, lon2)
+    reference = np.array([geopy_distance.geodesic((a, b), (c, d)).kilometers for a, b, c, d in zip(lat1, lon1, lat2, lon2)])
+    np.testing.assert_allclose(ours * 1000, reference * 1000, rtol=0, atol=TOLERANCE_M)